@@ -0,0 +1,355 @@
+"""
+Admission control for Novels Reader
+
+Перед базой стоят два барьера:
+- ограничение одновременных запросов по классам маршрутов (чтение, запись,
+  поиск) с короткой очередью. Если очередь полна или ожидание затянулось,
+  запрос сразу получает 503, а не висит в пуле соединений. В очереди чтения
+  главы идут раньше кабинета переводчика;
+- token bucket на пользователя (проверенный id из initData) или IP: сверх
+  лимита 429. X-Forwarded-For учитывается только за доверенными прокси
+  (TRUSTED_PROXY_HOPS), иначе его подделает любой клиент.
+  По умолчанию корзины живут в памяти процесса; с RATE_LIMIT_BACKEND_URL
+  (redis://...) они общие для всех воркеров, нужен пакет redis.
+
+Очереди и число отказов видны в /api/health и /api/metrics.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from api.auth import InvalidInitData, scope_user_id
+from api.responses import dumps
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', '1') == '1'
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') == '1'
+
+# Сколько прокси перед приложением дописывают адрес в X-Forwarded-For
+# (Vercel - 1). 0 - заголовкам не верим и берем адрес соединения
+TRUSTED_PROXY_HOPS = int(os.getenv('TRUSTED_PROXY_HOPS', '0'))
+
+# Сколько секунд запрос может ждать в очереди, прежде чем получить 503
+QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '1'))
+
+# Класс маршрутов: (одновременно, очередь)
+CONCURRENCY = {
+    "read": (32, 64),
+    "write": (8, 32),
+    "search": (4, 8),
+}
+
+# Класс маршрутов: (запросов в секунду, запас) на пользователя или IP
+RATE_LIMITS = {
+    "read": (20.0, 100.0),
+    "write": (5.0, 30.0),
+    "search": (3.0, 15.0),
+}
+
+# Чем меньше, тем раньше запрос выходит из очереди
+PRIORITY_CHAPTER = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_DASHBOARD = 2
+
+# Служебные маршруты не ограничиваются: по ним смотрят, что происходит под нагрузкой.
+# /api/warmup создает пул и проверяет схему, поэтому идет через очередь чтения
+EXEMPT_PATHS = {"/api/health", "/api/metrics"}
+
+# Просмотры и прогресс копятся в памяти и не трогают базу: только rate limit
+_BUFFERED_RE = re.compile(r"^/api/(novels/\d+(/chapters/\d+)?/views|library/progress)$")
+_CHAPTER_READ_RE = re.compile(r"^/api/novels/\d+/(chapters/\d+(/content(/stream)?)?|bundle|toc)$")
+
+
+def classify(method: str, path: str, query_string: bytes) -> Optional[Tuple[str, Optional[int]]]:
+    """
+    Класс маршрута и приоритет в очереди. None - запрос не ограничивается,
+    приоритет None - только rate limit, без очереди
+    """
+    if method == "OPTIONS" or not path.startswith("/api/") or path in EXEMPT_PATHS:
+        return None
+    if _BUFFERED_RE.match(path):
+        return "write", None
+    if path.endswith("/search"):
+        return "search", PRIORITY_DEFAULT
+    # batch - POST, но только читает
+    if method not in ("GET", "HEAD") and path != "/api/novels/batch":
+        return "write", PRIORITY_DEFAULT
+    if _CHAPTER_READ_RE.match(path):
+        return "read", PRIORITY_CHAPTER
+    if path.startswith("/api/translators/") or b"translator_id=" in query_string:
+        return "read", PRIORITY_DASHBOARD
+    return "read", PRIORITY_DEFAULT
+
+
+def client_key(scope, trusted_hops: Optional[int] = None) -> str:
+    """Пользователь Telegram с проверенной подписью, иначе IP клиента"""
+    try:
+        user_id = scope_user_id(scope)
+    except InvalidInitData:
+        user_id = None
+    if user_id:
+        return "user:" + user_id
+    return "ip:" + client_ip(scope, TRUSTED_PROXY_HOPS if trusted_hops is None else trusted_hops)
+
+
+def client_ip(scope, trusted_hops: int) -> str:
+    """
+    Адрес клиента. Начало X-Forwarded-For пишет сам клиент, поэтому берем
+    адрес, который дописал самый дальний из trusted_hops доверенных прокси
+    """
+    if trusted_hops > 0:
+        headers = dict(scope["headers"])
+        forwarded = headers.get(b"x-forwarded-for")
+        if forwarded:
+            hops = [hop.strip() for hop in forwarded.decode("latin-1").split(",") if hop.strip()]
+            if hops:
+                return hops[max(0, len(hops) - trusted_hops)]
+        real_ip = headers.get(b"x-real-ip")
+        if real_ip:
+            return real_ip.decode("latin-1").strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+class ConcurrencyLimiter:
+    """Не больше limit запросов одновременно, остальные ждут в очереди по приоритету"""
+
+    def __init__(self, name: str, limit: int, queue_size: int, timeout: float = QUEUE_TIMEOUT):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._waiters: List[List[Any]] = []
+        self._order = itertools.count()
+
+    async def acquire(self, priority: int = PRIORITY_DEFAULT) -> bool:
+        """True - запрос допущен и должен вызвать release(); False - отказ"""
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if self.waiting >= self.queue_size:
+            self.rejected += 1
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._order), future])
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Место могли успеть передать нам - вернем его следующему
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+        finally:
+            self.waiting -= 1
+
+        if future.done() and not future.cancelled():
+            self.admitted += 1
+            return True
+        self.timeouts += 1
+        return False
+
+    def release(self):
+        # Место переходит первому живому ожидающему, active не меняется
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "limit": self.limit,
+            "queue": self.queue_size,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts
+        }
+
+
+class MemoryBuckets:
+    """Token bucket на ключ в памяти процесса; давно не виденные ключи вытесняются"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str) -> float:
+        """0 - запрос разрешен, иначе через сколько секунд появится токен"""
+        now = time.monotonic()
+        tokens, updated_at = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "keys": len(self._buckets)}
+
+
+class RedisBuckets:
+    """Token bucket в Redis, общий для всех воркеров. Без Redis запросы пропускаются"""
+
+    # Число возвращается строкой: целые Lua-числа Redis обрезал бы
+    SCRIPT = """
+        local rate = tonumber(ARGV[1])
+        local burst = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local state = redis.call('HMGET', KEYS[1], 't', 'u')
+        local tokens = tonumber(state[1]) or burst
+        local updated_at = tonumber(state[2]) or now
+        tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+        local wait = 0
+        if tokens >= 1 then
+            tokens = tokens - 1
+        else
+            wait = (1 - tokens) / rate
+        end
+        redis.call('HSET', KEYS[1], 't', tokens, 'u', now)
+        redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+        return tostring(wait)
+    """
+
+    def __init__(self, client, name: str, rate: float, burst: float, namespace: str = "novels:rate:"):
+        self.rate = rate
+        self.burst = burst
+        self.prefix = f"{namespace}{name}:"
+        self._script = client.register_script(self.SCRIPT)
+
+    async def take(self, key: str) -> float:
+        try:
+            wait = await self._script(keys=[self.prefix + key], args=[self.rate, self.burst, time.time()])
+        except Exception:
+            logger.warning("Rate limit backend failed, request allowed", exc_info=True)
+            return 0.0
+        return float(wait)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis"}
+
+
+class Admission:
+    def __init__(self):
+        self.enabled = ADMISSION_ENABLED
+        self.rate_limit_enabled = RATE_LIMIT_ENABLED
+        self.limiters: Dict[str, ConcurrencyLimiter] = {}
+        self.buckets: Dict[str, Any] = {}
+        self.rate_limited: Dict[str, int] = {}
+
+        redis_client = None
+        url = os.getenv('RATE_LIMIT_BACKEND_URL')
+        if url:
+            try:
+                import redis.asyncio as redis
+            except ImportError as e:
+                raise RuntimeError("RATE_LIMIT_BACKEND_URL requires the `redis` package") from e
+            redis_client = redis.from_url(url)
+
+        for name, default in CONCURRENCY.items():
+            limit = int(os.getenv(f'ADMISSION_{name.upper()}_CONCURRENCY', default[0]))
+            queue = int(os.getenv(f'ADMISSION_{name.upper()}_QUEUE', default[1]))
+            self.limiters[name] = ConcurrencyLimiter(name, limit, queue)
+        for name, default in RATE_LIMITS.items():
+            rate = float(os.getenv(f'RATE_LIMIT_{name.upper()}_RPS', default[0]))
+            burst = float(os.getenv(f'RATE_LIMIT_{name.upper()}_BURST', default[1]))
+            self.buckets[name] = (
+                RedisBuckets(redis_client, name, rate, burst) if redis_client is not None
+                else MemoryBuckets(rate, burst)
+            )
+            self.rate_limited[name] = 0
+
+    async def check_rate(self, route_class: str, key: str) -> float:
+        if not self.rate_limit_enabled:
+            return 0.0
+        wait = await self.buckets[route_class].take(key)
+        if wait:
+            self.rate_limited[route_class] += 1
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "limiters": {name: limiter.stats() for name, limiter in self.limiters.items()},
+            "rate_limited": dict(self.rate_limited),
+            "rate_limit": next(iter(self.buckets.values())).stats() if self.buckets else None
+        }
+
+
+admission = Admission()
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, controller: Admission = admission):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.controller.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        route = classify(scope["method"], scope["path"], scope.get("query_string", b""))
+        if route is None:
+            await self.app(scope, receive, send)
+            return
+        route_class, priority = route
+
+        wait = await self.controller.check_rate(route_class, client_key(scope))
+        if wait:
+            await self._reject(send, scope, 429, "Too many requests", wait)
+            return
+
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.controller.limiters[route_class]
+        if not await limiter.acquire(priority):
+            await self._reject(send, scope, 503, "Server is busy, try again later", 1)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+    @staticmethod
+    async def _reject(send, scope, status: int, message: str, retry_after: float):
+        body = dumps({"status": "error", "message": message, "path": scope["path"]})
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, round(retry_after))).encode()),
+                (b"cache-control", b"no-store"),
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,94 @@
+"""
+Telegram Mini App authentication for Novels Reader
+
+Фронтенд передает подписанную строку Telegram.WebApp.initData в заголовке
+X-Telegram-Init-Data. Подпись проверяется ключом бота (BOT_TOKEN), и id
+пользователя берется только из проверенных данных: голому id в заголовке
+верить нельзя, его может подставить кто угодно.
+https://core.telegram.org/bots/webapps#validating-data-received-via-the-mini-app
+"""
+import hashlib
+import hmac
+import json
+import os
+import time
+from typing import Mapping, Optional
+from urllib.parse import parse_qsl, urlencode
+
+BOT_TOKEN = os.getenv('BOT_TOKEN')
+
+INIT_DATA_HEADER = "X-Telegram-Init-Data"
+
+# Сколько секунд после открытия Mini App подпись initData действительна
+INIT_DATA_MAX_AGE = float(os.getenv('TELEGRAM_INIT_DATA_MAX_AGE', str(24 * 3600)))
+
+# Ключ в scope["state"] (это же request.state): проверка - один раз на запрос
+_STATE_KEY = "telegram_user"
+
+
+class InvalidInitData(ValueError):
+    pass
+
+
+def _signature(fields: Mapping[str, str], bot_token: str) -> str:
+    secret = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    data_check_string = "\n".join(f"{key}={value}" for key, value in sorted(fields.items()))
+    return hmac.new(secret, data_check_string.encode(), hashlib.sha256).hexdigest()
+
+
+def sign_init_data(fields: Mapping[str, str], bot_token: str) -> str:
+    """Подписывает initData так же, как Telegram: для тестов и нагрузочного прогона"""
+    return urlencode({**fields, "hash": _signature(fields, bot_token)})
+
+
+def verify_init_data(
+    init_data: str,
+    bot_token: Optional[str] = None,
+    max_age: Optional[float] = None,
+    now: Optional[float] = None
+) -> str:
+    """Проверяет подпись и срок initData, возвращает Telegram id пользователя"""
+    bot_token = bot_token or BOT_TOKEN
+    max_age = INIT_DATA_MAX_AGE if max_age is None else max_age
+    if not bot_token:
+        raise InvalidInitData("BOT_TOKEN is not configured")
+    try:
+        fields = dict(parse_qsl(init_data, keep_blank_values=True, strict_parsing=True))
+    except ValueError as e:
+        raise InvalidInitData("Malformed init data") from e
+
+    received = fields.pop("hash", "")
+    if not hmac.compare_digest(_signature(fields, bot_token), received):
+        raise InvalidInitData("Invalid init data signature")
+
+    try:
+        auth_date = int(fields["auth_date"])
+        user_id = json.loads(fields["user"])["id"]
+    except (KeyError, TypeError, ValueError) as e:
+        raise InvalidInitData("Init data has no user") from e
+    if max_age > 0 and (now if now is not None else time.time()) - auth_date > max_age:
+        raise InvalidInitData("Init data has expired")
+    return str(user_id)
+
+
+def scope_user_id(scope) -> Optional[str]:
+    """
+    Проверенный id пользователя запроса или None, если initData не передана.
+    Неверная подпись - InvalidInitData. Результат запоминается в scope, так
+    что middleware и роут проверяют подпись один раз
+    """
+    state = scope.setdefault("state", {})
+    if _STATE_KEY not in state:
+        init_data = None
+        for key, value in scope.get("headers", []):
+            if key == b"x-telegram-init-data":
+                init_data = value.decode("latin-1")
+                break
+        try:
+            state[_STATE_KEY] = (verify_init_data(init_data) if init_data else None, None)
+        except InvalidInitData as e:
+            state[_STATE_KEY] = (None, e)
+    user_id, error = state[_STATE_KEY]
+    if error is not None:
+        raise error
+    return user_id
@@ -0,0 +1,94 @@
+"""
+Buffered writes for Novels Reader
+
+Общий цикл для буферов, которые копят частые мелкие записи в памяти
+процесса и сбрасывают их в базу пачкой: по таймеру, при переполнении и при
+остановке приложения. Подкласс задает только слияние записей (_requeue) и
+SQL сброса (_write).
+"""
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedFlusher:
+    # Что буфер копит, для сообщений в логе
+    name = "buffer"
+
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: Dict[Any, Any] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._flushes = set()
+
+    async def flush(self, database=None):
+        """Записывает накопленное одним запросом"""
+        if not self._pending:
+            return
+        if database is None:
+            from api.database import db as database
+
+        pending, self._pending = self._pending, {}
+        try:
+            await self._write(database, pending)
+        except asyncio.CancelledError:
+            self._requeue(pending)
+            raise
+        except Exception:
+            logger.exception("Failed to flush %s", self.name)
+            self._requeue(pending)
+
+    async def _write(self, database, pending: Dict[Any, Any]):
+        raise NotImplementedError
+
+    def _requeue(self, pending: Dict[Any, Any]):
+        """Возвращает несохраненную пачку в буфер, не затирая более новые записи"""
+        raise NotImplementedError
+
+    def _added(self):
+        """Вызывается подклассом после каждой записи в буфер"""
+        self._ensure_started()
+        # Буфер ограничен: при переполнении сбрасываем его, не дожидаясь таймера
+        if len(self._pending) >= self.max_pending:
+            self._flush_in_background()
+
+    def _tick(self):
+        """Обслуживание после сброса по таймеру"""
+
+    async def stop(self):
+        """
+        Останавливает фоновый сброс и записывает остаток. Задача не
+        отменяется: идущий сброс должен закончиться, иначе его пачка пропадет
+        """
+        if self._task:
+            self._stopping.set()
+            await self._task
+            self._task = None
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+        await self.flush()
+
+    def _ensure_started(self):
+        # Запускаем таймер лениво, из первого запроса: в serverless-режиме
+        # lifespan может не вызываться
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._stopping = asyncio.Event()
+            self._task = loop.create_task(self._run(self._stopping))
+
+    def _flush_in_background(self):
+        task = asyncio.get_running_loop().create_task(self.flush())
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _run(self, stopping: asyncio.Event):
+        while not stopping.is_set():
+            try:
+                await asyncio.wait_for(stopping.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+                self._tick()
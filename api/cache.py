@@ -0,0 +1,200 @@
+"""
+Response cache for Novels Reader
+
+Готовые тела ответов (bytes) кешируются с TTL на уровне маршрута.
+Роуты записи сбрасывают затронутые ключи, одновременные промахи по одному
+ключу схлопываются в один запрос к базе (single-flight).
+
+По умолчанию кеш живет в памяти процесса (LRU с лимитом в байтах).
+Если задан CACHE_BACKEND_URL (redis://...), кеш общий для всех воркеров;
+для этого нужен пакет redis, он не входит в обязательные зависимости.
+
+Счетчик инвалидаций (поколение) хранится в бэкенде, а не в процессе:
+сброс на одном инстансе не дает другим инстансам записать в общий кеш
+результат, посчитанный до него.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class MemoryBackend:
+    """LRU в памяти процесса, ограниченный суммарным размером значений"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._items: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._generation = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self._remove(key)
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        if len(value) > self.max_bytes:
+            return
+        if key in self._items:
+            self._remove(key)
+        while self.size + len(value) > self.max_bytes:
+            oldest = next(iter(self._items))
+            self._remove(oldest)
+            self.evictions += 1
+        self._items[key] = (time.monotonic() + ttl, value)
+        self.size += len(value)
+
+    async def delete(self, key: str):
+        if key in self._items:
+            self._remove(key)
+
+    async def delete_prefix(self, prefix: str):
+        for key in [k for k in self._items if k.startswith(prefix)]:
+            self._remove(key)
+
+    async def generation(self) -> int:
+        return self._generation
+
+    async def bump_generation(self):
+        self._generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "entries": len(self._items),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions
+        }
+
+    def _remove(self, key: str):
+        _, value = self._items.pop(key)
+        self.size -= len(value)
+
+
+class RedisBackend:
+    """Общий кеш для нескольких воркеров в Redis-совместимом хранилище"""
+
+    def __init__(self, url: str, namespace: str = "novels:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND_URL requires the `redis` package") from e
+        self.client = redis.from_url(url)
+        self.namespace = namespace
+        self.url = url
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.namespace + key)
+
+    async def set(self, key: str, value: bytes, ttl: float):
+        await self.client.set(self.namespace + key, value, px=int(ttl * 1000))
+
+    async def delete(self, key: str):
+        await self.client.delete(self.namespace + key)
+
+    async def delete_prefix(self, prefix: str):
+        keys = [key async for key in self.client.scan_iter(match=self.namespace + prefix + "*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def generation(self) -> int:
+        value = await self.client.get(self.namespace + "generation")
+        return int(value or 0)
+
+    async def bump_generation(self):
+        await self.client.incr(self.namespace + "generation")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis"}
+
+
+class ResponseCache:
+    def __init__(self, backend=None):
+        if backend is None:
+            url = os.getenv('CACHE_BACKEND_URL')
+            if url:
+                backend = RedisBackend(url)
+            else:
+                backend = MemoryBackend(int(os.getenv('CACHE_MAX_BYTES', str(32 * 1024 * 1024))))
+        self.backend = backend
+        self.enabled = os.getenv('CACHE_ENABLED', '1') == '1'
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get_or_set(self, key: str, ttl: float, loader: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Отдает значение из кеша или вычисляет его, один раз на ключ"""
+        if not self.enabled:
+            return await loader()
+
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # Отменили запрос-владелец, а не нас - считаем сами
+                if not inflight.cancelled():
+                    raise
+                return await loader()
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        # Исключение может никто не забрать, если параллельных запросов не было
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            # Поколение меняется при каждой инвалидации: результат, посчитанный
+            # до нее, отдается ждущим запросам, но в кеш не попадает
+            generation = await self.backend.generation()
+            value = await loader()
+            if generation == await self.backend.generation():
+                await self.backend.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def invalidate(self, *keys: str):
+        await self.backend.bump_generation()
+        for key in keys:
+            await self.backend.delete(key)
+
+    async def invalidate_prefix(self, *prefixes: str):
+        await self.backend.bump_generation()
+        for prefix in prefixes:
+            await self.backend.delete_prefix(prefix)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            **self.backend.stats()
+        }
+
+
+cache = ResponseCache()
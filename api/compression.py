@@ -0,0 +1,172 @@
+"""
+Response compression for Novels Reader
+
+Главы - длинный кириллический текст (2 байта на символ в UTF-8), поэтому
+ответы сжимаются brotli или gzip в зависимости от Accept-Encoding.
+Ответы, у которых уже есть Content-Encoding (заранее сжатые главы),
+middleware пропускает как есть.
+
+brotli - необязательная зависимость: без нее используется только gzip.
+"""
+import gzip
+import os
+import zlib
+from typing import Optional
+
+from api.http_cache import encoded_etag
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli есть в requirements.txt
+    brotli = None
+
+MINIMUM_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))
+GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '5'))
+
+# Для заранее сжатых глав CPU тратится один раз, можно сжимать сильнее
+STORED_GZIP_LEVEL = 9
+STORED_BROTLI_QUALITY = 11
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def available_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Выбирает br или gzip по Accept-Encoding с учетом q-значений"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in available_encodings():
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str, stored: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=STORED_BROTLI_QUALITY if stored else BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=STORED_GZIP_LEVEL if stored else GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+class _StreamCompressor:
+    """Сжатие потокового ответа: каждый кусок сразу отдается клиенту"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                response_headers = dict(message.get("headers", []))
+                content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+                passthrough = (
+                    b"content-encoding" in response_headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                if not more_body:
+                    # Ответ целиком в одном сообщении
+                    if len(body) < self.minimum_size:
+                        await send(start_message)
+                        await send(message)
+                        return
+                    compressed = compress(body, encoding)
+                    await send(self._start(start_message, encoding, len(compressed)))
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+
+                compressor = _StreamCompressor(encoding)
+                await send(self._start(start_message, encoding, None))
+
+            data = compressor.chunk(body) if body else b""
+            if not more_body:
+                data += compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _start(message, encoding: str, length: Optional[int]):
+        headers = []
+        for key, value in message.get("headers", []):
+            if key == b"etag":
+                # У сжатого представления свой ETag
+                value = encoded_etag(value.decode("latin-1"), encoding).encode("latin-1")
+            elif key in (b"content-length", b"vary"):
+                continue
+            headers.append((key, value))
+        vary = [value for key, value in message.get("headers", []) if key == b"vary"]
+        if b"accept-encoding" not in b", ".join(vary).lower():
+            vary.append(b"Accept-Encoding")
+        headers.append((b"content-encoding", encoding.encode()))
+        headers.append((b"vary", b", ".join(vary)))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        return {**message, "headers": headers}
@@ -1,87 +1,278 @@
 """
 Database utilities for Novels Reader
+
+Запись всегда идет в основную базу. Чтение может идти в реплики
+(DATABASE_REPLICA_URLS через запятую); пользователь, который только что
+что-то записал, DB_REPLICA_STICKY_SECONDS читает из основной базы, чтобы
+видеть свои изменения несмотря на отставание реплик. Время записи уходит
+клиенту в заголовке X-Last-Write и возвращается с его следующими запросами,
+поэтому гарантия держится и когда чтение попадает на другой инстанс.
 """
 import os
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
 from typing import Optional, List, Dict, Any
 import asyncpg
-from datetime import datetime
+
+from api import metrics
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, при которых чтение уходит с реплики в основную базу
+REPLICA_ERRORS = (OSError, asyncio.TimeoutError, asyncpg.PostgresConnectionError, asyncpg.CannotConnectNowError)
+
+# Время последней записи клиента (unix time): сервер отдает его после записи,
+# клиент присылает обратно с каждым запросом
+LAST_WRITE_HEADER = "X-Last-Write"
+
+# Записи текущего запроса, см. ReadYourWritesMiddleware
+_request_writes: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_writes", default=None)
+
+# Соседние главы находим по индексу (novel_id, chapter_number, id)
+CHAPTER_NEIGHBOURS = """
+    (
+        SELECT p.id FROM chapters p
+        WHERE p.novel_id = c.novel_id
+          AND (p.chapter_number, p.id) < (c.chapter_number, c.id)
+        ORDER BY p.chapter_number DESC, p.id DESC
+        LIMIT 1
+    ) as prev_chapter_id,
+    (
+        SELECT nx.id FROM chapters nx
+        WHERE nx.novel_id = c.novel_id
+          AND (nx.chapter_number, nx.id) > (c.chapter_number, c.id)
+        ORDER BY nx.chapter_number, nx.id
+        LIMIT 1
+    ) as next_chapter_id
+"""
 
 class Database:
-    def __init__(self):
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        acquire_timeout: Optional[float] = None,
+        replica_urls: Optional[List[str]] = None,
+        sticky_seconds: Optional[float] = None,
+        statement_cache_size: Optional[int] = None
+    ):
         self.pool: Optional[asyncpg.Pool] = None
-        self.url = os.getenv('POSTGRES_URL')
-        if not self.url:
-            raise ValueError("POSTGRES_URL not found in environment variables")
+        self.replica_pools: List[asyncpg.Pool] = []
+        # В .env используется DATABASE_URL, Vercel Postgres отдает POSTGRES_URL
+        self.url = url or os.getenv('DATABASE_URL') or os.getenv('POSTGRES_URL')
+        if replica_urls is None:
+            replica_urls = [u.strip() for u in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if u.strip()]
+        self.replica_urls = replica_urls
+        self.sticky_seconds = (
+            sticky_seconds if sticky_seconds is not None
+            else float(os.getenv('DB_REPLICA_STICKY_SECONDS', '10'))
+        )
+        # asyncpg держит подготовленные запросы на каждом соединении. Запросы
+        # роутов собираются из нескольких вариантов, поэтому кеш больше
+        # стандартного и без истечения по времени. За pgbouncer в режиме
+        # transaction подготовленные запросы не работают - там нужен 0
+        self.statement_cache_size = (
+            statement_cache_size if statement_cache_size is not None
+            else int(os.getenv('DB_STATEMENT_CACHE_SIZE', '512'))
+        )
+        self.min_size = min_size if min_size is not None else int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+        self.max_size = max_size if max_size is not None else int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+        self.acquire_timeout = (
+            acquire_timeout if acquire_timeout is not None
+            else float(os.getenv('DB_POOL_ACQUIRE_TIMEOUT', '10'))
+        )
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._waiters = 0
+        self._writers: Dict[str, float] = {}
+        self._last_write = float("-inf")
+        self._next_replica = 0
+        self.reads = {"primary": 0, "replica": 0, "fallback": 0}
 
     async def connect(self):
-        """Создает пул соединений с базой данных"""
-        if not self.pool:
-            self.pool = await asyncpg.create_pool(self.url)
+        """Создает пул соединений с базой данных (один на процесс)"""
+        loop = asyncio.get_running_loop()
+        if self.pool and self._loop is not loop:
+            # Пул привязан к циклу событий, в котором был создан. Если рантайм
+            # поднял новый цикл (холодный старт serverless-функции), старый пул
+            # использовать нельзя
+            self.pool.terminate()
+            self.pool = None
+            for replica in self.replica_pools:
+                replica.terminate()
+            self.replica_pools = []
+        if self.pool:
+            return
+
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        async with self._lock:
+            if self.pool:
+                return
+            if not self.url:
+                raise ValueError("DATABASE_URL not found in environment variables")
+            # Пулы основной базы и реплик подключаются параллельно: на холодном
+            # старте это одно время установки соединения вместо нескольких
+            primary, *replicas = await asyncio.gather(
+                self._create_pool(self.url),
+                *(self._create_pool(url) for url in self.replica_urls),
+                return_exceptions=True
+            )
+            failed = [r for r in [primary, *replicas] if isinstance(r, BaseException)]
+            fatal = [
+                e for e in failed
+                if e is primary or not isinstance(e, REPLICA_ERRORS + (asyncpg.PostgresError,))
+            ]
+            if fatal:
+                for pool in [primary, *replicas]:
+                    if isinstance(pool, asyncpg.Pool):
+                        await pool.close()
+                raise fatal[0]
+            for error in failed:
+                # Недоступная реплика не мешает старту: чтение пойдет в основную базу
+                logger.warning("Read replica is unavailable, reads go to primary", exc_info=error)
+            self.replica_pools = [r for r in replicas if isinstance(r, asyncpg.Pool)]
+            self.pool = primary
+
+    async def _create_pool(self, url: str) -> asyncpg.Pool:
+        return await asyncpg.create_pool(
+            url,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            statement_cache_size=self.statement_cache_size,
+            max_cached_statement_lifetime=0,
+            init=self._init_connection
+        )
+
+    @staticmethod
+    async def _init_connection(conn: asyncpg.Connection):
+        # Время каждого запроса уходит в /api/metrics
+        conn.add_query_logger(metrics.observe_query)
+
+    async def close(self):
+        """Закрывает пул соединений"""
+        replicas, self.replica_pools = self.replica_pools, []
+        for replica in replicas:
+            await replica.close()
+        if self.pool:
+            pool, self.pool = self.pool, None
+            await pool.close()
+
+    def mark_write(self, user_id: Optional[str], shared: bool = False):
+        """
+        Пользователь что-то записал: какое-то время читаем для него из основной
+        базы. shared=True - запись меняет общие данные из кеша ответов (новеллы,
+        главы, теги), и тогда из основной базы читаются и кешируемые запросы
+        всех пользователей. Личные записи (библиотека, прогресс) на кеш не влияют
+        """
+        if not self.replica_urls:
+            return
+        now = time.monotonic()
+        if shared:
+            self._last_write = now
+        writes = _request_writes.get()
+        if writes is not None:
+            writes["written_at"] = time.time()
+        if not user_id:
+            return
+        if len(self._writers) >= 10000:
+            self._writers = {
+                key: at for key, at in self._writers.items()
+                if now - at < self.sticky_seconds
+            }
+        self._writers[user_id] = now
+
+    def _use_replica(self, user_id: Optional[str], cached: bool) -> bool:
+        if not self.replica_pools:
+            return False
+        # Результат для общего кеша ответов не должен браться с отстающей
+        # реплики сразу после записи, иначе устаревший ответ закешируется для всех
+        if cached and time.monotonic() - self._last_write < self.sticky_seconds:
+            return False
+        if user_id:
+            written_at = self._writers.get(user_id)
+            if written_at is not None and time.monotonic() - written_at < self.sticky_seconds:
+                return False
+        # Запись могла пройти через другой инстанс: ее время пришло от клиента.
+        # Часы инстансов расходятся, поэтому сравниваем по модулю
+        writes = _request_writes.get()
+        client_written_at = writes.get("client_written_at") if writes else None
+        if client_written_at is not None and abs(time.time() - client_written_at) < self.sticky_seconds:
+            return False
+        return True
+
+    @asynccontextmanager
+    async def acquire(self, readonly: bool = False, user_id: Optional[str] = None, cached: bool = False):
+        """
+        Берет соединение из общего пула, создавая пул при первом обращении.
+        readonly=True разрешает взять соединение реплики; cached=True -
+        результат попадет в общий кеш ответов
+        """
+        if not self.pool or self._loop is not asyncio.get_running_loop():
+            await self.connect()
+
+        pool = self.pool
+        conn = None
+        started = time.perf_counter()
+        self._waiters += 1
+        try:
+            if readonly and self._use_replica(user_id, cached):
+                replica = self.replica_pools[self._next_replica % len(self.replica_pools)]
+                self._next_replica += 1
+                try:
+                    conn = await replica.acquire(timeout=self.acquire_timeout)
+                    pool = replica
+                    self.reads["replica"] += 1
+                except REPLICA_ERRORS:
+                    logger.warning("Read replica failed, falling back to primary", exc_info=True)
+                    self.reads["fallback"] += 1
+            elif readonly:
+                self.reads["primary"] += 1
+            if conn is None:
+                conn = await pool.acquire(timeout=self.acquire_timeout)
+        finally:
+            self._waiters -= 1
+        metrics.observe_pool_wait(time.perf_counter() - started, "primary" if pool is self.pool else "replica")
+        try:
+            yield conn
+        finally:
+            await pool.release(conn)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Метрики пула: занятые и свободные соединения, ожидающие запросы"""
+        stats = {
+            **self._pool_sizes(self.pool),
+            "waiters": self._waiters,
+            "min_size": self.min_size,
+            "max_size": self.max_size
+        }
+        if self.replica_urls:
+            stats["replicas"] = [self._pool_sizes(replica) for replica in self.replica_pools]
+            stats["reads"] = dict(self.reads)
+        return stats
+
+    @staticmethod
+    def _pool_sizes(pool: Optional[asyncpg.Pool]) -> Dict[str, int]:
+        if not pool:
+            return {"size": 0, "in_use": 0, "idle": 0}
+        size = pool.get_size()
+        idle = pool.get_idle_size()
+        return {"size": size, "in_use": size - idle, "idle": idle}
 
     async def init_tables(self):
-        """Инициализирует таблицы в базе данных"""
-        async with self.pool.acquire() as conn:
-            # Таблица переводчиков
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS translators (
-                    user_id TEXT PRIMARY KEY,
-                    username TEXT,
-                    display_name TEXT NOT NULL,
-                    bio TEXT,
-                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # Таблица новелл
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS novels (
-                    id SERIAL PRIMARY KEY,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    cover_url TEXT,
-                    translator_id TEXT REFERENCES translators(user_id),
-                    status TEXT DEFAULT 'ongoing',
-                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                    views INTEGER DEFAULT 0,
-                    subscribers INTEGER DEFAULT 0
-                )
-            ''')
-
-            # Таблица глав
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS chapters (
-                    id SERIAL PRIMARY KEY,
-                    novel_id INTEGER REFERENCES novels(id) ON DELETE CASCADE,
-                    chapter_number INTEGER NOT NULL,
-                    title TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                    views INTEGER DEFAULT 0
-                )
-            ''')
-
-            # Таблица тегов
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS tags (
-                    id SERIAL PRIMARY KEY,
-                    name TEXT UNIQUE NOT NULL
-                )
-            ''')
-
-            # Связь новелл и тегов
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS novel_tags (
-                    novel_id INTEGER REFERENCES novels(id) ON DELETE CASCADE,
-                    tag_id INTEGER REFERENCES tags(id) ON DELETE CASCADE,
-                    PRIMARY KEY (novel_id, tag_id)
-                )
-            ''')
+        """Применяет миграции схемы (см. api/migrate.py)"""
+        from api.migrate import apply_migrations
+        async with self.acquire() as conn:
+            await apply_migrations(conn)
 
     # Методы для работы с переводчиками
     async def create_translator(self, user_id: str, username: str, display_name: str, bio: str = None) -> Dict[str, Any]:
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             return await conn.fetchrow('''
                 INSERT INTO translators (user_id, username, display_name, bio)
                 VALUES ($1, $2, $3, $4)
@@ -89,20 +280,26 @@ class Database:
             ''', user_id, username, display_name, bio)
 
     async def get_translator(self, user_id: str) -> Dict[str, Any]:
-        async with self.pool.acquire() as conn:
+        async with self.acquire(readonly=True, user_id=user_id) as conn:
             return await conn.fetchrow('SELECT * FROM translators WHERE user_id = $1', user_id)
 
     # Методы для работы с новеллами
     async def create_novel(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             return await conn.fetchrow('''
                 INSERT INTO novels (title, description, cover_url, translator_id)
                 VALUES ($1, $2, $3, $4)
                 RETURNING *
             ''', data['title'], data.get('description'), data.get('cover_url'), data['translator_id'])
 
-    async def get_novels(self, limit: int = 20, offset: int = 0, translator_id: str = None) -> List[Dict[str, Any]]:
-        async with self.pool.acquire() as conn:
+    async def get_novels(
+        self,
+        limit: int = 20,
+        offset: int = 0,
+        translator_id: str = None,
+        user_id: str = None
+    ) -> List[Dict[str, Any]]:
+        async with self.acquire(readonly=True, user_id=user_id) as conn:
             query = 'SELECT * FROM novels'
             params = []
             
@@ -115,13 +312,13 @@ class Database:
             
             return await conn.fetch(query, *params)
 
-    async def get_novel(self, novel_id: int) -> Dict[str, Any]:
-        async with self.pool.acquire() as conn:
+    async def get_novel(self, novel_id: int, user_id: str = None) -> Dict[str, Any]:
+        async with self.acquire(readonly=True, user_id=user_id) as conn:
             return await conn.fetchrow('SELECT * FROM novels WHERE id = $1', novel_id)
 
     # Методы для работы с главами
     async def create_chapter(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        async with self.pool.acquire() as conn:
+        async with self.acquire() as conn:
             async with conn.transaction():
                 # Создаем главу
                 chapter = await conn.fetchrow('''
@@ -139,39 +336,93 @@ class Database:
                 
                 return chapter
 
-    async def get_chapters(self, novel_id: int, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
-        async with self.pool.acquire() as conn:
+    async def get_chapters(
+        self,
+        novel_id: int,
+        limit: int = 20,
+        offset: int = 0,
+        user_id: str = None
+    ) -> List[Dict[str, Any]]:
+        async with self.acquire(readonly=True, user_id=user_id) as conn:
             return await conn.fetch('''
-                SELECT * FROM chapters 
+                SELECT id, novel_id, chapter_number, title, created_at, updated_at, views
+                FROM chapters 
                 WHERE novel_id = $1 
-                ORDER BY chapter_number DESC 
+                ORDER BY chapter_number DESC, id DESC
                 LIMIT $2 OFFSET $3
             ''', novel_id, limit, offset)
 
-    async def get_chapter(self, chapter_id: int) -> Dict[str, Any]:
-        async with self.pool.acquire() as conn:
-            return await conn.fetchrow('SELECT * FROM chapters WHERE id = $1', chapter_id)
+    async def get_toc(self, novel_id: int, user_id: str = None) -> List[Dict[str, Any]]:
+        """Оглавление новеллы без текста глав"""
+        async with self.acquire(readonly=True, user_id=user_id) as conn:
+            return await conn.fetch('''
+                SELECT id, chapter_number, title, created_at, views
+                FROM chapters
+                WHERE novel_id = $1
+                ORDER BY chapter_number, id
+            ''', novel_id)
+
+    async def get_chapter(self, chapter_id: int, user_id: str = None) -> Dict[str, Any]:
+        """Глава вместе с id предыдущей и следующей глав"""
+        async with self.acquire(readonly=True, user_id=user_id) as conn:
+            return await conn.fetchrow(f'''
+                SELECT c.*, {CHAPTER_NEIGHBOURS}
+                FROM chapters c
+                WHERE c.id = $1
+            ''', chapter_id)
 
     # Поиск
-    async def search_novels(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
-        async with self.pool.acquire() as conn:
-            return await conn.fetch('''
-                SELECT * FROM novels
-                WHERE 
-                    title ILIKE $1 OR
-                    description ILIKE $1
-                ORDER BY updated_at DESC
-                LIMIT $2
-            ''', f'%{query}%', limit)
+    async def search_novels(self, query: str, limit: int = 20, user_id: str = None) -> List[Dict[str, Any]]:
+        from api.search import search_novels
+        async with self.acquire(readonly=True, user_id=user_id) as conn:
+            novels, _ = await search_novels(conn, query, limit=limit)
+            return novels
 
     # Статистика
-    async def increment_novel_views(self, novel_id: int):
-        async with self.pool.acquire() as conn:
-            await conn.execute('UPDATE novels SET views = views + 1 WHERE id = $1', novel_id)
+    def increment_novel_views(self, novel_id: int, user_id: str = None):
+        from api.views import novel_views
+        novel_views.add(novel_id, user_id)
+
+    def increment_chapter_views(self, chapter_id: int, user_id: str = None):
+        from api.views import chapter_views
+        chapter_views.add(chapter_id, user_id)
+
+class ReadYourWritesMiddleware:
+    """
+    Передает время записи между инстансами через клиента: читает X-Last-Write
+    запроса и, если запрос что-то записал (Database.mark_write), отдает новое
+    время в ответе
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        writes: Dict[str, float] = {}
+        for key, value in scope["headers"]:
+            if key == b"x-last-write":
+                try:
+                    writes["client_written_at"] = float(value)
+                except ValueError:
+                    pass
+                break
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and "written_at" in writes:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-last-write", f"{writes['written_at']:.3f}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
 
-    async def increment_chapter_views(self, chapter_id: int):
-        async with self.pool.acquire() as conn:
-            await conn.execute('UPDATE chapters SET views = views + 1 WHERE id = $1', chapter_id)
+        token = _request_writes.set(writes)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_writes.reset(token)
 
 # Создаем глобальный экземпляр базы данных
 db = Database()
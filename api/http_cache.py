@@ -0,0 +1,156 @@
+"""
+HTTP conditional requests for Novels Reader
+
+ETag и Last-Modified считаются из ключевых полей строк (id, updated_at),
+а не из тела ответа, поэтому 304 можно отдать, не собирая JSON.
+Cache-Control подобран по маршрутам: s-maxage и stale-while-revalidate
+позволяют edge-кешу Vercel отвечать на повторы без вызова функции.
+"""
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Iterable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# Опубликованная глава почти не меняется, новелла меняется со счетчиками,
+# списки - с каждой новой главой
+CACHE_CONTROL = {
+    "chapter": "public, max-age=60, s-maxage=300, stale-while-revalidate=86400",
+    "novel": "public, max-age=0, s-maxage=30, stale-while-revalidate=300",
+    "list": "public, max-age=0, s-maxage=15, stale-while-revalidate=60",
+    "toc": "public, max-age=0, s-maxage=60, stale-while-revalidate=600",
+}
+
+
+# Кодировки, суффикс которых снимается при сравнении ETag
+ENCODINGS = ("br", "gzip")
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def encoded_etag(etag: Optional[str], encoding: str) -> Optional[str]:
+    """
+    ETag сжатого представления. Сильный ETag у identity, gzip и br должен
+    различаться (RFC 9110, 8.8.3), поэтому к нему дописывается кодировка
+    """
+    if not etag or etag.startswith("W/"):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _base_etag(tag: str) -> str:
+    tag = tag.strip().removeprefix("W/")
+    for encoding in ENCODINGS:
+        suffix = f'-{encoding}"'
+        if tag.endswith(suffix):
+            return tag[:-len(suffix)] + '"'
+    return tag
+
+
+def list_validators(rows: Iterable[Any], *keys: str, extra: Any = None) -> Tuple[str, Optional[datetime]]:
+    """ETag по ключам всех строк и Last-Modified по самой свежей дате"""
+    parts = [tuple(row[key] for key in keys) for row in rows]
+    dates = [value for part in parts for value in part if isinstance(value, datetime)]
+    return make_etag(extra, parts), max(dates) if dates else None
+
+
+def http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def is_not_modified(request: Request, etag: Optional[str], last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match важнее If-Modified-Since (RFC 9110, 13.2.2)
+        if not etag:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        # Сравнение слабое: подходит ETag любого представления того же ответа
+        tags = [_base_etag(tag) for tag in if_none_match.split(",")]
+        return _base_etag(etag) in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def has_conditions(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def _headers(etag: Optional[str], last_modified: Optional[datetime], cache_control: str):
+    headers = {"Cache-Control": cache_control}
+    if etag:
+        headers["ETag"] = etag
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def not_modified(etag: Optional[str], last_modified: Optional[datetime], cache_control: str) -> Response:
+    return Response(status_code=304, headers=_headers(etag, last_modified, cache_control))
+
+
+def conditional_response(
+    request: Request,
+    body,
+    etag: Optional[str],
+    last_modified: Optional[datetime],
+    cache_control: str
+) -> Response:
+    """
+    Ответ с валидаторами или 304. body может быть функцией без аргументов,
+    тогда тело собирается только если оно действительно нужно.
+    """
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified, cache_control)
+    if callable(body):
+        body = body()
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers=_headers(etag, last_modified, cache_control)
+    )
+
+
+def encoded_response(
+    body: bytes,
+    encoding: str,
+    etag: Optional[str],
+    last_modified: Optional[datetime],
+    cache_control: str
+) -> Response:
+    """Ответ с уже сжатым телом; middleware сжатия его не трогает"""
+    headers = _headers(encoded_etag(etag, encoding), last_modified, cache_control)
+    headers["Content-Encoding"] = encoding
+    headers["Vary"] = "Accept-Encoding"
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def pack(etag: Optional[str], last_modified: Optional[datetime], body: bytes) -> bytes:
+    """Упаковывает валидаторы вместе с телом для хранения в кеше ответов"""
+    meta = {"etag": etag, "last_modified": last_modified.isoformat() if last_modified else None}
+    return json.dumps(meta).encode() + b"\n" + body
+
+
+def unpack(value: bytes) -> Tuple[Optional[str], Optional[datetime], bytes]:
+    meta, body = value.split(b"\n", 1)
+    meta = json.loads(meta)
+    last_modified = meta["last_modified"]
+    return meta["etag"], datetime.fromisoformat(last_modified) if last_modified else None, body
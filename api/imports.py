@@ -0,0 +1,129 @@
+"""
+Bulk chapter import for Novels Reader
+
+Главы приходят потоком NDJSON (одна глава JSON-объектом на строку) в теле
+запроса или файлом в multipart-форме. И то и другое разбирается по мере
+чтения тела: ни загрузка, ни форма целиком в памяти или на диске не держатся.
+"""
+import os
+from typing import AsyncIterable, AsyncIterator, List, Optional, Tuple
+
+from multipart.multipart import MultipartParser, parse_options_header
+
+# Одна строка - одна глава; ограничение защищает от строки без переводов
+MAX_LINE_BYTES = int(os.getenv('IMPORT_MAX_LINE_BYTES', str(4 * 1024 * 1024)))
+
+
+class InvalidImport(ValueError):
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+
+class InvalidUpload(ValueError):
+    pass
+
+
+async def iter_lines(chunks: AsyncIterable[bytes], max_line_bytes: int = MAX_LINE_BYTES) -> AsyncIterator[Tuple[int, bytes]]:
+    """Режет поток байт на непустые строки, возвращает (номер строки, строка)"""
+    # Хвост без перевода строки; новые куски дописываются в bytearray,
+    # а перевод строки ищется только в только что пришедших байтах
+    buffer = bytearray()
+    number = 0
+    async for chunk in chunks:
+        scan = len(buffer)
+        buffer += chunk
+        start = 0
+        end = buffer.find(b"\n", scan)
+        while end >= 0:
+            number += 1
+            # Строка могла прийти целиком внутри одного куска
+            if end - start > max_line_bytes:
+                raise InvalidImport(number, "line is too long")
+            line = bytes(buffer[start:end])
+            if line.strip():
+                yield number, line
+            start = end + 1
+            end = buffer.find(b"\n", start)
+        if start:
+            del buffer[:start]
+        # Длинная глава пришла не целиком, ждем конец строки
+        if len(buffer) > max_line_bytes:
+            raise InvalidImport(number + 1, "line is too long")
+    if buffer.strip():
+        yield number + 1, bytes(buffer)
+
+
+class _FilePart:
+    """Колбэки парсера multipart: собирает куски нужного поля формы"""
+
+    def __init__(self, field: str):
+        self.field = field.encode()
+        self.found = False
+        self.pieces: List[bytes] = []
+        self._current = False
+        self._headers = {}
+        self._header_field = b""
+        self._header_value = b""
+
+    def callbacks(self):
+        return {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+        }
+
+    def _on_part_begin(self):
+        self._headers = {}
+        self._current = False
+
+    def _on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._current = options.get(b"name") == self.field
+        self.found = self.found or self._current
+
+    def _on_part_data(self, data: bytes, start: int, end: int):
+        if self._current:
+            self.pieces.append(data[start:end])
+
+
+async def iter_multipart_file(
+    chunks: AsyncIterable[bytes],
+    content_type: str,
+    field: str = "file"
+) -> AsyncIterator[bytes]:
+    """
+    Содержимое файла field из multipart-формы по мере прихода тела запроса.
+    request.form() сначала целиком сохранил бы форму, здесь в памяти
+    одновременно один кусок тела
+    """
+    _, options = parse_options_header(content_type)
+    boundary: Optional[bytes] = options.get(b"boundary")
+    if not boundary:
+        raise InvalidUpload("Missing multipart boundary")
+
+    part = _FilePart(field)
+    parser = MultipartParser(boundary, part.callbacks())
+    async for chunk in chunks:
+        parser.write(chunk)
+        if part.pieces:
+            yield b"".join(part.pieces)
+            part.pieces.clear()
+    parser.finalize()
+    if part.pieces:
+        yield b"".join(part.pieces)
+    if not part.found:
+        raise InvalidUpload(f"Form field `{field}` is required")
@@ -0,0 +1,91 @@
+"""
+Server-side reading progress for Novels Reader
+
+Прогресс чтения меняется при каждой прокрутке главы, поэтому он не пишется
+в базу сразу: буфер держит последнюю позицию на пару (пользователь, новелла)
+и периодически сбрасывает все накопленное одним upsert. Читающий пользователь
+дает несколько записей в минуту, а не запись на каждое событие прокрутки.
+"""
+import os
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from api.buffers import BufferedFlusher
+
+Progress = Tuple[int, Optional[int], datetime]
+
+
+class ProgressBuffer(BufferedFlusher):
+    name = "reading progress"
+
+    def __init__(self, flush_interval: Optional[float] = None, max_pending: Optional[int] = None):
+        super().__init__(
+            flush_interval if flush_interval is not None else float(os.getenv('PROGRESS_FLUSH_INTERVAL', '15')),
+            max_pending if max_pending is not None else int(os.getenv('PROGRESS_MAX_PENDING', '5000'))
+        )
+        self._pending: Dict[Tuple[str, int], Progress] = {}
+
+    def add(self, user_id: str, novel_id: int, chapter_id: int, position: Optional[int] = None,
+            updated_at: Optional[datetime] = None):
+        """Запоминает позицию; более старая запись не затирает более новую"""
+        now = datetime.now(timezone.utc)
+        if updated_at is None:
+            updated_at = now
+        else:
+            if updated_at.tzinfo is None:
+                updated_at = updated_at.replace(tzinfo=timezone.utc)
+            # Часы клиента могут спешить: время из будущего закрепило бы позицию
+            updated_at = min(updated_at, now)
+        key = (user_id, novel_id)
+        current = self._pending.get(key)
+        if current is None or current[2] <= updated_at:
+            self._pending[key] = (chapter_id, position, updated_at)
+        self._added()
+
+    def pending(self, user_id: str) -> Dict[int, Progress]:
+        """Еще не записанный прогресс пользователя, чтобы чтение видело свои записи"""
+        return {
+            novel_id: progress for (owner, novel_id), progress in self._pending.items()
+            if owner == user_id
+        }
+
+    async def _write(self, database, pending: Dict[Tuple[str, int], Progress]):
+        users, novels, chapters, positions, dates = [], [], [], [], []
+        for (user_id, novel_id), (chapter_id, position, updated_at) in pending.items():
+            users.append(user_id)
+            novels.append(novel_id)
+            chapters.append(chapter_id)
+            positions.append(position)
+            dates.append(updated_at)
+        async with database.acquire() as conn:
+            # Главы и новеллы могли удалить, пока прогресс лежал в буфере
+            await conn.execute('''
+                INSERT INTO user_library AS l (
+                    user_id, novel_id, last_chapter_id, position, progress_updated_at
+                )
+                SELECT p.user_id, p.novel_id, c.id, p.position, p.updated_at
+                FROM unnest($1::text[], $2::int[], $3::int[], $4::int[], $5::timestamptz[])
+                    AS p(user_id, novel_id, chapter_id, position, updated_at)
+                JOIN novels n ON n.id = p.novel_id
+                LEFT JOIN chapters c ON c.id = p.chapter_id AND c.novel_id = p.novel_id
+                ORDER BY p.user_id, p.novel_id
+                ON CONFLICT (user_id, novel_id) DO UPDATE SET
+                    last_chapter_id = EXCLUDED.last_chapter_id,
+                    position = EXCLUDED.position,
+                    progress_updated_at = EXCLUDED.progress_updated_at
+                WHERE l.progress_updated_at IS NULL
+                   OR l.progress_updated_at <= EXCLUDED.progress_updated_at
+            ''', users, novels, chapters, positions, dates)
+
+    def _requeue(self, pending: Dict[Tuple[str, int], Progress]):
+        # Возвращаем в буфер то, что не перекрыто более свежими записями
+        for key, progress in pending.items():
+            current = self._pending.get(key)
+            if current is None:
+                if len(self._pending) < self.max_pending:
+                    self._pending[key] = progress
+            elif current[2] < progress[2]:
+                self._pending[key] = progress
+
+
+progress_buffer = ProgressBuffer()
@@ -1,24 +1,91 @@
-```python
 """
 Main API routes for Novels Reader
 """
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 import json
 from pydantic import BaseModel
+from contextlib import asynccontextmanager
+import asyncio
+import logging
 import os
+import time
 import asyncpg
 
+from api.database import CHAPTER_NEIGHBOURS, LAST_WRITE_HEADER, ReadYourWritesMiddleware, db
+from api.migrate import ensure_schema
+from api.views import novel_views, chapter_views
+from api.library import progress_buffer
+from api.pagination import InvalidCursor, decode_cursor, next_cursor
+from api import search
+from api.cache import cache
+from api.responses import FastJSONResponse, dumps
+from api.http_cache import (
+    CACHE_CONTROL, conditional_response, encoded_response, has_conditions,
+    list_validators, make_etag, not_modified, is_not_modified, pack, unpack
+)
+from api.compression import CompressionMiddleware, available_encodings, choose_encoding, compress
+from api import metrics
+from api.admission import AdmissionMiddleware, admission
+from api.auth import INIT_DATA_HEADER, InvalidInitData, scope_user_id
+from api.tags import MAX_NOVEL_TAGS, MAX_TAG_LENGTH, normalize_names, novels_filter, tag_catalog
+
+logger = logging.getLogger(__name__)
+
+# Общий пул соединений живет все время работы процесса,
+# схема проверяется один раз при старте
+async def warmup() -> Dict[str, Any]:
+    """
+    Поднимает пулы, проверяет схему и делает пробный запрос. Возвращает,
+    был ли инстанс холодным, и время каждого шага в миллисекундах
+    """
+    cold = db.pool is None
+    timings = {}
+    started = time.perf_counter()
+    await db.connect()
+    timings["pool_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    await ensure_schema(db)
+    timings["schema_ms"] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    async with db.acquire() as conn:
+        await conn.execute("SELECT 1")
+    timings["ping_ms"] = (time.perf_counter() - started) * 1000
+    return {"cold": cold, **timings}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await warmup()
+    try:
+        yield
+    finally:
+        # Дописываем накопленные просмотры и прогресс до закрытия пула
+        await novel_views.stop()
+        await chapter_views.stop()
+        await progress_buffer.stop()
+        await db.close()
+
 # Создаем экземпляр FastAPI
 app = FastAPI(
     title="Novels Reader API",
     description="API для чтения и публикации переводов корейских новелл",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# Очереди и rate limit по классам маршрутов; внутри CORS, чтобы отказы
+# тоже несли CORS-заголовки
+app.add_middleware(AdmissionMiddleware)
+
+# Время последней записи клиента для чтения своих записей на любом инстансе
+app.add_middleware(ReadYourWritesMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -26,8 +93,47 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[LAST_WRITE_HEADER],
 )
 
+# Сжатие ответов (br/gzip) для медленных мобильных клиентов
+app.add_middleware(CompressionMiddleware)
+
+# Время ответа и размер тела (уже сжатого) по маршрутам для /api/metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Время жизни кеша ответов по маршрутам, в секундах
+CACHE_TTL = {
+    "novels": float(os.getenv("CACHE_TTL_NOVELS", "30")),
+    "novel": float(os.getenv("CACHE_TTL_NOVEL", "60")),
+    "latest": float(os.getenv("CACHE_TTL_LATEST", "15")),
+    "stats": float(os.getenv("CACHE_TTL_STATS", "60")),
+}
+
+# Размер страницы списков и поиска: без верхней границы один запрос
+# выбирал бы и ранжировал сколько угодно строк
+LIST_MAX_LIMIT = 100
+
+# Сколько новелл можно запросить одним /api/novels/batch
+BATCH_MAX_NOVELS = int(os.getenv("BATCH_MAX_NOVELS", "100"))
+
+# Сколько подписок и закладок клиент может прислать в /api/library/sync.
+# Это вся его библиотека, поэтому лимит больше, чем у пачки
+LIBRARY_MAX_NOVELS = int(os.getenv("LIBRARY_MAX_NOVELS", "1000"))
+
+# Сколько абзацев главы отдается одним запросом диапазона
+CHAPTER_RANGE_DEFAULT = 50
+CHAPTER_RANGE_MAX = 500
+
+# Хранить ли сжатую копию главы, подготовленную при публикации
+PRECOMPRESS_CHAPTERS = os.getenv("CHAPTER_PRECOMPRESS", "1") == "1"
+
+# Предзагрузка глав: сколько глав и сколько байт текста в одном ответе
+BUNDLE_MAX_CHAPTERS = int(os.getenv("BUNDLE_MAX_CHAPTERS", "10"))
+BUNDLE_MAX_BYTES = int(os.getenv("BUNDLE_MAX_BYTES", str(1024 * 1024)))
+# Максимальный id (integer в Postgres): курсор без after_id - после всех глав с номером after
+INT_MAX = 2 ** 31 - 1
+
 # Модели данных
 class TranslatorCreate(BaseModel):
     user_id: str
@@ -47,72 +153,62 @@ class ChapterCreate(BaseModel):
     title: str
     content: str
 
-# Database connection
-async def get_db():
-    return await asyncpg.create_pool(
-        os.environ["DATABASE_URL"],
-        min_size=1,
-        max_size=1
-    )
+class NovelBatchItem(BaseModel):
+    novel_id: int
+    last_read_chapter_id: Optional[int] = None
 
-# Функция для создания таблиц
-async def ensure_tables(pool):
-    async with pool.acquire() as conn:
-        # Проверяем существование таблиц
-        exists = await conn.fetchval("""
-            SELECT EXISTS (
-                SELECT FROM information_schema.tables 
-                WHERE table_name = 'novels'
-            )
-        """)
-        
-        if not exists:
-            # Таблица переводчиков
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS translators (
-                    user_id TEXT PRIMARY KEY,
-                    username TEXT,
-                    display_name TEXT NOT NULL,
-                    bio TEXT,
-                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # Таблица новелл
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS novels (
-                    id SERIAL PRIMARY KEY,
-                    title TEXT NOT NULL,
-                    description TEXT,
-                    cover_url TEXT,
-                    translator_id TEXT REFERENCES translators(user_id),
-                    status TEXT DEFAULT 'ongoing',
-                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                    views INTEGER DEFAULT 0,
-                    subscribers_count INTEGER DEFAULT 0,
-                    chapters_count INTEGER DEFAULT 0
-                )
-            ''')
-
-            # Таблица глав
-            await conn.execute('''
-                CREATE TABLE IF NOT EXISTS chapters (
-                    id SERIAL PRIMARY KEY,
-                    novel_id INTEGER REFERENCES novels(id) ON DELETE CASCADE,
-                    chapter_number INTEGER NOT NULL,
-                    title TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                    views INTEGER DEFAULT 0
-                )
-            ''')
+class NovelBatchRequest(BaseModel):
+    items: List[NovelBatchItem]
+
+class ProgressUpdate(BaseModel):
+    novel_id: int
+    chapter_id: int
+    position: Optional[int] = None
+    updated_at: Optional[datetime] = None
+
+class ProgressBatch(BaseModel):
+    items: List[ProgressUpdate]
+
+class LibrarySync(BaseModel):
+    subscriptions: List[int] = []
+    bookmarks: List[int] = []
+    # Удаления, которые клиент не смог отправить сразу
+    removed_subscriptions: List[int] = []
+    removed_bookmarks: List[int] = []
+    progress: List[ProgressUpdate] = []
+
+class NovelTagsUpdate(BaseModel):
+    tags: List[str]
+
+# Telegram id пользователя из подписанной initData (см. api/auth.py).
+# Для просмотров и выбора реплики неверная подпись равна анонимному запросу
+def get_user_id(request: Request) -> Optional[str]:
+    try:
+        return scope_user_id(request.scope)
+    except InvalidInitData:
+        return None
+
+# Библиотека пользователя доступна только с проверенной подписью
+def require_user_id(request: Request) -> str:
+    try:
+        user_id = scope_user_id(request.scope)
+    except InvalidInitData as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    if not user_id:
+        raise HTTPException(status_code=401, detail=f"{INIT_DATA_HEADER} header is required")
+    return user_id
+
+# Разбор курсора пагинации из query-параметра
+def parse_cursor(cursor: str, types):
+    try:
+        return decode_cursor(cursor, types)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 # Обработчики ошибок
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=500,
         content={
             "status": "error",
@@ -123,7 +219,7 @@ async def global_exception_handler(request, exc):
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=exc.status_code,
         content={
             "status": "error",
@@ -135,76 +231,85 @@ async def http_exception_handler(request, exc):
 # Роуты для переводчиков
 @app.post("/api/translators")
 async def create_translator(data: TranslatorCreate):
-    pool = await get_db()
     try:
-        await ensure_tables(pool)
-        async with pool.acquire() as conn:
+        await ensure_schema()
+        async with db.acquire() as conn:
             translator = await conn.fetchrow("""
                 INSERT INTO translators (user_id, username, display_name, bio)
                 VALUES ($1, $2, $3, $4)
                 RETURNING *
             """, data.user_id, data.username, data.display_name, data.bio)
-            return JSONResponse(content={"status": "success", "data": dict(translator)})
+        db.mark_write(data.user_id, shared=True)
+        return FastJSONResponse(content={"status": "success", "data": translator})
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        await pool.close()
 
 @app.get("/api/translators/{user_id}")
-async def get_translator(user_id: str):
-    pool = await get_db()
-    try:
-        await ensure_tables(pool)
-        async with pool.acquire() as conn:
-            translator = await conn.fetchrow(
-                "SELECT * FROM translators WHERE user_id = $1",
-                user_id
-            )
-            if not translator:
-                raise HTTPException(status_code=404, detail="Translator not found")
-            return JSONResponse(content={"status": "success", "data": dict(translator)})
-    finally:
-        await pool.close()
+async def get_translator(user_id: str, request: Request):
+    await ensure_schema()
+    async with db.acquire(readonly=True, user_id=get_user_id(request)) as conn:
+        translator = await conn.fetchrow(
+            "SELECT * FROM translators WHERE user_id = $1",
+            user_id
+        )
+        if not translator:
+            raise HTTPException(status_code=404, detail="Translator not found")
+        return FastJSONResponse(content={"status": "success", "data": translator})
 
 @app.get("/api/translators/{user_id}/stats")
 async def get_translator_stats(user_id: str):
-    pool = await get_db()
-    try:
-        await ensure_tables(pool)
-        async with pool.acquire() as conn:
+    async def load():
+        await ensure_schema()
+        async with db.acquire(readonly=True, cached=True) as conn:
+            # Счетчики поддерживаются триггерами, см. миграцию 0007
             stats = await conn.fetchrow("""
-                SELECT 
-                    COUNT(*) as novels_count,
-                    COALESCE(SUM(chapters_count), 0) as chapters_count,
-                    COALESCE(SUM(subscribers_count), 0) as subscribers_count,
-                    COALESCE(SUM(views), 0) as total_views
-                FROM novels 
+                SELECT novels_count, chapters_count, subscribers_count, total_views
+                FROM translator_stats
                 WHERE translator_id = $1
             """, user_id)
-            return JSONResponse(content={
+            return dumps({
                 "status": "success",
-                "data": dict(stats) if stats else {
+                "data": stats if stats else {
                     "novels_count": 0,
                     "chapters_count": 0,
                     "subscribers_count": 0,
                     "total_views": 0
                 }
             })
-    finally:
-        await pool.close()
 
-# Роуты для новелл
+    body = await cache.get_or_set(f"stats:{user_id}", CACHE_TTL["stats"], load)
+    return Response(content=body, media_type="application/json")
+
 @app.get("/api/novels")
 async def get_novels(
-    page: int = 1,
-    limit: int = 20,
+    request: Request,
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=LIST_MAX_LIMIT),
+    cursor: Optional[str] = None,
     translator_id: Optional[str] = None,
-    ids: Optional[str] = None
+    ids: Optional[str] = None,
+    tags: Optional[str] = None,
+    tags_mode: str = "all"
 ):
-    pool = await get_db()
-    try:
-        await ensure_tables(pool)
-        async with pool.acquire() as conn:
+    if tags_mode not in ("all", "any"):
+        raise HTTPException(status_code=400, detail="tags_mode must be 'all' or 'any'")
+    after = parse_cursor(cursor, (datetime, int)) if cursor else None
+
+    # Имена тегов переводятся в id по словарю в памяти, без JOIN с tags.
+    # Неизвестный тег в режиме all означает пустой результат, пустой
+    # список имен (tags="," или " ") - отсутствие фильтра
+    tag_ids = None
+    tag_names = normalize_names(tags.split(",")) if tags else []
+    if tag_names:
+        await ensure_schema()
+        await tag_catalog.refresh()
+        found = tag_catalog.ids(tag_names)
+        known = sorted({tag_id for tag_id in found if tag_id is not None})
+        tag_ids = known if tags_mode == "any" or len(known) == len(found) else []
+
+    async def load():
+        await ensure_schema()
+        async with db.acquire(readonly=True, cached=True) as conn:
             query = "SELECT n.*, t.display_name as translator_name FROM novels n LEFT JOIN translators t ON n.translator_id = t.user_id"
             params = []
             conditions = []
@@ -218,105 +323,478 @@ async def get_novels(
                 conditions.append(f"n.id = ANY(${len(params) + 1})")
                 params.append(id_list)
 
+            if tag_ids is not None:
+                conditions.append(novels_filter("n.id", tag_ids, tags_mode, params))
+
+            # Keyset-пагинация; page оставлен для старых клиентов
+            if after:
+                conditions.append(f"(n.updated_at, n.id) < (${len(params) + 1}, ${len(params) + 2})")
+                params.extend(after)
+
             if conditions:
                 query += " WHERE " + " AND ".join(conditions)
 
-            query += f" ORDER BY n.updated_at DESC LIMIT ${len(params) + 1} OFFSET ${len(params) + 2}"
-            params.extend([limit, (page - 1) * limit])
+            query += f" ORDER BY n.updated_at DESC, n.id DESC LIMIT ${len(params) + 1}"
+            params.append(limit)
+            if not after:
+                query += f" OFFSET ${len(params) + 1}"
+                params.append((page - 1) * limit)
 
             novels = await conn.fetch(query, *params)
-            return JSONResponse(content={"status": "success", "data": [dict(n) for n in novels]})
-    finally:
-        await pool.close()
+            etag, last_modified = list_validators(novels, "id", "updated_at")
+            return pack(etag, last_modified, dumps({
+                "status": "success",
+                "data": novels,
+                "next_cursor": next_cursor(novels, limit, ("updated_at", "id"))
+            }))
+
+    # Списки по ids у каждого пользователя свои, их не кешируем
+    if ids:
+        value = await load()
+    else:
+        key = f"novels:{page}:{limit}:{cursor}:{translator_id}"
+        if tag_ids is not None:
+            key += f":{tags_mode}:{','.join(map(str, tag_ids))}"
+        value = await cache.get_or_set(key, CACHE_TTL["novels"], load)
+
+    etag, last_modified, body = unpack(value)
+    return conditional_response(request, body, etag, last_modified, CACHE_CONTROL["list"])
+
+@app.get("/api/novels/search")
+async def search_novels(
+    request: Request,
+    query: str,
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=LIST_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    tags: Optional[str] = None
+):
+    query = query.strip()
+    if not query:
+        return FastJSONResponse(content={"status": "success", "data": [], "next_cursor": None})
+
+    after = parse_cursor(cursor, (str, float, int)) if cursor else None
+    tag_list = [tag.strip() for tag in tags.split(",") if tag.strip()] if tags else None
+
+    await ensure_schema()
+    async with db.acquire(readonly=True, user_id=get_user_id(request)) as conn:
+        novels, cursor = await search.search_novels(
+            conn, query,
+            limit=limit,
+            after=after,
+            offset=0 if after else (page - 1) * limit,
+            tags=tag_list
+        )
+        return FastJSONResponse(content={"status": "success", "data": novels, "next_cursor": cursor})
+
+@app.post("/api/novels/batch")
+async def get_novels_batch(data: NovelBatchRequest, request: Request):
+    """
+    Подписки и закладки одним запросом: карточка новеллы, последняя глава
+    и число непрочитанных глав после last_read_chapter_id, в порядке запроса
+    """
+    items = list({item.novel_id: item for item in data.items}.values())
+    if len(items) > BATCH_MAX_NOVELS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_NOVELS} novels per batch")
+    if not items:
+        return FastJSONResponse(content={"status": "success", "data": []})
+
+    await ensure_schema()
+    async with db.acquire(readonly=True, user_id=get_user_id(request)) as conn:
+        novels = await conn.fetch("""
+            SELECT
+                n.id,
+                n.title,
+                n.cover_url,
+                n.status,
+                n.updated_at,
+                n.views,
+                n.subscribers_count,
+                n.chapters_count,
+                n.translator_id,
+                t.display_name as translator_name,
+                latest.id as latest_chapter_id,
+                latest.chapter_number as latest_chapter_number,
+                latest.title as latest_chapter_title,
+                latest.created_at as latest_chapter_at,
+                CASE WHEN lr.id IS NULL THEN n.chapters_count ELSE unread.count END as unread_count
+            FROM unnest($1::int[], $2::int[]) WITH ORDINALITY AS r(novel_id, last_read_id, position)
+            JOIN novels n ON n.id = r.novel_id
+            LEFT JOIN translators t ON n.translator_id = t.user_id
+            LEFT JOIN chapters lr ON lr.id = r.last_read_id AND lr.novel_id = n.id
+            LEFT JOIN LATERAL (
+                SELECT c.id, c.chapter_number, c.title, c.created_at
+                FROM chapters c
+                WHERE c.novel_id = n.id
+                ORDER BY c.chapter_number DESC, c.id DESC
+                LIMIT 1
+            ) latest ON true
+            LEFT JOIN LATERAL (
+                SELECT COUNT(*) as count
+                FROM chapters c
+                WHERE lr.id IS NOT NULL
+                  AND c.novel_id = n.id
+                  AND (c.chapter_number, c.id) > (lr.chapter_number, lr.id)
+            ) unread ON true
+            ORDER BY r.position
+        """, [item.novel_id for item in items], [item.last_read_chapter_id for item in items])
+        return FastJSONResponse(content={"status": "success", "data": novels})
 
 @app.post("/api/novels")
 async def create_novel(data: NovelCreate):
-    pool = await get_db()
     try:
-        await ensure_tables(pool)
-        async with pool.acquire() as conn:
+        await ensure_schema()
+        async with db.acquire() as conn:
             novel = await conn.fetchrow("""
                 INSERT INTO novels (title, description, cover_url, translator_id)
                 VALUES ($1, $2, $3, $4)
                 RETURNING *
             """, data.title, data.description, data.cover_url, data.translator_id)
-            return JSONResponse(content={"status": "success", "data": dict(novel)})
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        await pool.close()
+
+    db.mark_write(data.translator_id, shared=True)
+    await cache.invalidate_prefix("novels:")
+    await cache.invalidate(f"stats:{data.translator_id}")
+    return Response(content=dumps({"status": "success", "data": novel}), media_type="application/json")
 
 @app.get("/api/novels/{novel_id}")
-async def get_novel(novel_id: int):
-    pool = await get_db()
-    try:
-        await ensure_tables(pool)
-        async with pool.acquire() as conn:
+async def get_novel(novel_id: int, request: Request):
+    async def load():
+        await ensure_schema()
+        async with db.acquire(readonly=True, cached=True) as conn:
             novel = await conn.fetchrow("""
-                SELECT n.*, t.display_name as translator_name 
+                SELECT n.*, t.display_name as translator_name,
+                    ARRAY(
+                        SELECT tg.name FROM novel_tags nt
+                        JOIN tags tg ON tg.id = nt.tag_id
+                        WHERE nt.novel_id = n.id
+                        ORDER BY tg.name
+                    ) AS tags
                 FROM novels n 
                 LEFT JOIN translators t ON n.translator_id = t.user_id 
                 WHERE n.id = $1
             """, novel_id)
             if not novel:
                 raise HTTPException(status_code=404, detail="Novel not found")
-            
-            # Увеличиваем счетчик просмотров
-            await conn.execute(
-                "UPDATE novels SET views = views + 1 WHERE id = $1",
-                novel_id
-            )
-            return JSONResponse(content={"status": "success", "data": dict(novel)})
-    finally:
-        await pool.close()
+            # Теги меняются без updated_at, поэтому входят в ETag отдельно
+            etag = make_etag("novel", novel["id"], novel["updated_at"], novel["tags"])
+            return pack(etag, novel["updated_at"], dumps({"status": "success", "data": novel}))
+
+    value = await cache.get_or_set(f"novel:{novel_id}", CACHE_TTL["novel"], load)
+
+    # Увеличиваем счетчик просмотров (запишется в базу пачкой)
+    novel_views.add(novel_id, get_user_id(request))
+
+    etag, last_modified, body = unpack(value)
+    return conditional_response(request, body, etag, last_modified, CACHE_CONTROL["novel"])
 
 @app.delete("/api/novels/{novel_id}")
-async def delete_novel(novel_id: int):
-    pool = await get_db()
-    try:
-        await ensure_tables(pool)
-        async with pool.acquire() as conn:
-            result = await conn.execute(
-                "DELETE FROM novels WHERE id = $1",
-                novel_id
+async def delete_novel(novel_id: int, request: Request):
+    await ensure_schema()
+    async with db.acquire() as conn:
+        deleted = await conn.fetchrow(
+            "DELETE FROM novels WHERE id = $1 RETURNING translator_id",
+            novel_id
+        )
+        if not deleted:
+            raise HTTPException(status_code=404, detail="Novel not found")
+
+    db.mark_write(get_user_id(request), shared=True)
+    tag_catalog.invalidate()
+    await cache.invalidate_prefix("novels:", "latest:")
+    await cache.invalidate(f"novel:{novel_id}", f"stats:{deleted['translator_id']}")
+    return FastJSONResponse(content={"status": "success"})
+
+# Роуты для тегов
+@app.get("/api/tags")
+async def get_tags(request: Request):
+    """Все теги с числом новелл, для фильтра каталога"""
+    await ensure_schema()
+    await tag_catalog.refresh()
+    return conditional_response(
+        request,
+        lambda: dumps({"status": "success", "data": tag_catalog.facets()}),
+        tag_catalog.etag, None, CACHE_CONTROL["list"]
+    )
+
+@app.get("/api/novels/{novel_id}/tags")
+async def get_novel_tags(novel_id: int, request: Request):
+    await ensure_schema()
+    await tag_catalog.refresh()
+    async with db.acquire(readonly=True, user_id=get_user_id(request)) as conn:
+        rows = await conn.fetch("SELECT tag_id FROM novel_tags WHERE novel_id = $1", novel_id)
+    names = await tag_catalog.names(row["tag_id"] for row in rows)
+    return FastJSONResponse(content={"status": "success", "data": names})
+
+@app.put("/api/novels/{novel_id}/tags")
+async def update_novel_tags(novel_id: int, data: NovelTagsUpdate, request: Request):
+    """Заменяет теги новеллы целиком; новые имена тегов создаются"""
+    names = normalize_names(data.tags)
+    if len(names) > MAX_NOVEL_TAGS or any(len(name) > MAX_TAG_LENGTH for name in names):
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_NOVEL_TAGS} tags of up to {MAX_TAG_LENGTH} characters"
+        )
+
+    await ensure_schema()
+    async with db.acquire() as conn:
+        # Один оператор: недостающие теги создаются, лишние связи удаляются,
+        # новые вставляются. DO UPDATE нужен, чтобы RETURNING отдал и уже
+        # существующие теги; имена уникальны, повторов во вставке нет
+        result = await conn.fetchrow("""
+            WITH novel AS (
+                SELECT id FROM novels WHERE id = $1
+            ),
+            wanted AS (
+                INSERT INTO tags (name)
+                SELECT unnest($2::text[]) WHERE EXISTS (SELECT 1 FROM novel)
+                ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name
+                RETURNING id, name
+            ),
+            removed AS (
+                DELETE FROM novel_tags
+                WHERE novel_id = (SELECT id FROM novel)
+                  AND tag_id NOT IN (SELECT id FROM wanted)
+            ),
+            added AS (
+                INSERT INTO novel_tags (novel_id, tag_id)
+                SELECT novel.id, wanted.id FROM novel, wanted
+                ON CONFLICT DO NOTHING
             )
-            if result == "DELETE 0":
-                raise HTTPException(status_code=404, detail="Novel not found")
-            return JSONResponse(content={"status": "success"})
-    finally:
-        await pool.close()
+            SELECT
+                EXISTS (SELECT 1 FROM novel) AS found,
+                ARRAY(SELECT name FROM wanted ORDER BY name) AS tags
+        """, novel_id, names)
+    if not result["found"]:
+        raise HTTPException(status_code=404, detail="Novel not found")
+
+    db.mark_write(get_user_id(request), shared=True)
+    tag_catalog.invalidate()
+    await cache.invalidate_prefix("novels:")
+    await cache.invalidate(f"novel:{novel_id}")
+    return FastJSONResponse(content={"status": "success", "data": result["tags"]})
 
-# Роуты для глав
 @app.get("/api/chapters/latest")
 async def get_latest_chapters(
-    page: int = 1,
-    limit: int = 20
+    request: Request,
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=LIST_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    subscribed_only: bool = False
 ):
-    pool = await get_db()
+    after = parse_cursor(cursor, (datetime, int)) if cursor else None
+    user_id = require_user_id(request) if subscribed_only else None
+
+    # Лента читается из feed_entries (см. миграцию 0010): без JOIN и без текста глав
+    async def load():
+        await ensure_schema()
+        async with db.acquire(readonly=True, user_id=user_id, cached=not subscribed_only) as conn:
+            query = """
+                SELECT
+                    f.chapter_id as id,
+                    f.novel_id,
+                    f.chapter_number,
+                    f.chapter_title as title,
+                    f.novel_title,
+                    f.translator_name,
+                    f.created_at
+                FROM feed_entries f
+            """
+            conditions = []
+            params: List[Any] = [limit]
+            if subscribed_only:
+                params.append(user_id)
+                conditions.append(f"""f.novel_id IN (
+                    SELECT novel_id FROM user_library WHERE user_id = ${len(params)} AND subscribed
+                )""")
+            if after:
+                params.extend(after)
+                conditions.append(f"(f.created_at, f.chapter_id) < (${len(params) - 1}, ${len(params)})")
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            query += " ORDER BY f.created_at DESC, f.chapter_id DESC LIMIT $1"
+            if not after:
+                params.append((page - 1) * limit)
+                query += f" OFFSET ${len(params)}"
+
+            chapters = await conn.fetch(query, *params)
+            etag, last_modified = list_validators(
+                chapters, "id", "created_at", "title", "novel_title", "translator_name",
+                extra=user_id
+            )
+            return pack(etag, last_modified, dumps({
+                "status": "success",
+                "data": chapters,
+                "next_cursor": next_cursor(chapters, limit, ("created_at", "id"))
+            }))
+
+    if subscribed_only:
+        # Лента по подпискам своя у каждого пользователя, в общий кеш не идет
+        value = await load()
+        cache_control = "private, max-age=0"
+    else:
+        value = await cache.get_or_set(f"latest:{page}:{limit}:{cursor}", CACHE_TTL["latest"], load)
+        cache_control = CACHE_CONTROL["list"]
+    etag, last_modified, body = unpack(value)
+    return conditional_response(request, body, etag, last_modified, cache_control)
+
+@app.get("/api/chapters/search")
+async def search_chapters(
+    request: Request,
+    query: str,
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=LIST_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    novel_id: Optional[int] = None
+):
+    query = query.strip()
+    if not query:
+        return FastJSONResponse(content={"status": "success", "data": [], "next_cursor": None})
+
+    after = parse_cursor(cursor, (str, float, int)) if cursor else None
+
+    await ensure_schema()
+    async with db.acquire(readonly=True, user_id=get_user_id(request)) as conn:
+        chapters, cursor = await search.search_chapters(
+            conn, query,
+            limit=limit,
+            after=after,
+            offset=0 if after else (page - 1) * limit,
+            novel_id=novel_id
+        )
+        return FastJSONResponse(content={"status": "success", "data": chapters, "next_cursor": cursor})
+
+@app.get("/api/novels/{novel_id}/chapters")
+async def get_chapters(
+    request: Request,
+    novel_id: int,
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=LIST_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    sort: str = "desc"
+):
+    if sort not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="sort must be 'asc' or 'desc'")
+    after = parse_cursor(cursor, (int, int)) if cursor else None
+
+    await ensure_schema()
+    async with db.acquire(readonly=True, user_id=get_user_id(request)) as conn:
+        # Для списка глав текст не нужен
+        query = """
+            SELECT id, novel_id, chapter_number, title, created_at, updated_at, views
+            FROM chapters
+            WHERE novel_id = $1
+        """
+        params = [novel_id, limit]
+        if after:
+            op = "<" if sort == "desc" else ">"
+            query += f" AND (chapter_number, id) {op} ($3, $4)"
+            params.extend(after)
+
+        query += f" ORDER BY chapter_number {sort.upper()}, id {sort.upper()} LIMIT $2"
+        if not after:
+            query += " OFFSET $3"
+            params.append((page - 1) * limit)
+
+        chapters = await conn.fetch(query, *params)
+
+    etag, last_modified = list_validators(chapters, "id", "updated_at")
+    return conditional_response(
+        request,
+        lambda: dumps({
+            "status": "success",
+            "data": chapters,
+            "next_cursor": next_cursor(chapters, limit, ("chapter_number", "id"))
+        }),
+        etag, last_modified, CACHE_CONTROL["list"]
+    )
+
+@app.get("/api/novels/{novel_id}/toc")
+async def get_toc(novel_id: int, request: Request):
+    await ensure_schema()
+    async with db.acquire(readonly=True, user_id=get_user_id(request)) as conn:
+        # Оглавление целиком, но без текста глав
+        chapters = await conn.fetch("""
+            SELECT id, chapter_number, title, created_at, views
+            FROM chapters
+            WHERE novel_id = $1
+            ORDER BY chapter_number, id
+        """, novel_id)
+
+    etag, last_modified = list_validators(chapters, "id", "chapter_number", "title", "created_at")
+    return conditional_response(
+        request,
+        lambda: dumps({"status": "success", "data": chapters}),
+        etag, last_modified, CACHE_CONTROL["toc"]
+    )
+
+def chapter_etag(chapter) -> str:
+    # Соседи входят в ETag: у последней главы появляется следующая
+    return make_etag(
+        "chapter", chapter["id"], chapter["updated_at"],
+        chapter["prev_chapter_id"], chapter["next_chapter_id"]
+    )
+
+async def compress_chapter(chapter, encoding: str, stored: bool = False) -> bytes:
+    """Сжатый ответ get_chapter"""
+    body = dumps({"status": "success", "data": chapter})
+    # Сжатие не должно блокировать цикл событий
+    return await asyncio.to_thread(compress, body, encoding, stored)
+
+async def save_chapter_blob(conn, chapter, encoding: str, blob: bytes):
+    """Сохраняет сжатую копию главы в chapter_blobs (только основная база)"""
+    # Копию с тем же etag уже могли записать другой воркер или инстанс
+    await conn.execute("""
+        INSERT INTO chapter_blobs (chapter_id, encoding, etag, body)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (chapter_id, encoding) DO UPDATE
+        SET etag = EXCLUDED.etag, body = EXCLUDED.body, created_at = CURRENT_TIMESTAMP
+        WHERE chapter_blobs.etag IS DISTINCT FROM EXCLUDED.etag
+    """, chapter["id"], encoding, chapter_etag(chapter), blob)
+
+async def precompress_chapter(chapter_id: int):
+    """
+    Сжимает главу заранее во всех кодировках, чтобы чтения отдавали готовую
+    копию. Возвращает главу с соседями или None, если ее уже нет
+    """
+    async with db.acquire() as conn:
+        chapter = await conn.fetchrow(f"""
+            SELECT c.*, {CHAPTER_NEIGHBOURS} FROM chapters c WHERE c.id = $1
+        """, chapter_id)
+    if not chapter:
+        return None
+    # Соединение не держим, пока идет медленное сжатие
+    blobs = [
+        (encoding, await compress_chapter(chapter, encoding, stored=True))
+        for encoding in available_encodings()
+    ]
+    async with db.acquire() as conn:
+        for encoding, blob in blobs:
+            await save_chapter_blob(conn, chapter, encoding, blob)
+    return chapter
+
+# Устаревшие копии пересобираются в фоне, не больше одной задачи на главу в процессе
+_precompressing: Dict[int, asyncio.Task] = {}
+
+def schedule_precompress(chapter_id: int):
+    if not PRECOMPRESS_CHAPTERS or chapter_id in _precompressing:
+        return
+    task = asyncio.get_running_loop().create_task(_precompress_in_background(chapter_id))
+    _precompressing[chapter_id] = task
+    task.add_done_callback(lambda _: _precompressing.pop(chapter_id, None))
+
+async def _precompress_in_background(chapter_id: int):
     try:
-        await ensure_tables(pool)
-        async with pool.acquire() as conn:
-            chapters = await conn.fetch("""
-                SELECT 
-                    c.*,
-                    n.title as novel_title,
-                    t.display_name as translator_name
-                FROM chapters c
-                JOIN novels n ON c.novel_id = n.id
-                LEFT JOIN translators t ON n.translator_id = t.user_id
-                ORDER BY c.created_at DESC
-                LIMIT $1 OFFSET $2
-            """, limit, (page - 1) * limit)
-            return JSONResponse(content={"status": "success", "data": [dict(ch) for ch in chapters]})
-    finally:
-        await pool.close()
+        await precompress_chapter(chapter_id)
+    except Exception:
+        logger.exception("Failed to precompress chapter %s", chapter_id)
 
 @app.post("/api/novels/{novel_id}/chapters")
-async def create_chapter(novel_id: int, data: ChapterCreate):
-    pool = await get_db()
+async def create_chapter(novel_id: int, data: ChapterCreate, request: Request):
     try:
-        await ensure_tables(pool)
-        async with pool.acquire() as conn:
+        await ensure_schema()
+        async with db.acquire() as conn:
             async with conn.transaction():
                 # Создаем главу
                 chapter = await conn.fetchrow("""
@@ -325,46 +803,537 @@ async def create_chapter(novel_id: int, data: ChapterCreate):
                     RETURNING *
                 """, novel_id, data.chapter_number, data.title, data.content)
 
-                # Обновляем количество глав и дату обновления новеллы
-                await conn.execute("""
+                # chapters_count увеличивает триггер, здесь только дата обновления
+                translator_id = await conn.fetchval("""
                     UPDATE novels 
-                    SET chapters_count = chapters_count + 1,
-                        updated_at = CURRENT_TIMESTAMP
+                    SET updated_at = CURRENT_TIMESTAMP
                     WHERE id = $1
+                    RETURNING translator_id
                 """, novel_id)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Глава уже создана: сжатие - только оптимизация, его ошибка не должна
+    # превращаться в 400, иначе клиент повторит запрос и создаст дубль
+    if PRECOMPRESS_CHAPTERS:
+        try:
+            full = await precompress_chapter(chapter["id"])
+        except Exception:
+            logger.exception("Failed to precompress chapter %s", chapter["id"])
+        else:
+            # У предыдущей главы появилась следующая, ее копия устарела
+            if full and full["prev_chapter_id"]:
+                schedule_precompress(full["prev_chapter_id"])
+
+    db.mark_write(get_user_id(request), shared=True)
+    await cache.invalidate_prefix("novels:", "latest:")
+    await cache.invalidate(f"novel:{novel_id}", f"stats:{translator_id}")
+    return Response(content=dumps({"status": "success", "data": chapter}), media_type="application/json")
+
+@app.post("/api/novels/{novel_id}/chapters/import")
+async def import_chapters(novel_id: int, request: Request):
+    """
+    Массовая загрузка глав: NDJSON в теле запроса или файл `file` в
+    multipart-форме. Главы проверяются по мере чтения и пишутся одним COPY
+    в одной транзакции; ошибка в любой строке отменяет всю загрузку.
+    """
+    # Загрузка глав пачкой бывает редко, модуль не нужен на холодном старте
+    from api.imports import InvalidImport, iter_lines, iter_multipart_file
+
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        chunks = iter_multipart_file(request.stream(), content_type)
+    else:
+        chunks = request.stream()
 
-                return JSONResponse(content={"status": "success", "data": dict(chapter)})
+    imported = 0
+
+    async def records():
+        nonlocal imported
+        async for number, line in iter_lines(chunks):
+            try:
+                item = json.loads(line)
+                if isinstance(item, dict):
+                    item.setdefault("novel_id", novel_id)
+                chapter = ChapterCreate.model_validate(item)
+            except ValueError as e:
+                raise InvalidImport(number, str(e)) from e
+            if chapter.novel_id != novel_id:
+                raise InvalidImport(number, "novel_id does not match the URL")
+            imported += 1
+            yield (novel_id, chapter.chapter_number, chapter.title, chapter.content)
+
+    await ensure_schema()
+    try:
+        async with db.acquire() as conn:
+            async with conn.transaction():
+                novel = await conn.fetchrow(
+                    "SELECT translator_id FROM novels WHERE id = $1", novel_id
+                )
+                if not novel:
+                    raise HTTPException(status_code=404, detail="Novel not found")
+
+                # chapters_count обновит триггер, один раз на весь COPY
+                await conn.copy_records_to_table(
+                    "chapters",
+                    records=records(),
+                    columns=["novel_id", "chapter_number", "title", "content"]
+                )
+                if not imported:
+                    raise HTTPException(status_code=400, detail="No chapters in upload")
+                await conn.execute(
+                    "UPDATE novels SET updated_at = CURRENT_TIMESTAMP WHERE id = $1",
+                    novel_id
+                )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        await pool.close()
+
+    db.mark_write(get_user_id(request), shared=True)
+    await cache.invalidate_prefix("novels:", "latest:")
+    await cache.invalidate(f"novel:{novel_id}", f"stats:{novel['translator_id']}")
+    return FastJSONResponse(content={"status": "success", "data": {"imported": imported}})
 
 @app.get("/api/novels/{novel_id}/chapters/{chapter_id}")
-async def get_chapter(novel_id: int, chapter_id: int):
-    pool = await get_db()
-    try:
-        await ensure_tables(pool)
-        async with pool.acquire() as conn:
-            chapter = await conn.fetchrow(
-                "SELECT * FROM chapters WHERE novel_id = $1 AND id = $2",
-                novel_id, chapter_id
-            )
-            if not chapter:
+async def get_chapter(novel_id: int, chapter_id: int, request: Request):
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+
+    user_id = get_user_id(request)
+    await ensure_schema()
+    async with db.acquire(readonly=True, user_id=user_id) as conn:
+        # Сначала валидаторы и готовая сжатая копия, без текста главы
+        meta = None
+        if encoding or has_conditions(request):
+            meta = await conn.fetchrow(f"""
+                SELECT c.id, c.updated_at, {CHAPTER_NEIGHBOURS}, b.etag as blob_etag, b.body as blob
+                FROM chapters c
+                LEFT JOIN chapter_blobs b ON b.chapter_id = c.id AND b.encoding = $3
+                WHERE c.novel_id = $1 AND c.id = $2
+            """, novel_id, chapter_id, encoding or "")
+            if not meta:
                 raise HTTPException(status_code=404, detail="Chapter not found")
-            
-            # Увеличиваем счетчик просмотров
-            await conn.execute(
-                "UPDATE chapters SET views = views + 1 WHERE id = $1",
-                chapter_id
-            )
-            return JSONResponse(content={"status": "success", "data": dict(chapter)})
-    finally:
-        await pool.close()
+
+            etag = chapter_etag(meta)
+            # Увеличиваем счетчик просмотров (запишется в базу пачкой).
+            # Ровно один раз на запрос: ниже, после полной выборки, уже не считаем
+            chapter_views.add(chapter_id, user_id)
+            if is_not_modified(request, etag, meta["updated_at"]):
+                return not_modified(etag, meta["updated_at"], CACHE_CONTROL["chapter"])
+            if encoding and meta["blob_etag"] == etag:
+                return encoded_response(meta["blob"], encoding, etag, meta["updated_at"], CACHE_CONTROL["chapter"])
+
+        chapter = await conn.fetchrow(f"""
+            SELECT c.*, {CHAPTER_NEIGHBOURS}
+            FROM chapters c
+            WHERE c.novel_id = $1 AND c.id = $2
+        """, novel_id, chapter_id)
+        if not chapter:
+            raise HTTPException(status_code=404, detail="Chapter not found")
+        if meta is None:
+            chapter_views.add(chapter_id, user_id)
+
+    if encoding:
+        # Копии нет или она устарела (например, появилась следующая глава).
+        # Этот ответ сожмет middleware с быстрыми настройками, а копия
+        # пересоберется в фоне - без сжатия на максимуме и записи в основную
+        # базу от каждого параллельного читателя
+        schedule_precompress(chapter_id)
+
+    return conditional_response(
+        request,
+        lambda: dumps({"status": "success", "data": chapter}),
+        chapter_etag(chapter), chapter["updated_at"], CACHE_CONTROL["chapter"]
+    )
+
+@app.get("/api/novels/{novel_id}/bundle")
+async def get_chapter_bundle(
+    request: Request,
+    novel_id: int,
+    after: int,
+    after_id: Optional[int] = None,
+    count: int = 5
+):
+    """
+    Следующие count глав после главы (after, after_id) одним ответом, для
+    предзагрузки и чтения офлайн. Курсор - пара (номер, id), как у соседних
+    глав: у глав с одинаковым номером ни одна не пропадет. Без after_id
+    отдаются главы с номером больше after. У каждой главы свой etag, тот же,
+    что у GET .../chapters/{id}. Если главы не поместились в BUNDLE_MAX_BYTES,
+    next_after и next_after_id подскажут, откуда продолжить
+    """
+    if not 0 < count <= BUNDLE_MAX_CHAPTERS:
+        raise HTTPException(status_code=400, detail=f"count must be in 1..{BUNDLE_MAX_CHAPTERS}")
+
+    await ensure_schema()
+    async with db.acquire(readonly=True, user_id=get_user_id(request)) as conn:
+        # Один проход по индексу (novel_id, chapter_number, id)
+        rows = await conn.fetch(f"""
+            SELECT c.*, {CHAPTER_NEIGHBOURS}
+            FROM chapters c
+            WHERE c.novel_id = $1 AND (c.chapter_number, c.id) > ($2, $3)
+            ORDER BY c.chapter_number, c.id
+            LIMIT $4
+        """, novel_id, after, after_id if after_id is not None else INT_MAX, count)
+
+    chapters = []
+    size = 0
+    for row in rows:
+        size += len(row["content"].encode())
+        # Хотя бы одна глава отдается всегда, даже очень длинная
+        if chapters and size > BUNDLE_MAX_BYTES:
+            break
+        chapters.append({**row, "etag": chapter_etag(row)})
+
+    last = chapters[-1] if chapters and chapters[-1]["next_chapter_id"] else None
+    etag = make_etag("bundle", novel_id, after, after_id, [chapter["etag"] for chapter in chapters])
+    last_modified = max((chapter["updated_at"] for chapter in chapters), default=None)
+    return conditional_response(
+        request,
+        lambda: dumps({
+            "status": "success",
+            "data": chapters,
+            "next_after": last["chapter_number"] if last else None,
+            "next_after_id": last["id"] if last else None
+        }),
+        etag, last_modified, CACHE_CONTROL["toc"]
+    )
+
+# Чтение длинной главы по частям. Текст хранится кусками по абзацам
+# (строкам) в chapter_chunks, см. миграцию 0009
+def chunk_paragraphs(chunks, start: int, end: Optional[int] = None) -> List[str]:
+    paragraphs = []
+    for chunk in chunks:
+        lines = chunk["content"].split("\n")
+        first = chunk["first_paragraph"]
+        lo = max(start - first, 0)
+        hi = len(lines) if end is None else max(min(end - first, len(lines)), 0)
+        paragraphs.extend(lines[lo:hi])
+    return paragraphs
+
+@app.get("/api/novels/{novel_id}/chapters/{chapter_id}/content")
+async def get_chapter_content(
+    request: Request,
+    novel_id: int,
+    chapter_id: int,
+    start: int = 0,
+    count: int = CHAPTER_RANGE_DEFAULT
+):
+    """
+    Диапазон абзацев главы. Первый запрос (start=0) дополнительно отдает
+    заголовок и соседние главы, чтобы читалка могла сразу нарисовать экран
+    """
+    if start < 0 or not 0 < count <= CHAPTER_RANGE_MAX:
+        raise HTTPException(status_code=400, detail=f"start must be >= 0 and count in 1..{CHAPTER_RANGE_MAX}")
+
+    first = start == 0
+    meta_columns = f"c.title, c.chapter_number, c.created_at, {CHAPTER_NEIGHBOURS}," if first else ""
+
+    await ensure_schema()
+    async with db.acquire(readonly=True, user_id=get_user_id(request)) as conn:
+        meta = await conn.fetchrow(f"""
+            SELECT
+                c.id,
+                c.novel_id,
+                c.updated_at,
+                {meta_columns}
+                (
+                    SELECT k.first_paragraph + k.paragraph_count FROM chapter_chunks k
+                    WHERE k.chapter_id = c.id
+                    ORDER BY k.chunk_no DESC
+                    LIMIT 1
+                ) as total_paragraphs
+            FROM chapters c
+            WHERE c.novel_id = $1 AND c.id = $2
+        """, novel_id, chapter_id)
+        if not meta:
+            raise HTTPException(status_code=404, detail="Chapter not found")
+
+        if first:
+            chapter_views.add(chapter_id, get_user_id(request))
+            etag = make_etag("chapter-content", chapter_etag(meta), start, count)
+        else:
+            etag = make_etag("chapter-content", chapter_id, meta["updated_at"], start, count)
+        if is_not_modified(request, etag, meta["updated_at"]):
+            return not_modified(etag, meta["updated_at"], CACHE_CONTROL["chapter"])
+
+        chunks = await conn.fetch("""
+            SELECT first_paragraph, content
+            FROM chapter_chunks
+            WHERE chapter_id = $1
+              AND first_paragraph < $3
+              AND first_paragraph + paragraph_count > $2
+            ORDER BY chunk_no
+        """, chapter_id, start, start + count)
+
+    total = meta["total_paragraphs"] or 0
+    end = min(start + count, total)
+    data = {**meta, "start": start, "paragraphs": chunk_paragraphs(chunks, start, end)}
+    data["next_start"] = end if end < total else None
+    return conditional_response(
+        request,
+        lambda: dumps({"status": "success", "data": data}),
+        etag, meta["updated_at"], CACHE_CONTROL["chapter"]
+    )
+
+@app.get("/api/novels/{novel_id}/chapters/{chapter_id}/content/stream")
+async def stream_chapter_content(novel_id: int, chapter_id: int, request: Request, start: int = 0):
+    """
+    Остаток главы потоком NDJSON: по строке на кусок, {"start", "paragraphs"}.
+    Куски читаются курсором, в памяти функции одновременно один кусок
+    """
+    if start < 0:
+        raise HTTPException(status_code=400, detail="start must be >= 0")
+
+    user_id = get_user_id(request)
+    await ensure_schema()
+    async with db.acquire(readonly=True, user_id=user_id) as conn:
+        exists = await conn.fetchval(
+            "SELECT 1 FROM chapters WHERE novel_id = $1 AND id = $2", novel_id, chapter_id
+        )
+    if not exists:
+        raise HTTPException(status_code=404, detail="Chapter not found")
+
+    async def body():
+        async with db.acquire(readonly=True, user_id=user_id) as conn:
+            async with conn.transaction(readonly=True):
+                async for chunk in conn.cursor("""
+                    SELECT first_paragraph, content
+                    FROM chapter_chunks
+                    WHERE chapter_id = $1 AND first_paragraph + paragraph_count > $2
+                    ORDER BY chunk_no
+                """, chapter_id, start, prefetch=1):
+                    yield dumps({
+                        "start": max(chunk["first_paragraph"], start),
+                        "paragraphs": chunk_paragraphs([chunk], start)
+                    }) + b"\n"
+
+    return StreamingResponse(
+        body(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": CACHE_CONTROL["chapter"]}
+    )
+
+# Роуты для статистики просмотров
+@app.post("/api/novels/{novel_id}/views")
+async def increment_novel_views(novel_id: int, request: Request):
+    novel_views.add(novel_id, get_user_id(request))
+    return FastJSONResponse(content={"status": "success"})
+
+@app.post("/api/novels/{novel_id}/chapters/{chapter_id}/views")
+async def increment_chapter_views(novel_id: int, chapter_id: int, request: Request):
+    chapter_views.add(chapter_id, get_user_id(request))
+    return FastJSONResponse(content={"status": "success"})
+
+# Библиотека пользователя: подписки, закладки, прогресс чтения
+LIBRARY_FLAGS = {"subscriptions": "subscribed", "bookmarks": "bookmarked"}
+
+async def load_library(conn, user_id: str) -> Dict[str, Any]:
+    rows = await conn.fetch("""
+        SELECT novel_id, subscribed, bookmarked, last_chapter_id, position, progress_updated_at
+        FROM user_library
+        WHERE user_id = $1
+    """, user_id)
+
+    progress = {
+        row["novel_id"]: {
+            "chapter_id": row["last_chapter_id"],
+            "position": row["position"],
+            "updated_at": row["progress_updated_at"]
+        }
+        for row in rows if row["last_chapter_id"] is not None
+    }
+    # Поверх базы - еще не записанный прогресс из буфера
+    for novel_id, (chapter_id, position, updated_at) in progress_buffer.pending(user_id).items():
+        progress[novel_id] = {"chapter_id": chapter_id, "position": position, "updated_at": updated_at}
+
+    return {
+        "subscriptions": [row["novel_id"] for row in rows if row["subscribed"]],
+        "bookmarks": [row["novel_id"] for row in rows if row["bookmarked"]],
+        "progress": progress
+    }
+
+@app.get("/api/library")
+async def get_library(request: Request):
+    user_id = require_user_id(request)
+    await ensure_schema()
+    async with db.acquire(readonly=True, user_id=user_id) as conn:
+        library = await load_library(conn, user_id)
+    return FastJSONResponse(content={"status": "success", "data": library})
+
+@app.put("/api/library/{kind}/{novel_id}")
+async def add_to_library(kind: str, novel_id: int, request: Request):
+    column = LIBRARY_FLAGS.get(kind)
+    if not column:
+        raise HTTPException(status_code=404, detail="Unknown library list")
+    user_id = require_user_id(request)
+
+    await ensure_schema()
+    async with db.acquire() as conn:
+        # subscribers_count новеллы обновляет триггер, см. миграцию 0008
+        try:
+            await conn.execute(f"""
+                INSERT INTO user_library AS l (user_id, novel_id, {column})
+                VALUES ($1, $2, TRUE)
+                ON CONFLICT (user_id, novel_id) DO UPDATE SET {column} = TRUE
+                WHERE NOT l.{column}
+            """, user_id, novel_id)
+        except asyncpg.ForeignKeyViolationError:
+            raise HTTPException(status_code=404, detail="Novel not found")
+
+    db.mark_write(user_id)
+    if column == "subscribed":
+        await cache.invalidate(f"novel:{novel_id}")
+    return FastJSONResponse(content={"status": "success"})
+
+@app.delete("/api/library/{kind}/{novel_id}")
+async def remove_from_library(kind: str, novel_id: int, request: Request):
+    column = LIBRARY_FLAGS.get(kind)
+    if not column:
+        raise HTTPException(status_code=404, detail="Unknown library list")
+    user_id = require_user_id(request)
+
+    await ensure_schema()
+    async with db.acquire() as conn:
+        await conn.execute(f"""
+            UPDATE user_library SET {column} = FALSE
+            WHERE user_id = $1 AND novel_id = $2 AND {column}
+        """, user_id, novel_id)
+
+    db.mark_write(user_id)
+    if column == "subscribed":
+        await cache.invalidate(f"novel:{novel_id}")
+    return FastJSONResponse(content={"status": "success"})
+
+@app.post("/api/library/progress", status_code=202)
+async def save_progress(data: ProgressBatch, request: Request):
+    """
+    Прогресс чтения, уже схлопнутый клиентом. Запись идет через буфер
+    и попадает в базу пачкой раз в PROGRESS_FLUSH_INTERVAL секунд
+    """
+    user_id = require_user_id(request)
+    if len(data.items) > BATCH_MAX_NOVELS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_NOVELS} novels per batch")
+    for item in data.items:
+        progress_buffer.add(user_id, item.novel_id, item.chapter_id, item.position, item.updated_at)
+    db.mark_write(user_id)
+    return FastJSONResponse(status_code=202, content={"status": "success", "data": {"queued": len(data.items)}})
+
+@app.post("/api/library/sync")
+async def sync_library(data: LibrarySync, request: Request):
+    """
+    Сливает локальную библиотеку клиента с серверной: подписки и закладки
+    объединяются, отложенные клиентом удаления применяются, у прогресса
+    побеждает более свежая запись
+    """
+    user_id = require_user_id(request)
+    # Прогресс и удаления копятся на клиенте так же, как пачка прогресса
+    limits = {
+        "progress": (data.progress, BATCH_MAX_NOVELS),
+        "removed_subscriptions": (data.removed_subscriptions, BATCH_MAX_NOVELS),
+        "removed_bookmarks": (data.removed_bookmarks, BATCH_MAX_NOVELS),
+        "subscriptions": (data.subscriptions, LIBRARY_MAX_NOVELS),
+        "bookmarks": (data.bookmarks, LIBRARY_MAX_NOVELS),
+    }
+    for name, (items, limit) in limits.items():
+        if len(items) > limit:
+            raise HTTPException(status_code=400, detail=f"At most {limit} novels in {name}")
+
+    for item in data.progress:
+        progress_buffer.add(user_id, item.novel_id, item.chapter_id, item.position, item.updated_at)
+
+    # Удаление - последнее действие пользователя, оно важнее объединения
+    removed_subscriptions = set(data.removed_subscriptions)
+    removed_bookmarks = set(data.removed_bookmarks)
+    subscriptions = [novel_id for novel_id in data.subscriptions if novel_id not in removed_subscriptions]
+    bookmarks = [novel_id for novel_id in data.bookmarks if novel_id not in removed_bookmarks]
+
+    await ensure_schema()
+    async with db.acquire() as conn:
+        async with conn.transaction():
+            if removed_subscriptions or removed_bookmarks:
+                await conn.execute("""
+                    UPDATE user_library SET
+                        subscribed = subscribed AND NOT novel_id = ANY($2::int[]),
+                        bookmarked = bookmarked AND NOT novel_id = ANY($3::int[])
+                    WHERE user_id = $1
+                      AND ((subscribed AND novel_id = ANY($2::int[]))
+                        OR (bookmarked AND novel_id = ANY($3::int[])))
+                """, user_id, list(removed_subscriptions), list(removed_bookmarks))
+            if subscriptions or bookmarks:
+                # Несуществующие новеллы молча пропускаются
+                await conn.execute("""
+                    INSERT INTO user_library AS l (user_id, novel_id, subscribed, bookmarked)
+                    SELECT $1, n.id, n.id = ANY($2::int[]), n.id = ANY($3::int[])
+                    FROM novels n
+                    WHERE n.id = ANY($2::int[] || $3::int[])
+                    ORDER BY n.id
+                    ON CONFLICT (user_id, novel_id) DO UPDATE SET
+                        subscribed = l.subscribed OR EXCLUDED.subscribed,
+                        bookmarked = l.bookmarked OR EXCLUDED.bookmarked
+                    WHERE (NOT l.subscribed AND EXCLUDED.subscribed)
+                       OR (NOT l.bookmarked AND EXCLUDED.bookmarked)
+                """, user_id, subscriptions, bookmarks)
+        library = await load_library(conn, user_id)
+    db.mark_write(user_id)
+    if removed_subscriptions:
+        await cache.invalidate(*(f"novel:{novel_id}" for novel_id in removed_subscriptions))
+    return FastJSONResponse(content={"status": "success", "data": library})
+
+@app.get("/api/health")
+async def health():
+    return FastJSONResponse(content={
+        "status": "success",
+        "data": {"pool": db.pool_stats(), "cache": cache.stats(), "admission": admission.stats()}
+    })
+
+@app.get("/api/warmup")
+async def warmup_instance():
+    """Для пингов по расписанию: держит инстанс и пул соединений теплыми"""
+    return FastJSONResponse(
+        content={"status": "success", "data": await warmup()},
+        headers={"Cache-Control": "no-store"}
+    )
+
+@app.get("/api/metrics")
+async def get_metrics(request: Request):
+    """Метрики в формате Prometheus для скрейпера, только с METRICS_TOKEN"""
+    if not metrics.is_authorized(request.headers.get("authorization")):
+        raise HTTPException(
+            status_code=401,
+            detail="Metrics token is required",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    pool = db.pool_stats()
+    stats = cache.stats()
+    gauges = {
+        "db_pool_size": pool["size"],
+        "db_pool_in_use": pool["in_use"],
+        "db_pool_waiters": pool["waiters"],
+        "response_cache_hits_total": stats["hits"],
+        "response_cache_misses_total": stats["misses"],
+        "response_cache_coalesced_total": stats["coalesced"],
+    }
+    for source, count in pool.get("reads", {}).items():
+        gauges[f"db_reads_{source}_total"] = count
+    if "bytes" in stats:
+        gauges["response_cache_bytes"] = stats["bytes"]
+    for name, limiter in admission.limiters.items():
+        gauges[f"admission_{name}_active"] = limiter.active
+        gauges[f"admission_{name}_waiting"] = limiter.waiting
+        gauges[f"admission_{name}_rejected_total"] = limiter.rejected + limiter.timeouts
+    for name, count in admission.rate_limited.items():
+        gauges[f"rate_limited_{name}_total"] = count
+    return Response(
+        content=metrics.render(gauges),
+        media_type="text/plain; version=0.0.4",
+        headers={"Cache-Control": "no-store"}
+    )
 
 # Дефолтный роут
 @app.get("/")
 async def root():
-    return JSONResponse(content={
+    return FastJSONResponse(content={
         "status": "success",
         "message": "Novels Reader API is running",
         "version": "1.0.0"
@@ -374,4 +1343,3 @@ async def root():
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
-```
@@ -0,0 +1,246 @@
+"""
+Metrics and tracing for Novels Reader
+
+Гистограммы времени ответа по маршрутам, времени запросов к базе
+(по нормализованному SQL), ожидания соединения из пула и размера ответов.
+GET /api/metrics отдает их в текстовом формате Prometheus; prometheus_client
+для этого не нужен.
+
+Метрики закрыты токеном METRICS_TOKEN (Authorization: Bearer ...). Время базы
+за запрос уходит в заголовке Server-Timing только запросам с этим токеном
+или всем при SERVER_TIMING=1, запросы дольше SLOW_QUERY_MS пишутся в лог.
+"""
+import bisect
+import contextvars
+import hmac
+import logging
+import os
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 0 - не логировать медленные запросы
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '0'))
+
+# Без токена /api/metrics недоступен
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# 1 - Server-Timing на всех ответах, иначе только запросам с METRICS_TOKEN
+SERVER_TIMING = os.getenv('SERVER_TIMING', '0') == '1'
+
+# Сколько разных запросов различаем; остальные попадают в "other"
+MAX_QUERY_LABELS = 500
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w$])\d+(?:\.\d+)?\b")
+
+
+def normalize_sql(query: str) -> str:
+    """Запрос без литералов и лишних пробелов, чтобы он годился как метка"""
+    query = _STRING_RE.sub("?", query)
+    query = _NUMBER_RE.sub("?", query)
+    return _WHITESPACE_RE.sub(" ", query).strip()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # метки -> (счетчики по корзинам, сумма, количество)
+        self._series: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % bound
+                yield f"{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_labels(self.labels, labels, le)} {count}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {count}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str]):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, value: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {value}"
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route", "status"), LATENCY_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "HTTP response body size by route (after compression)",
+    ("route",), SIZE_BUCKETS
+)
+QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "Database query time by normalized SQL",
+    ("query",), LATENCY_BUCKETS
+)
+QUERY_ERRORS = Counter("db_query_errors_total", "Failed database queries by normalized SQL", ("query",))
+POOL_WAIT = Histogram(
+    "db_pool_acquire_seconds", "Time spent waiting for a pooled connection",
+    ("pool",), LATENCY_BUCKETS
+)
+
+_query_labels: Dict[str, str] = {}
+
+# Время базы в рамках текущего HTTP-запроса: [число запросов, секунды]
+_request_db: contextvars.ContextVar[Optional[List[float]]] = contextvars.ContextVar("request_db", default=None)
+
+
+def _query_label(query: str) -> str:
+    label = _query_labels.get(query)
+    if label is None:
+        label = normalize_sql(query) if len(_query_labels) < MAX_QUERY_LABELS else "other"
+        _query_labels[query] = label
+    return label
+
+
+def observe_query(record):
+    """Колбэк asyncpg add_query_logger: вызывается после каждого запроса"""
+    label = _query_label(record.query)
+    QUERY_LATENCY.observe(record.elapsed, label)
+    if record.exception is not None:
+        QUERY_ERRORS.inc(label)
+
+    timing = _request_db.get()
+    if timing is not None:
+        timing[0] += 1
+        timing[1] += record.elapsed
+
+    if SLOW_QUERY_MS and record.elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning("Slow query %.1f ms: %s", record.elapsed * 1000, label)
+
+
+def observe_pool_wait(seconds: float, pool: str):
+    POOL_WAIT.observe(seconds, pool)
+
+
+def render(gauges: Optional[Dict[str, float]] = None) -> str:
+    """Все метрики в текстовом формате Prometheus; gauges - значения на момент запроса"""
+    lines: List[str] = []
+    for metric in (REQUEST_LATENCY, RESPONSE_SIZE, QUERY_LATENCY, QUERY_ERRORS, POOL_WAIT):
+        lines.extend(metric.render())
+    for name, value in (gauges or {}).items():
+        # Счетчики из pool_stats и cache.stats считаются снаружи, здесь только значения
+        kind = "counter" if name.endswith("_total") else "gauge"
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def is_authorized(authorization: Optional[str]) -> bool:
+    """Проверяет заголовок Authorization: Bearer <METRICS_TOKEN>"""
+    if not METRICS_TOKEN or not authorization:
+        return False
+    scheme, _, token = authorization.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip(), METRICS_TOKEN)
+
+
+class MetricsMiddleware:
+    """Время ответа, размер тела и заголовок Server-Timing для каждого запроса"""
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[Callable, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        server_timing = SERVER_TIMING or is_authorized(
+            dict(scope["headers"]).get(b"authorization", b"").decode("latin-1")
+        )
+        timing = [0, 0.0]
+        token = _request_db.set(timing)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if server_timing:
+                    # Время по запросу раскрывает устройство сервера, поэтому не всем
+                    elapsed = time.perf_counter() - started
+                    headers = list(message.get("headers", []))
+                    value = 'db;desc="%d queries";dur=%.1f, app;dur=%.1f' % (
+                        timing[0], timing[1] * 1000, elapsed * 1000
+                    )
+                    headers.append((b"server-timing", value.encode()))
+                    message = {**message, "headers": headers}
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_db.reset(token)
+            route = self._route(scope)
+            REQUEST_LATENCY.observe(time.perf_counter() - started, scope["method"], route, str(status))
+            RESPONSE_SIZE.observe(size, route)
+
+    def _route(self, scope) -> str:
+        # Шаблон пути, а не сам путь: /api/novels/{novel_id}, иначе меток без счета
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        route = self._routes.get(endpoint)
+        if route is None:
+            for candidate in scope["app"].router.routes:
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    route = candidate.path
+                    break
+            else:
+                route = "unmatched"
+            self._routes[endpoint] = route
+        return route
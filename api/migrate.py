@@ -0,0 +1,165 @@
+"""
+Schema migrations for Novels Reader
+
+Миграции лежат в api/migrations в виде файлов NNNN_name.sql и применяются
+по порядку номеров. Примененные версии записываются в schema_migrations.
+
+Запуск из корня проекта:
+    python -m api.migrate           # применить новые миграции
+    python -m api.migrate --status  # показать состояние
+"""
+import argparse
+import asyncio
+import os
+import re
+from pathlib import Path
+from typing import List, NamedTuple, Set
+
+import asyncpg
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+# Произвольный ключ advisory lock, чтобы несколько инстансов
+# не применяли миграции одновременно
+MIGRATIONS_LOCK_ID = 7262001
+
+_FILENAME_RE = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+
+# Кеш проверки схемы в пределах процесса
+_schema_ready = False
+_schema_lock = None
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: Path
+
+
+def load_migrations() -> List[Migration]:
+    """Читает список миграций из каталога, отсортированный по версии"""
+    migrations = []
+    for path in MIGRATIONS_DIR.iterdir():
+        match = _FILENAME_RE.match(path.name)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), path))
+    migrations.sort(key=lambda m: m.version)
+
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Duplicate migration versions in %s" % MIGRATIONS_DIR)
+    return migrations
+
+
+async def _applied_versions(conn) -> Set[int]:
+    await conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    rows = await conn.fetch("SELECT version FROM schema_migrations")
+    return {row["version"] for row in rows}
+
+
+async def apply_migrations(conn) -> List[Migration]:
+    """Применяет все новые миграции, каждую в своей транзакции"""
+    applied = []
+    await conn.execute("SELECT pg_advisory_lock($1)", MIGRATIONS_LOCK_ID)
+    try:
+        done = await _applied_versions(conn)
+        for migration in load_migrations():
+            if migration.version in done:
+                continue
+            async with conn.transaction():
+                await conn.execute(migration.path.read_text(encoding="utf-8"))
+                await conn.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES ($1, $2)",
+                    migration.version, migration.name
+                )
+            applied.append(migration)
+    finally:
+        await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATIONS_LOCK_ID)
+    return applied
+
+
+async def pending_migrations(conn) -> List[Migration]:
+    done = await _applied_versions(conn)
+    return [m for m in load_migrations() if m.version not in done]
+
+
+async def _missing_migrations(conn) -> List[Migration]:
+    """Как pending_migrations, но одним SELECT: без DDL и блокировок"""
+    try:
+        rows = await conn.fetch("SELECT version FROM schema_migrations")
+    except asyncpg.UndefinedTableError:
+        return load_migrations()
+    done = {row["version"] for row in rows}
+    return [m for m in load_migrations() if m.version not in done]
+
+
+async def ensure_schema(database=None):
+    """
+    Проверяет схему один раз на процесс. Если DB_AUTO_MIGRATE выключен,
+    отсутствующие миграции считаются ошибкой, а не применяются.
+    С DB_SCHEMA_CHECK=0 проверка пропускается: миграции применяет деплой,
+    а холодный старт не тратит на схему ни одного запроса к базе.
+    """
+    global _schema_ready, _schema_lock
+    if _schema_ready:
+        return
+    if os.getenv("DB_SCHEMA_CHECK", "1") == "0":
+        _schema_ready = True
+        return
+
+    if database is None:
+        from api.database import db as database
+
+    if _schema_lock is None:
+        _schema_lock = asyncio.Lock()
+    async with _schema_lock:
+        if _schema_ready:
+            return
+        async with database.acquire() as conn:
+            # Обычно схема актуальна, и хватает одного SELECT; advisory lock
+            # и DDL нужны, только если есть что применять
+            pending = await _missing_migrations(conn)
+            if pending and os.getenv("DB_AUTO_MIGRATE", "1") == "1":
+                await apply_migrations(conn)
+            elif pending:
+                raise RuntimeError(
+                    "Database schema is out of date, run `python -m api.migrate`: "
+                    + ", ".join("%04d_%s" % (m.version, m.name) for m in pending)
+                )
+        _schema_ready = True
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Apply Novels Reader schema migrations")
+    parser.add_argument("--status", action="store_true", help="only list applied and pending migrations")
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL") or os.getenv("POSTGRES_URL"))
+    args = parser.parse_args()
+
+    if not args.url:
+        parser.error("DATABASE_URL not found in environment variables")
+
+    conn = await asyncpg.connect(args.url)
+    try:
+        if args.status:
+            pending = {m.version for m in await pending_migrations(conn)}
+            for migration in load_migrations():
+                state = "pending" if migration.version in pending else "applied"
+                print("%04d_%s  %s" % (migration.version, migration.name, state))
+        else:
+            applied = await apply_migrations(conn)
+            for migration in applied:
+                print("applied %04d_%s" % (migration.version, migration.name))
+            if not applied:
+                print("schema is up to date")
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,50 @@
+-- Базовая схема. IF NOT EXISTS нужен для баз, созданных старым ensure_tables
+
+-- Таблица переводчиков
+CREATE TABLE IF NOT EXISTS translators (
+    user_id TEXT PRIMARY KEY,
+    username TEXT,
+    display_name TEXT NOT NULL,
+    bio TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Таблица новелл
+CREATE TABLE IF NOT EXISTS novels (
+    id SERIAL PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    cover_url TEXT,
+    translator_id TEXT REFERENCES translators(user_id),
+    status TEXT DEFAULT 'ongoing',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    views INTEGER DEFAULT 0,
+    subscribers_count INTEGER DEFAULT 0,
+    chapters_count INTEGER DEFAULT 0
+);
+
+-- Таблица глав
+CREATE TABLE IF NOT EXISTS chapters (
+    id SERIAL PRIMARY KEY,
+    novel_id INTEGER REFERENCES novels(id) ON DELETE CASCADE,
+    chapter_number INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    views INTEGER DEFAULT 0
+);
+
+-- Таблица тегов
+CREATE TABLE IF NOT EXISTS tags (
+    id SERIAL PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL
+);
+
+-- Связь новелл и тегов
+CREATE TABLE IF NOT EXISTS novel_tags (
+    novel_id INTEGER REFERENCES novels(id) ON DELETE CASCADE,
+    tag_id INTEGER REFERENCES tags(id) ON DELETE CASCADE,
+    PRIMARY KEY (novel_id, tag_id)
+);
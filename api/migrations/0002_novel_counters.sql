@@ -0,0 +1,22 @@
+-- Базы, созданные через Database.init_tables, содержали колонку subscribers
+-- и не содержали chapters_count. Приводим их к единой схеме
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT FROM information_schema.columns
+        WHERE table_name = 'novels' AND column_name = 'subscribers'
+    ) AND NOT EXISTS (
+        SELECT FROM information_schema.columns
+        WHERE table_name = 'novels' AND column_name = 'subscribers_count'
+    ) THEN
+        ALTER TABLE novels RENAME COLUMN subscribers TO subscribers_count;
+    END IF;
+END $$;
+
+ALTER TABLE novels ADD COLUMN IF NOT EXISTS subscribers_count INTEGER DEFAULT 0;
+ALTER TABLE novels ADD COLUMN IF NOT EXISTS chapters_count INTEGER DEFAULT 0;
+
+UPDATE novels n
+SET chapters_count = c.cnt
+FROM (SELECT novel_id, COUNT(*) AS cnt FROM chapters GROUP BY novel_id) c
+WHERE c.novel_id = n.id AND n.chapters_count IS DISTINCT FROM c.cnt;
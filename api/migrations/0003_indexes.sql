@@ -0,0 +1,8 @@
+-- Список глав новеллы и поиск соседних глав
+CREATE INDEX IF NOT EXISTS chapters_novel_number_idx ON chapters (novel_id, chapter_number);
+
+-- Лента последних глав
+CREATE INDEX IF NOT EXISTS chapters_created_at_idx ON chapters (created_at DESC);
+
+-- Новеллы переводчика
+CREATE INDEX IF NOT EXISTS novels_translator_updated_idx ON novels (translator_id, updated_at DESC);
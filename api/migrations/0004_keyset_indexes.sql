@@ -0,0 +1,17 @@
+-- Индексы под keyset-пагинацию: id добавлен как второй ключ сортировки,
+-- чтобы курсор был однозначным при совпадающих датах
+
+-- Общий список новелл
+CREATE INDEX IF NOT EXISTS novels_updated_id_idx ON novels (updated_at DESC, id DESC);
+
+-- Новеллы переводчика
+CREATE INDEX IF NOT EXISTS novels_translator_updated_id_idx ON novels (translator_id, updated_at DESC, id DESC);
+DROP INDEX IF EXISTS novels_translator_updated_idx;
+
+-- Лента последних глав
+CREATE INDEX IF NOT EXISTS chapters_created_id_idx ON chapters (created_at DESC, id DESC);
+DROP INDEX IF EXISTS chapters_created_at_idx;
+
+-- Список глав новеллы
+CREATE INDEX IF NOT EXISTS chapters_novel_number_id_idx ON chapters (novel_id, chapter_number, id);
+DROP INDEX IF EXISTS chapters_novel_number_idx;
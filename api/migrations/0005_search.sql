@@ -0,0 +1,84 @@
+-- Полнотекстовый поиск. Векторы хранятся в отдельных таблицах и
+-- поддерживаются триггерами, чтобы не раздувать SELECT * по novels/chapters
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Русская конфигурация находит словоформы, simple - имена и латиницу как есть
+CREATE OR REPLACE FUNCTION novel_search_document(title TEXT, description TEXT)
+RETURNS tsvector
+LANGUAGE sql IMMUTABLE
+AS $$
+    SELECT setweight(to_tsvector('russian', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('russian', coalesce(description, '')), 'B')
+        || setweight(to_tsvector('simple', coalesce(description, '')), 'D')
+$$;
+
+-- Длина текста ограничена, чтобы не упереться в предел размера tsvector
+CREATE OR REPLACE FUNCTION chapter_search_document(title TEXT, content TEXT)
+RETURNS tsvector
+LANGUAGE sql IMMUTABLE
+AS $$
+    SELECT setweight(to_tsvector('russian', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('russian', left(coalesce(content, ''), 500000)), 'C')
+$$;
+
+CREATE TABLE IF NOT EXISTS novel_search (
+    novel_id INTEGER PRIMARY KEY REFERENCES novels(id) ON DELETE CASCADE,
+    document tsvector NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS chapter_search (
+    chapter_id INTEGER PRIMARY KEY REFERENCES chapters(id) ON DELETE CASCADE,
+    novel_id INTEGER NOT NULL,
+    document tsvector NOT NULL
+);
+
+CREATE OR REPLACE FUNCTION novels_search_refresh() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO novel_search (novel_id, document)
+    VALUES (NEW.id, novel_search_document(NEW.title, NEW.description))
+    ON CONFLICT (novel_id) DO UPDATE SET document = EXCLUDED.document;
+    RETURN NEW;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION chapters_search_refresh() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO chapter_search (chapter_id, novel_id, document)
+    VALUES (NEW.id, NEW.novel_id, chapter_search_document(NEW.title, NEW.content))
+    ON CONFLICT (chapter_id) DO UPDATE
+    SET novel_id = EXCLUDED.novel_id, document = EXCLUDED.document;
+    RETURN NEW;
+END
+$$;
+
+DROP TRIGGER IF EXISTS novels_search_refresh ON novels;
+CREATE TRIGGER novels_search_refresh
+    AFTER INSERT OR UPDATE OF title, description ON novels
+    FOR EACH ROW EXECUTE FUNCTION novels_search_refresh();
+
+DROP TRIGGER IF EXISTS chapters_search_refresh ON chapters;
+CREATE TRIGGER chapters_search_refresh
+    AFTER INSERT OR UPDATE OF title, content ON chapters
+    FOR EACH ROW EXECUTE FUNCTION chapters_search_refresh();
+
+-- Заполняем для уже существующих данных
+INSERT INTO novel_search (novel_id, document)
+SELECT id, novel_search_document(title, description) FROM novels
+ON CONFLICT (novel_id) DO NOTHING;
+
+INSERT INTO chapter_search (chapter_id, novel_id, document)
+SELECT id, novel_id, chapter_search_document(title, content) FROM chapters
+ON CONFLICT (chapter_id) DO NOTHING;
+
+CREATE INDEX IF NOT EXISTS novel_search_document_idx ON novel_search USING GIN (document);
+CREATE INDEX IF NOT EXISTS chapter_search_document_idx ON chapter_search USING GIN (document);
+CREATE INDEX IF NOT EXISTS chapter_search_novel_idx ON chapter_search (novel_id);
+
+-- Нечеткий поиск по названию для запросов с опечатками
+CREATE INDEX IF NOT EXISTS novels_title_trgm_idx ON novels USING GIN (title gin_trgm_ops);
@@ -0,0 +1,10 @@
+-- Заранее сжатые ответы get_chapter. etag совпадает с ETag ответа:
+-- если у главы сменились updated_at или соседи, копия считается устаревшей
+CREATE TABLE IF NOT EXISTS chapter_blobs (
+    chapter_id INTEGER REFERENCES chapters(id) ON DELETE CASCADE,
+    encoding TEXT NOT NULL,
+    etag TEXT NOT NULL,
+    body BYTEA NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (chapter_id, encoding)
+);
@@ -0,0 +1,164 @@
+-- Денормализованная статистика переводчика. Счетчики поддерживаются
+-- триггерами уровня оператора: пакетная вставка или сброс просмотров
+-- дают одно обновление на переводчика, а не на каждую строку
+
+CREATE TABLE IF NOT EXISTS translator_stats (
+    translator_id TEXT PRIMARY KEY REFERENCES translators(user_id) ON DELETE CASCADE,
+    novels_count INTEGER NOT NULL DEFAULT 0,
+    chapters_count BIGINT NOT NULL DEFAULT 0,
+    subscribers_count BIGINT NOT NULL DEFAULT 0,
+    total_views BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- chapters_count новеллы: раньше только увеличивался в create_chapter
+CREATE OR REPLACE FUNCTION chapters_count_refresh() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE novels n
+        SET chapters_count = coalesce(n.chapters_count, 0) + d.delta
+        FROM (SELECT novel_id, COUNT(*) AS delta FROM new_rows GROUP BY novel_id) d
+        WHERE n.id = d.novel_id;
+    ELSE
+        UPDATE novels n
+        SET chapters_count = coalesce(n.chapters_count, 0) - d.delta
+        FROM (SELECT novel_id, COUNT(*) AS delta FROM old_rows GROUP BY novel_id) d
+        WHERE n.id = d.novel_id;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+-- Триггер с transition table может быть только на одно событие
+DROP TRIGGER IF EXISTS chapters_count_insert ON chapters;
+CREATE TRIGGER chapters_count_insert
+    AFTER INSERT ON chapters
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION chapters_count_refresh();
+
+DROP TRIGGER IF EXISTS chapters_count_delete ON chapters;
+CREATE TRIGGER chapters_count_delete
+    AFTER DELETE ON chapters
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION chapters_count_refresh();
+
+-- Применяет разницу, собранную триггером novels, к translator_stats
+CREATE OR REPLACE FUNCTION translator_stats_apply(deltas JSONB) RETURNS void
+LANGUAGE sql
+AS $$
+    INSERT INTO translator_stats AS s (
+        translator_id, novels_count, chapters_count, subscribers_count, total_views
+    )
+    SELECT translator_id, novels_count, chapters_count, subscribers_count, total_views
+    FROM jsonb_to_recordset(deltas) AS d(
+        translator_id TEXT,
+        novels_count INTEGER,
+        chapters_count BIGINT,
+        subscribers_count BIGINT,
+        total_views BIGINT
+    )
+    WHERE novels_count <> 0 OR chapters_count <> 0 OR subscribers_count <> 0 OR total_views <> 0
+    -- Одинаковый порядок блокировок у параллельных транзакций
+    ORDER BY translator_id
+    ON CONFLICT (translator_id) DO UPDATE SET
+        novels_count = s.novels_count + EXCLUDED.novels_count,
+        chapters_count = s.chapters_count + EXCLUDED.chapters_count,
+        subscribers_count = s.subscribers_count + EXCLUDED.subscribers_count,
+        total_views = s.total_views + EXCLUDED.total_views,
+        updated_at = CURRENT_TIMESTAMP
+$$;
+
+CREATE OR REPLACE FUNCTION novels_translator_stats() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    deltas JSONB;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT jsonb_agg(d) INTO deltas FROM (
+            SELECT
+                translator_id,
+                COUNT(*) AS novels_count,
+                SUM(coalesce(chapters_count, 0)) AS chapters_count,
+                SUM(coalesce(subscribers_count, 0)) AS subscribers_count,
+                SUM(coalesce(views, 0)) AS total_views
+            FROM new_rows
+            WHERE translator_id IS NOT NULL
+            GROUP BY translator_id
+        ) d;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT jsonb_agg(d) INTO deltas FROM (
+            SELECT
+                translator_id,
+                -COUNT(*) AS novels_count,
+                -SUM(coalesce(chapters_count, 0)) AS chapters_count,
+                -SUM(coalesce(subscribers_count, 0)) AS subscribers_count,
+                -SUM(coalesce(views, 0)) AS total_views
+            FROM old_rows
+            WHERE translator_id IS NOT NULL
+            GROUP BY translator_id
+        ) d;
+    ELSE
+        SELECT jsonb_agg(d) INTO deltas FROM (
+            SELECT
+                translator_id,
+                SUM(sign) AS novels_count,
+                SUM(sign * coalesce(chapters_count, 0)) AS chapters_count,
+                SUM(sign * coalesce(subscribers_count, 0)) AS subscribers_count,
+                SUM(sign * coalesce(views, 0)) AS total_views
+            FROM (
+                SELECT 1 AS sign, translator_id, chapters_count, subscribers_count, views FROM new_rows
+                UNION ALL
+                SELECT -1, translator_id, chapters_count, subscribers_count, views FROM old_rows
+            ) r
+            WHERE translator_id IS NOT NULL
+            GROUP BY translator_id
+        ) d;
+    END IF;
+
+    IF deltas IS NOT NULL THEN
+        PERFORM translator_stats_apply(deltas);
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS novels_translator_stats_insert ON novels;
+CREATE TRIGGER novels_translator_stats_insert
+    AFTER INSERT ON novels
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION novels_translator_stats();
+
+DROP TRIGGER IF EXISTS novels_translator_stats_update ON novels;
+CREATE TRIGGER novels_translator_stats_update
+    AFTER UPDATE ON novels
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION novels_translator_stats();
+
+DROP TRIGGER IF EXISTS novels_translator_stats_delete ON novels;
+CREATE TRIGGER novels_translator_stats_delete
+    AFTER DELETE ON novels
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION novels_translator_stats();
+
+-- Заполняем для уже существующих данных: сначала chapters_count новелл
+-- (удаления глав раньше не учитывались), затем статистику переводчиков
+UPDATE novels n
+SET chapters_count = coalesce(c.cnt, 0)
+FROM novels n2
+LEFT JOIN (SELECT novel_id, COUNT(*) AS cnt FROM chapters GROUP BY novel_id) c ON c.novel_id = n2.id
+WHERE n.id = n2.id AND n.chapters_count IS DISTINCT FROM coalesce(c.cnt, 0);
+
+DELETE FROM translator_stats;
+INSERT INTO translator_stats (translator_id, novels_count, chapters_count, subscribers_count, total_views)
+SELECT
+    translator_id,
+    COUNT(*),
+    SUM(coalesce(chapters_count, 0)),
+    SUM(coalesce(subscribers_count, 0)),
+    SUM(coalesce(views, 0))
+FROM novels
+WHERE translator_id IS NOT NULL
+GROUP BY translator_id;
@@ -0,0 +1,73 @@
+-- Библиотека пользователя на сервере: подписки, закладки и прогресс чтения.
+-- Раньше все это жило только в CloudStorage/localStorage клиента
+
+CREATE TABLE IF NOT EXISTS user_library (
+    user_id TEXT NOT NULL,
+    novel_id INTEGER NOT NULL REFERENCES novels(id) ON DELETE CASCADE,
+    subscribed BOOLEAN NOT NULL DEFAULT FALSE,
+    bookmarked BOOLEAN NOT NULL DEFAULT FALSE,
+    last_chapter_id INTEGER REFERENCES chapters(id) ON DELETE SET NULL,
+    position INTEGER,
+    progress_updated_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (user_id, novel_id)
+);
+
+CREATE INDEX IF NOT EXISTS user_library_subscribed_idx ON user_library (novel_id) WHERE subscribed;
+
+-- novels.subscribers_count меняется только когда subscribed действительно
+-- переключился; запись прогресса счетчик не трогает
+CREATE OR REPLACE FUNCTION user_library_subscribers() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE novels n
+        SET subscribers_count = coalesce(n.subscribers_count, 0) + d.delta
+        FROM (
+            SELECT novel_id, COUNT(*) AS delta FROM new_rows
+            WHERE subscribed GROUP BY novel_id
+        ) d
+        WHERE n.id = d.novel_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE novels n
+        SET subscribers_count = coalesce(n.subscribers_count, 0) - d.delta
+        FROM (
+            SELECT novel_id, COUNT(*) AS delta FROM old_rows
+            WHERE subscribed GROUP BY novel_id
+        ) d
+        WHERE n.id = d.novel_id;
+    ELSE
+        UPDATE novels n
+        SET subscribers_count = coalesce(n.subscribers_count, 0) + d.delta
+        FROM (
+            SELECT novel_id, SUM(delta) AS delta FROM (
+                SELECT novel_id, 1 AS delta FROM new_rows WHERE subscribed
+                UNION ALL
+                SELECT novel_id, -1 FROM old_rows WHERE subscribed
+            ) r
+            GROUP BY novel_id
+            HAVING SUM(delta) <> 0
+        ) d
+        WHERE n.id = d.novel_id;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS user_library_subscribers_insert ON user_library;
+CREATE TRIGGER user_library_subscribers_insert
+    AFTER INSERT ON user_library
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION user_library_subscribers();
+
+DROP TRIGGER IF EXISTS user_library_subscribers_update ON user_library;
+CREATE TRIGGER user_library_subscribers_update
+    AFTER UPDATE ON user_library
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION user_library_subscribers();
+
+DROP TRIGGER IF EXISTS user_library_subscribers_delete ON user_library;
+CREATE TRIGGER user_library_subscribers_delete
+    AFTER DELETE ON user_library
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION user_library_subscribers();
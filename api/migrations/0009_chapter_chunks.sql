@@ -0,0 +1,62 @@
+-- Текст главы, разбитый на куски по абзацам (строкам). Длинную главу
+-- можно отдавать диапазонами абзацев или потоком, не читая content целиком.
+-- Куски пересчитываются триггером, поэтому работают и create_chapter,
+-- и COPY из массовой загрузки
+
+CREATE TABLE IF NOT EXISTS chapter_chunks (
+    chapter_id INTEGER NOT NULL REFERENCES chapters(id) ON DELETE CASCADE,
+    chunk_no INTEGER NOT NULL,
+    first_paragraph INTEGER NOT NULL,
+    paragraph_count INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (chapter_id, chunk_no)
+);
+
+-- Абзацы нумеруются с нуля; кусок - подряд идущие абзацы, начинающиеся
+-- в пределах одного окна по 16 КБ текста
+CREATE OR REPLACE FUNCTION chapter_chunks_build(INTEGER, TEXT)
+RETURNS TABLE (chapter_id INTEGER, chunk_no INTEGER, first_paragraph INTEGER, paragraph_count INTEGER, content TEXT)
+LANGUAGE sql IMMUTABLE
+AS $$
+    SELECT
+        $1,
+        (row_number() OVER (ORDER BY w.window_no))::int,
+        MIN(w.idx)::int,
+        COUNT(*)::int,
+        string_agg(w.para, E'\n' ORDER BY w.idx)
+    FROM (
+        SELECT
+            p.idx,
+            p.para,
+            -- Смещение начала абзаца в байтах определяет его окно
+            (SUM(octet_length(p.para) + 1) OVER (ORDER BY p.idx) - octet_length(p.para) - 1) / 16384 AS window_no
+        FROM (
+            SELECT ord - 1 AS idx, para
+            FROM regexp_split_to_table($2, E'\n') WITH ORDINALITY AS t(para, ord)
+        ) p
+    ) w
+    GROUP BY w.window_no
+$$;
+
+CREATE OR REPLACE FUNCTION chapter_chunks_refresh() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM chapter_chunks WHERE chapter_chunks.chapter_id = NEW.id;
+    INSERT INTO chapter_chunks (chapter_id, chunk_no, first_paragraph, paragraph_count, content)
+    SELECT * FROM chapter_chunks_build(NEW.id, NEW.content);
+    RETURN NEW;
+END
+$$;
+
+DROP TRIGGER IF EXISTS chapter_chunks_refresh ON chapters;
+CREATE TRIGGER chapter_chunks_refresh
+    AFTER INSERT OR UPDATE OF content ON chapters
+    FOR EACH ROW EXECUTE FUNCTION chapter_chunks_refresh();
+
+-- Заполняем для уже существующих глав
+INSERT INTO chapter_chunks (chapter_id, chunk_no, first_paragraph, paragraph_count, content)
+SELECT b.*
+FROM chapters c
+CROSS JOIN LATERAL chapter_chunks_build(c.id, c.content) b
+ON CONFLICT DO NOTHING;
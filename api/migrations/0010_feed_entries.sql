@@ -0,0 +1,112 @@
+-- Лента последних глав без JOIN и без текста: запись добавляется триггером
+-- в той же транзакции, что и глава (create_chapter и COPY массовой загрузки),
+-- названия новеллы и имя переводчика хранятся денормализованно
+
+CREATE TABLE IF NOT EXISTS feed_entries (
+    chapter_id INTEGER PRIMARY KEY REFERENCES chapters(id) ON DELETE CASCADE,
+    novel_id INTEGER NOT NULL,
+    chapter_number INTEGER NOT NULL,
+    chapter_title TEXT NOT NULL,
+    novel_title TEXT NOT NULL,
+    translator_id TEXT,
+    translator_name TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+-- Общая лента и лента по подпискам
+CREATE INDEX IF NOT EXISTS feed_entries_created_idx ON feed_entries (created_at DESC, chapter_id DESC);
+CREATE INDEX IF NOT EXISTS feed_entries_novel_created_idx ON feed_entries (novel_id, created_at DESC, chapter_id DESC);
+
+CREATE OR REPLACE FUNCTION feed_entries_append() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO feed_entries (
+        chapter_id, novel_id, chapter_number, chapter_title,
+        novel_title, translator_id, translator_name, created_at
+    )
+    SELECT
+        c.id, c.novel_id, c.chapter_number, c.title,
+        n.title, n.translator_id, t.display_name, coalesce(c.created_at, CURRENT_TIMESTAMP)
+    FROM new_rows c
+    JOIN novels n ON n.id = c.novel_id
+    LEFT JOIN translators t ON t.user_id = n.translator_id
+    ON CONFLICT (chapter_id) DO NOTHING;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS feed_entries_append ON chapters;
+CREATE TRIGGER feed_entries_append
+    AFTER INSERT ON chapters
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION feed_entries_append();
+
+-- Переименования редки, поэтому обновляем денормализованные поля сразу
+CREATE OR REPLACE FUNCTION feed_entries_chapter_title() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE feed_entries
+    SET chapter_title = NEW.title, chapter_number = NEW.chapter_number
+    WHERE chapter_id = NEW.id;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS feed_entries_chapter_title ON chapters;
+CREATE TRIGGER feed_entries_chapter_title
+    AFTER UPDATE OF title, chapter_number ON chapters
+    FOR EACH ROW
+    WHEN (OLD.title IS DISTINCT FROM NEW.title OR OLD.chapter_number IS DISTINCT FROM NEW.chapter_number)
+    EXECUTE FUNCTION feed_entries_chapter_title();
+
+CREATE OR REPLACE FUNCTION feed_entries_novel() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE feed_entries f
+    SET novel_title = NEW.title,
+        translator_id = NEW.translator_id,
+        translator_name = (SELECT display_name FROM translators WHERE user_id = NEW.translator_id)
+    WHERE f.novel_id = NEW.id;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS feed_entries_novel ON novels;
+CREATE TRIGGER feed_entries_novel
+    AFTER UPDATE OF title, translator_id ON novels
+    FOR EACH ROW
+    WHEN (OLD.title IS DISTINCT FROM NEW.title OR OLD.translator_id IS DISTINCT FROM NEW.translator_id)
+    EXECUTE FUNCTION feed_entries_novel();
+
+CREATE OR REPLACE FUNCTION feed_entries_translator() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE feed_entries SET translator_name = NEW.display_name
+    WHERE translator_id = NEW.user_id;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS feed_entries_translator ON translators;
+CREATE TRIGGER feed_entries_translator
+    AFTER UPDATE OF display_name ON translators
+    FOR EACH ROW
+    WHEN (OLD.display_name IS DISTINCT FROM NEW.display_name)
+    EXECUTE FUNCTION feed_entries_translator();
+
+-- Заполняем для уже существующих глав
+INSERT INTO feed_entries (
+    chapter_id, novel_id, chapter_number, chapter_title,
+    novel_title, translator_id, translator_name, created_at
+)
+SELECT
+    c.id, c.novel_id, c.chapter_number, c.title,
+    n.title, n.translator_id, t.display_name, coalesce(c.created_at, CURRENT_TIMESTAMP)
+FROM chapters c
+JOIN novels n ON n.id = c.novel_id
+LEFT JOIN translators t ON t.user_id = n.translator_id
+ON CONFLICT (chapter_id) DO NOTHING;
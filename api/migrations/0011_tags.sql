@@ -0,0 +1,45 @@
+-- Каталог тегов: фильтр новелл по тегам и число новелл у каждого тега.
+-- Первичный ключ novel_tags (novel_id, tag_id) отвечает на "теги новеллы",
+-- для "новеллы с тегом" нужен обратный индекс
+CREATE INDEX IF NOT EXISTS novel_tags_tag_novel_idx ON novel_tags (tag_id, novel_id);
+
+-- Счетчик для фасетов, чтобы не считать COUNT(*) по novel_tags на каждый запрос
+ALTER TABLE tags ADD COLUMN IF NOT EXISTS novels_count INTEGER NOT NULL DEFAULT 0;
+
+UPDATE tags t
+SET novels_count = c.cnt
+FROM (SELECT tag_id, COUNT(*) AS cnt FROM novel_tags GROUP BY tag_id) c
+WHERE t.id = c.tag_id;
+
+-- Одно срабатывание на оператор: замена тегов новеллы и каскадное удаление
+-- новеллы обновляют каждый тег один раз
+CREATE OR REPLACE FUNCTION novel_tags_count() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE tags t
+        SET novels_count = t.novels_count + d.delta
+        FROM (SELECT tag_id, COUNT(*) AS delta FROM new_rows GROUP BY tag_id) d
+        WHERE t.id = d.tag_id;
+    ELSE
+        UPDATE tags t
+        SET novels_count = t.novels_count - d.delta
+        FROM (SELECT tag_id, COUNT(*) AS delta FROM old_rows GROUP BY tag_id) d
+        WHERE t.id = d.tag_id;
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+DROP TRIGGER IF EXISTS novel_tags_count_insert ON novel_tags;
+CREATE TRIGGER novel_tags_count_insert
+    AFTER INSERT ON novel_tags
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION novel_tags_count();
+
+DROP TRIGGER IF EXISTS novel_tags_count_delete ON novel_tags;
+CREATE TRIGGER novel_tags_count_delete
+    AFTER DELETE ON novel_tags
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION novel_tags_count();
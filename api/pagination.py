@@ -0,0 +1,44 @@
+"""
+Keyset pagination helpers for Novels Reader
+
+Курсор - непрозрачная для клиента строка с ключом сортировки последней
+отданной строки, например (updated_at, id). Следующая страница выбирается
+условием (updated_at, id) < ($1, $2) по индексу, без OFFSET.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[type]) -> Tuple[Any, ...]:
+    """Разбирает курсор, приводя значения к ожидаемым типам"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(types):
+            raise InvalidCursor("Invalid cursor")
+        return tuple(
+            datetime.fromisoformat(v) if t is datetime else t(v)
+            for v, t in zip(payload, types)
+        )
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def next_cursor(rows: Sequence[Any], limit: int, keys: Sequence[str]) -> Optional[str]:
+    """Курсор следующей страницы или None, если страница неполная"""
+    if len(rows) < limit or not rows:
+        return None
+    last = rows[-1]
+    return encode_cursor([last[key] for key in keys])
@@ -0,0 +1,46 @@
+"""
+JSON responses for Novels Reader
+
+Записи asyncpg сериализуются сразу в bytes через orjson: datetime, Decimal
+и списки кодируются нативно, без промежуточного json.dumps и копирования
+каждой строки в dict в роуте. Без orjson работает запасной путь на stdlib.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+import asyncpg
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson есть в requirements.txt
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, asyncpg.Record):
+        return dict(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(payload: Any) -> bytes:
+        return orjson.dumps(payload, default=_default, option=_OPTIONS)
+else:
+    def dumps(payload: Any) -> bytes:
+        return json.dumps(payload, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse, который принимает записи asyncpg и даты как есть"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
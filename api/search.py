@@ -0,0 +1,196 @@
+"""
+Full-text search for Novels Reader
+
+Поиск идет по векторам из novel_search/chapter_search (см. миграцию 0005)
+с ранжированием ts_rank_cd. Если по словам ничего не нашлось, новеллы ищутся
+по триграммному сходству названия, чтобы прощать опечатки.
+
+Курсор страницы - (режим, ранг, id): режим fts или trgm, чтобы следующая
+страница продолжала тот же вид поиска.
+"""
+import html
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from api.pagination import encode_cursor
+
+# Маркеры подсветки заменяются на <mark> после экранирования текста
+_START = "⟦"
+_STOP = "⟧"
+_HEADLINE = f'StartSel="{_START}", StopSel="{_STOP}", MaxWords=35, MinWords=15, MaxFragments=2'
+_HEADLINE_ALL = f'StartSel="{_START}", StopSel="{_STOP}", HighlightAll=true'
+
+# Запрос ищет и словоформы, и точные слова (имена, латиница)
+_TSQUERY = "(websearch_to_tsquery('russian', $1) || websearch_to_tsquery('simple', $1))"
+
+
+def highlight(text: Optional[str]) -> Optional[str]:
+    if text is None:
+        return None
+    return html.escape(text).replace(_START, "<mark>").replace(_STOP, "</mark>")
+
+
+def _tags_filter(column: str, tags: Sequence[str], params: List[Any]) -> str:
+    """Условие: у новеллы есть все перечисленные теги"""
+    params.append(list(tags))
+    params.append(len(set(tags)))
+    return f"""{column} IN (
+        SELECT nt.novel_id FROM novel_tags nt
+        JOIN tags tg ON tg.id = nt.tag_id
+        WHERE tg.name = ANY(${len(params) - 1})
+        GROUP BY nt.novel_id
+        HAVING COUNT(DISTINCT tg.id) = ${len(params)}
+    )"""
+
+
+def _page(rows, mode: str, limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    items = []
+    for row in rows:
+        item = dict(row)
+        for key in ("highlight", "snippet"):
+            if key in item:
+                item[key] = highlight(item[key])
+        items.append(item)
+    cursor = None
+    if len(rows) == limit:
+        cursor = encode_cursor([mode, rows[-1]["rank"], rows[-1]["id"]])
+    return items, cursor
+
+
+async def _novels_fts(conn, query: str, limit: int, after, offset: int, tags):
+    params: List[Any] = [query]
+    conditions = ["s.document @@ q.query"]
+    if tags:
+        conditions.append(_tags_filter("s.novel_id", tags, params))
+    page_filter = ""
+    if after:
+        params.extend([after[1], after[2]])
+        page_filter = f"WHERE (rank, novel_id) < (${len(params) - 1}::real, ${len(params)})"
+    params.extend([limit, offset])
+
+    return await conn.fetch(f"""
+        WITH q AS (SELECT {_TSQUERY} AS query),
+        hits AS (
+            SELECT s.novel_id, ts_rank_cd(s.document, q.query) AS rank
+            FROM novel_search s, q
+            WHERE {" AND ".join(conditions)}
+        ),
+        page AS (
+            SELECT * FROM hits
+            {page_filter}
+            ORDER BY rank DESC, novel_id DESC
+            LIMIT ${len(params) - 1} OFFSET ${len(params)}
+        )
+        SELECT
+            n.*,
+            t.display_name as translator_name,
+            page.rank,
+            ts_headline('russian', n.title, q.query, '{_HEADLINE_ALL}') as highlight,
+            ts_headline('russian', coalesce(n.description, ''), q.query, '{_HEADLINE}') as snippet
+        FROM page
+        JOIN novels n ON n.id = page.novel_id
+        LEFT JOIN translators t ON n.translator_id = t.user_id
+        CROSS JOIN q
+        ORDER BY page.rank DESC, page.novel_id DESC
+    """, *params)
+
+
+async def _novels_trigram(conn, query: str, limit: int, after, offset: int, tags):
+    params: List[Any] = [query]
+    conditions = ["n.title % $1"]
+    if tags:
+        conditions.append(_tags_filter("n.id", tags, params))
+    page_filter = ""
+    if after:
+        params.extend([after[1], after[2]])
+        page_filter = f"WHERE (rank, id) < (${len(params) - 1}::real, ${len(params)})"
+    params.extend([limit, offset])
+
+    return await conn.fetch(f"""
+        SELECT * FROM (
+            SELECT
+                n.*,
+                t.display_name as translator_name,
+                similarity(n.title, $1) as rank,
+                n.title as highlight,
+                NULL::text as snippet
+            FROM novels n
+            LEFT JOIN translators t ON n.translator_id = t.user_id
+            WHERE {" AND ".join(conditions)}
+        ) r
+        {page_filter}
+        ORDER BY rank DESC, id DESC
+        LIMIT ${len(params) - 1} OFFSET ${len(params)}
+    """, *params)
+
+
+async def search_novels(
+    conn,
+    query: str,
+    limit: int = 20,
+    after: Optional[Tuple[str, float, int]] = None,
+    offset: int = 0,
+    tags: Optional[Sequence[str]] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Ранжированный поиск новелл. Возвращает страницу и курсор следующей"""
+    if after and after[0] == "trgm":
+        rows = await _novels_trigram(conn, query, limit, after, offset, tags)
+        return _page(rows, "trgm", limit)
+
+    rows = await _novels_fts(conn, query, limit, after, offset, tags)
+    if rows or after or offset:
+        return _page(rows, "fts", limit)
+
+    # По словам ничего нет - пробуем нечеткое совпадение названия
+    rows = await _novels_trigram(conn, query, limit, None, 0, tags)
+    return _page(rows, "trgm", limit)
+
+
+async def search_chapters(
+    conn,
+    query: str,
+    limit: int = 20,
+    after: Optional[Tuple[str, float, int]] = None,
+    offset: int = 0,
+    novel_id: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Поиск по тексту глав, по всему каталогу или внутри одной новеллы"""
+    params: List[Any] = [query]
+    conditions = ["cs.document @@ q.query"]
+    if novel_id is not None:
+        params.append(novel_id)
+        conditions.append(f"cs.novel_id = ${len(params)}")
+    page_filter = ""
+    if after:
+        params.extend([after[1], after[2]])
+        page_filter = f"WHERE (rank, chapter_id) < (${len(params) - 1}::real, ${len(params)})"
+    params.extend([limit, offset])
+
+    rows = await conn.fetch(f"""
+        WITH q AS (SELECT {_TSQUERY} AS query),
+        hits AS (
+            SELECT cs.chapter_id, ts_rank_cd(cs.document, q.query) AS rank
+            FROM chapter_search cs, q
+            WHERE {" AND ".join(conditions)}
+        ),
+        page AS (
+            SELECT * FROM hits
+            {page_filter}
+            ORDER BY rank DESC, chapter_id DESC
+            LIMIT ${len(params) - 1} OFFSET ${len(params)}
+        )
+        SELECT
+            c.id,
+            c.novel_id,
+            c.chapter_number,
+            c.title,
+            c.created_at,
+            n.title as novel_title,
+            page.rank,
+            ts_headline('russian', c.content, q.query, '{_HEADLINE}') as snippet
+        FROM page
+        JOIN chapters c ON c.id = page.chapter_id
+        JOIN novels n ON n.id = c.novel_id
+        CROSS JOIN q
+        ORDER BY page.rank DESC, page.chapter_id DESC
+    """, *params)
+    return _page(rows, "fts", limit)
@@ -0,0 +1,120 @@
+"""
+Translator stats reconciliation for Novels Reader
+
+translator_stats, novels.chapters_count, novels.subscribers_count и
+tags.novels_count поддерживаются триггерами (см. миграции 0007, 0008 и 0011).
+Сверка пересчитывает их из исходных таблиц одним запросом на таблицу
+и исправляет только разошедшиеся строки.
+
+Запуск из корня проекта (например, по cron раз в сутки):
+    python -m api.stats
+"""
+import argparse
+import asyncio
+import os
+from typing import Dict
+
+import asyncpg
+
+# Пересчет идет под блокировкой: записи, начатые во время сверки, ждут ее
+# конца и применяют свою разницу уже поверх пересчитанных значений
+RECONCILE_CHAPTERS = """
+    UPDATE novels n
+    SET chapters_count = coalesce(c.cnt, 0)
+    FROM novels n2
+    LEFT JOIN (SELECT novel_id, COUNT(*) AS cnt FROM chapters GROUP BY novel_id) c
+        ON c.novel_id = n2.id
+    WHERE n.id = n2.id AND n.chapters_count IS DISTINCT FROM coalesce(c.cnt, 0)
+"""
+
+RECONCILE_SUBSCRIBERS = """
+    UPDATE novels n
+    SET subscribers_count = coalesce(l.cnt, 0)
+    FROM novels n2
+    LEFT JOIN (
+        SELECT novel_id, COUNT(*) AS cnt FROM user_library WHERE subscribed GROUP BY novel_id
+    ) l ON l.novel_id = n2.id
+    WHERE n.id = n2.id AND n.subscribers_count IS DISTINCT FROM coalesce(l.cnt, 0)
+"""
+
+RECONCILE_TAGS = """
+    UPDATE tags t
+    SET novels_count = coalesce(c.cnt, 0)
+    FROM tags t2
+    LEFT JOIN (SELECT tag_id, COUNT(*) AS cnt FROM novel_tags GROUP BY tag_id) c
+        ON c.tag_id = t2.id
+    WHERE t.id = t2.id AND t.novels_count IS DISTINCT FROM coalesce(c.cnt, 0)
+"""
+
+RECONCILE_TRANSLATORS = """
+    WITH actual AS (
+        SELECT
+            t.user_id AS translator_id,
+            COUNT(n.id) AS novels_count,
+            coalesce(SUM(n.chapters_count), 0) AS chapters_count,
+            coalesce(SUM(n.subscribers_count), 0) AS subscribers_count,
+            coalesce(SUM(n.views), 0) AS total_views
+        FROM translators t
+        LEFT JOIN novels n ON n.translator_id = t.user_id
+        GROUP BY t.user_id
+    )
+    INSERT INTO translator_stats AS s (
+        translator_id, novels_count, chapters_count, subscribers_count, total_views
+    )
+    SELECT a.*
+    FROM actual a
+    LEFT JOIN translator_stats cur ON cur.translator_id = a.translator_id
+    WHERE (cur.novels_count, cur.chapters_count, cur.subscribers_count, cur.total_views)
+        IS DISTINCT FROM (a.novels_count, a.chapters_count, a.subscribers_count, a.total_views)
+    ON CONFLICT (translator_id) DO UPDATE SET
+        novels_count = EXCLUDED.novels_count,
+        chapters_count = EXCLUDED.chapters_count,
+        subscribers_count = EXCLUDED.subscribers_count,
+        total_views = EXCLUDED.total_views,
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def _affected(status: str) -> int:
+    # asyncpg возвращает статус команды вида "UPDATE 3" / "INSERT 0 3"
+    return int(status.rsplit(" ", 1)[-1])
+
+
+async def reconcile(conn) -> Dict[str, int]:
+    """Исправляет разошедшиеся счетчики. Возвращает число исправленных строк"""
+    async with conn.transaction():
+        await conn.execute("LOCK TABLE chapters IN SHARE MODE")
+        chapters = _affected(await conn.execute(RECONCILE_CHAPTERS))
+    async with conn.transaction():
+        await conn.execute("LOCK TABLE user_library IN SHARE MODE")
+        subscribers = _affected(await conn.execute(RECONCILE_SUBSCRIBERS))
+    async with conn.transaction():
+        await conn.execute("LOCK TABLE novel_tags IN SHARE MODE")
+        tags = _affected(await conn.execute(RECONCILE_TAGS))
+    async with conn.transaction():
+        await conn.execute("LOCK TABLE translator_stats IN SHARE ROW EXCLUSIVE MODE")
+        translators = _affected(await conn.execute(RECONCILE_TRANSLATORS))
+    return {"chapters": chapters, "subscribers": subscribers, "tags": tags, "translators": translators}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Recompute drifted Novels Reader counters")
+    parser.add_argument("--url", default=os.getenv("DATABASE_URL") or os.getenv("POSTGRES_URL"))
+    args = parser.parse_args()
+
+    if not args.url:
+        parser.error("DATABASE_URL not found in environment variables")
+
+    conn = await asyncpg.connect(args.url)
+    try:
+        fixed = await reconcile(conn)
+        print(
+            "fixed chapters_count on %(chapters)d novels, subscribers_count on %(subscribers)d novels, "
+            "novels_count on %(tags)d tags, stats of %(translators)d translators" % fixed
+        )
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""
+Tag catalog for Novels Reader
+
+Тегов немного и меняются они редко, поэтому словарь id <-> имя вместе
+с числом новелл у каждого тега (tags.novels_count, см. миграцию 0011)
+держится в памяти процесса. Роуты записи сбрасывают его сразу, остальные
+воркеры перечитывают словарь раз в TAGS_REFRESH_INTERVAL секунд.
+"""
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from api.http_cache import make_etag
+
+# Сколько тегов можно назначить новелле и длина имени тега
+MAX_NOVEL_TAGS = 20
+MAX_TAG_LENGTH = 50
+
+
+def normalize_names(names: Iterable[str]) -> List[str]:
+    """Имена без лишних пробелов, без повторов и пустых"""
+    result = []
+    for name in names:
+        name = " ".join(name.split())
+        if name and name not in result:
+            result.append(name)
+    return result
+
+
+def novels_filter(column: str, tag_ids: Sequence[int], mode: str, params: List[Any]) -> str:
+    """
+    Условие: у новеллы есть все теги (mode="all") или любой из них ("any").
+    Индекс novel_tags (tag_id, novel_id) отдает новеллы тега без чтения таблицы
+    """
+    params.append(list(tag_ids))
+    query = f"SELECT novel_id FROM novel_tags WHERE tag_id = ANY(${len(params)})"
+    if mode == "all" and len(tag_ids) > 1:
+        params.append(len(tag_ids))
+        query += f" GROUP BY novel_id HAVING COUNT(*) = ${len(params)}"
+    return f"{column} IN ({query})"
+
+
+class TagCatalog:
+    def __init__(self, refresh_interval: Optional[float] = None):
+        self.refresh_interval = (
+            refresh_interval if refresh_interval is not None
+            else float(os.getenv('TAGS_REFRESH_INTERVAL', '60'))
+        )
+        self.by_id: Dict[int, Dict[str, Any]] = {}
+        self.by_name: Dict[str, int] = {}
+        self.etag: Optional[str] = None
+        self._loaded_at = float("-inf")
+
+    async def refresh(self, database=None):
+        """Перечитывает словарь, если он устарел или был сброшен"""
+        if time.monotonic() - self._loaded_at < self.refresh_interval:
+            return
+
+        if database is None:
+            from api.database import db as database
+
+        async with database.acquire(readonly=True, cached=True) as conn:
+            rows = await conn.fetch("SELECT id, name, novels_count FROM tags")
+        self.by_id = {row["id"]: dict(row) for row in rows}
+        self.by_name = {row["name"]: row["id"] for row in rows}
+        self.etag = make_etag("tags", sorted((row["id"], row["novels_count"]) for row in rows))
+        self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        self._loaded_at = float("-inf")
+
+    def ids(self, names: Iterable[str]) -> List[Optional[int]]:
+        """id тегов по именам; None для неизвестных (или созданных в другом воркере до обновления)"""
+        return [self.by_name.get(name) for name in normalize_names(names)]
+
+    async def names(self, ids: Iterable[int], database=None) -> List[str]:
+        """Имена тегов по id из базы, по алфавиту"""
+        ids = list(ids)
+        if any(tag_id not in self.by_id for tag_id in ids):
+            # Тег создан в другом воркере после последнего обновления словаря
+            self.invalidate()
+            await self.refresh(database)
+        return sorted(self.by_id[tag_id]["name"] for tag_id in ids if tag_id in self.by_id)
+
+    def facets(self) -> List[Dict[str, Any]]:
+        """Теги для фильтра: сначала самые популярные"""
+        return sorted(self.by_id.values(), key=lambda tag: (-tag["novels_count"], tag["name"]))
+
+
+tag_catalog = TagCatalog()
@@ -0,0 +1,92 @@
+"""
+Buffered view counters for Novels Reader
+
+Просмотры копятся в памяти процесса и периодически записываются в базу
+одним UPDATE на таблицу, вместо UPDATE ... views + 1 на каждое чтение.
+"""
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from api.buffers import BufferedFlusher
+
+
+class ViewCounter(BufferedFlusher):
+    def __init__(
+        self,
+        table: str,
+        flush_interval: Optional[float] = None,
+        max_pending: Optional[int] = None,
+        dedup_window: Optional[float] = None
+    ):
+        super().__init__(
+            flush_interval if flush_interval is not None else float(os.getenv('VIEWS_FLUSH_INTERVAL', '10')),
+            max_pending if max_pending is not None else int(os.getenv('VIEWS_MAX_PENDING', '5000'))
+        )
+        # Имя таблицы подставляется в SQL, поэтому только из кода, не от клиента
+        self.table = table
+        self.name = f"{table} views"
+        self.dedup_window = (
+            dedup_window if dedup_window is not None
+            else float(os.getenv('VIEWS_DEDUP_WINDOW', '300'))
+        )
+        self._pending: Dict[int, int] = {}
+        self._seen: Dict[Tuple[int, str], float] = {}
+
+    def add(self, row_id: int, user_id: Optional[str] = None):
+        """Учитывает просмотр. Не обращается к базе и не блокирует запрос"""
+        if user_id and self.dedup_window > 0:
+            now = time.monotonic()
+            key = (row_id, user_id)
+            seen_at = self._seen.get(key)
+            if seen_at is not None and now - seen_at < self.dedup_window:
+                return
+            if len(self._seen) >= self.max_pending * 4:
+                self._prune_seen(now)
+            self._seen[key] = now
+
+        self._pending[row_id] = self._pending.get(row_id, 0) + 1
+        self._added()
+
+    async def _write(self, database, pending: Dict[int, int]):
+        ids = sorted(pending)
+        deltas = [pending[row_id] for row_id in ids]
+        async with database.acquire() as conn:
+            # Строки блокируются по возрастанию id: иначе порядок зависит
+            # от плана, и параллельные сбросы из разных воркеров (а через
+            # триггер novels - и translator_stats) могут взаимно заблокироваться
+            await conn.execute(f'''
+                UPDATE {self.table} AS t
+                SET views = t.views + l.delta
+                FROM (
+                    SELECT r.id, d.delta
+                    FROM {self.table} r
+                    JOIN unnest($1::int[], $2::int[]) AS d(id, delta) ON d.id = r.id
+                    ORDER BY r.id
+                    FOR UPDATE OF r
+                ) AS l
+                WHERE t.id = l.id
+            ''', ids, deltas)
+
+    def _requeue(self, pending: Dict[int, int]):
+        # Возвращаем просмотры в буфер, если в нем еще есть место
+        for row_id, delta in pending.items():
+            if row_id in self._pending or len(self._pending) < self.max_pending:
+                self._pending[row_id] = self._pending.get(row_id, 0) + delta
+
+    def _tick(self):
+        if self._seen:
+            self._prune_seen(time.monotonic())
+
+    def _prune_seen(self, now: float):
+        self._seen = {
+            key: seen_at for key, seen_at in self._seen.items()
+            if now - seen_at < self.dedup_window
+        }
+        # Дедупликация best-effort: если окно целиком заполнено, начинаем заново
+        if len(self._seen) >= self.max_pending * 4:
+            self._seen.clear()
+
+
+novel_views = ViewCounter('novels')
+chapter_views = ViewCounter('chapters')
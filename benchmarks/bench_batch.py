@@ -0,0 +1,74 @@
+"""
+Бенчмарк главной страницы подписок: N отдельных запросов против одного
+POST /api/novels/batch
+
+Старый путь на каждую новеллу запрашивает карточку и последнюю главу,
+а непрочитанные главы клиенту приходится считать отдельно. Запросы идут
+в приложение через ASGI, кеш ответов выключен, чтобы мерить базу.
+    DATABASE_URL=postgres://localhost/novels python -m benchmarks.bench_batch --novels 20
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("CACHE_ENABLED", "0")
+
+import httpx
+
+from api.database import db
+from api.main import app
+from api.migrate import ensure_schema
+
+
+async def n_calls(client: httpx.AsyncClient, ids):
+    async def one(novel_id):
+        novel = await client.get(f"/api/novels/{novel_id}")
+        chapters = await client.get(f"/api/novels/{novel_id}/chapters", params={"limit": 1, "sort": "desc"})
+        novel.raise_for_status()
+        chapters.raise_for_status()
+
+    await asyncio.gather(*(one(novel_id) for novel_id in ids))
+
+
+async def batch(client: httpx.AsyncClient, ids):
+    response = await client.post("/api/novels/batch", json={
+        "items": [{"novel_id": novel_id, "last_read_chapter_id": None} for novel_id in ids]
+    })
+    response.raise_for_status()
+
+
+async def run(name: str, load, client: httpx.AsyncClient, ids, repeat: int):
+    await load(client, ids)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        await load(client, ids)
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{name:<10} {elapsed * 1000:>8.2f} ms per page of {len(ids)} novels")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--novels", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    await db.connect()
+    await ensure_schema(db)
+    try:
+        async with db.acquire() as conn:
+            ids = [row["id"] for row in await conn.fetch(
+                "SELECT id FROM novels ORDER BY updated_at DESC, id DESC LIMIT $1", args.novels
+            )]
+        if not ids:
+            raise SystemExit("no novels in the database")
+
+        async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+            await run("N calls", n_calls, client, ids, args.repeat)
+            await run("batch", batch, client, ids, args.repeat)
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
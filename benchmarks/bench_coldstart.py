@@ -0,0 +1,112 @@
+"""
+Бенчмарк холодного старта serverless-функции
+
+Каждый прогон - новый процесс Python, как у холодного инстанса Vercel:
+- импорт api.main по `python -X importtime` (всего и самые тяжелые модули);
+- время от запуска процесса до первого ответа приложения.
+
+Без базы первым запросом идет `/`, с DATABASE_URL - `/api/warmup`, тогда
+в замер попадают создание пула и проверка схемы:
+    python -m benchmarks.bench_coldstart --runs 10
+    DATABASE_URL=postgres://localhost/novels python -m benchmarks.bench_coldstart --path /api/warmup
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+# Запускается в отдельном процессе: импорт приложения и один запрос через ASGI
+FIRST_REQUEST = """
+import asyncio, sys, time
+import httpx
+started = time.perf_counter()
+from api.main import app
+imported = time.perf_counter()
+
+async def main():
+    async with httpx.AsyncClient(app=app, base_url="http://coldstart") as client:
+        response = await client.get(sys.argv[1])
+    return response.status_code
+
+status = asyncio.run(main())
+done = time.perf_counter()
+print(imported - started, done - imported, status)
+"""
+
+
+def import_profile() -> Tuple[int, Dict[str, int]]:
+    """Суммарное время импорта и накопленное время по модулям, в микросекундах"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api.main"],
+        capture_output=True, text=True, check=True
+    )
+    total = 0
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        modules.setdefault(name, cumulative)
+        # Верхний уровень - то, что импортировал сам процесс
+        if indent == 1:
+            total += cumulative
+    return total, modules
+
+
+def first_request(path: str) -> Tuple[float, float, float, int]:
+    """Запуск процесса, импорт приложения и первый ответ, в секундах (httpx импортируется заранее)"""
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", FIRST_REQUEST, path],
+        capture_output=True, text=True, check=True
+    )
+    wall = time.perf_counter() - started
+    imported, handled, status = result.stdout.split()
+    return wall, float(imported), float(handled), int(status)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="сколько тяжелых модулей показать")
+    parser.add_argument("--path", default="/api/warmup" if os.getenv("DATABASE_URL") else "/")
+    args = parser.parse_args()
+
+    # Первый прогон прогревает .pyc, его не считаем
+    import_profile()
+
+    totals: List[int] = []
+    per_module: Dict[str, List[int]] = defaultdict(list)
+    for _ in range(args.runs):
+        total, modules = import_profile()
+        totals.append(total)
+        for name, value in modules.items():
+            per_module[name].append(value)
+
+    print(f"import api.main: median {statistics.median(totals) / 1000:.1f} ms over {args.runs} runs")
+    heaviest = sorted(per_module.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, values in heaviest[:args.top]:
+        print(f"  {statistics.median(values) / 1000:>8.1f} ms  {name}")
+    ours = [(name, values) for name, values in per_module.items() if name.startswith("api")]
+    print("project modules:")
+    for name, values in sorted(ours, key=lambda item: statistics.median(item[1]), reverse=True):
+        print(f"  {statistics.median(values) / 1000:>8.1f} ms  {name}")
+
+    samples = [first_request(args.path) for _ in range(args.runs)]
+    wall, imported, handled, status = (statistics.median(column) for column in zip(*samples))
+    print(
+        f"first request {args.path} ({int(status)}): process start to response {wall * 1000:.0f} ms, "
+        f"import {imported * 1000:.0f} ms, request {handled * 1000:.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Микробенчмарк сжатия глав: байты на проводе и CPU на запрос
+
+Сравниваются identity, сжатие на лету (gzip/br с уровнями middleware)
+и заранее сжатая копия из chapter_blobs, для которой на запрос не тратится
+ничего, кроме отдачи готовых байт. Без пакета brotli меряется только gzip.
+Запуск:
+    python -m benchmarks.bench_compression
+"""
+import argparse
+import random
+import timeit
+from datetime import datetime, timezone
+
+from api.compression import available_encodings, compress
+from api.responses import dumps
+
+PARAGRAPH = (
+    "Ветер гнал по двору сухие листья, и старый мастер долго смотрел "
+    "на ворота, прежде чем ответить ученику. "
+)
+
+
+def chapter_body(chars: int) -> bytes:
+    # Слова перемешаны, иначе повторяющийся абзац сжимается нереалистично хорошо
+    words = PARAGRAPH.split()
+    rng = random.Random(chars)
+    content = " ".join(rng.choice(words) for _ in range(chars // 6))[:chars]
+    return dumps({
+        "status": "success",
+        "data": {
+            "id": 1,
+            "novel_id": 1,
+            "chapter_number": 1,
+            "title": "Глава 1",
+            "content": content,
+            "created_at": datetime.now(timezone.utc),
+            "prev_chapter_id": None,
+            "next_chapter_id": 2,
+        }
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="5000,20000,60000", help="длина главы в символах")
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args()
+
+    for size in [int(size) for size in args.sizes.split(",")]:
+        body = chapter_body(size)
+        print(f"{size} chars, identity {len(body)} bytes")
+        for encoding in available_encodings():
+            live = compress(body, encoding)
+            stored = compress(body, encoding, stored=True)
+            cost = min(timeit.repeat(lambda: compress(body, encoding), number=args.number, repeat=3)) / args.number
+            print(
+                f"   {encoding:<5} on the fly {len(live):>7} bytes {cost * 1e3:>7.2f} ms/request"
+                f"   stored {len(stored):>7} bytes    0.00 ms/request"
+            )
+
+
+if __name__ == "__main__":
+    main()
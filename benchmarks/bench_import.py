@@ -0,0 +1,90 @@
+"""
+Бенчмарк загрузки глав: по одной через POST /chapters против одного
+NDJSON-запроса к /chapters/import (COPY в одной транзакции)
+
+Запросы идут в приложение напрямую через ASGI, без сети. Для замера
+создается временная новелла, после него она удаляется вместе с главами.
+    DATABASE_URL=postgres://localhost/novels python -m benchmarks.bench_import --chapters 500
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from api.database import db
+from api.main import app
+from api.migrate import ensure_schema
+from api.responses import dumps
+
+CONTENT = "Текст главы. " * 800
+
+
+def chapter(novel_id: int, number: int):
+    return {
+        "novel_id": novel_id,
+        "chapter_number": number,
+        "title": f"Глава {number}",
+        "content": CONTENT,
+    }
+
+
+async def create_novel() -> int:
+    async with db.acquire() as conn:
+        return await conn.fetchval(
+            "INSERT INTO novels (title) VALUES ('bench_import') RETURNING id"
+        )
+
+
+async def delete_novel(novel_id: int):
+    async with db.acquire() as conn:
+        await conn.execute("DELETE FROM novels WHERE id = $1", novel_id)
+
+
+async def per_chapter(client: httpx.AsyncClient, novel_id: int, count: int):
+    for number in range(1, count + 1):
+        response = await client.post(f"/api/novels/{novel_id}/chapters", json=chapter(novel_id, number))
+        response.raise_for_status()
+
+
+async def bulk(client: httpx.AsyncClient, novel_id: int, count: int):
+    async def body():
+        for number in range(1, count + 1):
+            yield dumps(chapter(novel_id, number)) + b"\n"
+
+    response = await client.post(
+        f"/api/novels/{novel_id}/chapters/import",
+        content=body(),
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    response.raise_for_status()
+
+
+async def run(name: str, load, client: httpx.AsyncClient, count: int):
+    novel_id = await create_novel()
+    try:
+        started = time.perf_counter()
+        await load(client, novel_id, count)
+        elapsed = time.perf_counter() - started
+    finally:
+        await delete_novel(novel_id)
+    print(f"{name:<12} {count / elapsed:>10.1f} chapters/s   {elapsed:>7.2f} s total")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chapters", type=int, default=300)
+    args = parser.parse_args()
+
+    await db.connect()
+    await ensure_schema(db)
+    try:
+        async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+            await run("per-chapter", per_chapter, client, args.chapters)
+            await run("import", bulk, client, args.chapters)
+    finally:
+        await db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
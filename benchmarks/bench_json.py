@@ -0,0 +1,97 @@
+"""
+Микробенчмарк сериализации списков: stdlib json против api.responses.dumps
+
+С DATABASE_URL строки берутся настоящими записями asyncpg, без него -
+словарями той же формы. Запуск:
+    python -m benchmarks.bench_json
+    DATABASE_URL=postgres://localhost/novels python -m benchmarks.bench_json
+"""
+import argparse
+import asyncio
+import json
+import os
+import timeit
+from datetime import datetime, timezone
+
+from api.responses import dumps
+
+ROWS_QUERY = """
+    SELECT
+        g as id,
+        'Новелла ' || g as title,
+        repeat('Описание новеллы. ', 20) as description,
+        NULL::text as cover_url,
+        'translator' as translator_id,
+        'ongoing' as status,
+        now() as created_at,
+        now() as updated_at,
+        g * 10 as views,
+        g as subscribers_count,
+        g % 300 as chapters_count,
+        'Переводчик' as translator_name
+    FROM generate_series(1, $1) g
+"""
+
+
+def fake_rows(count: int):
+    now = datetime.now(timezone.utc)
+    return [{
+        "id": i,
+        "title": f"Новелла {i}",
+        "description": "Описание новеллы. " * 20,
+        "cover_url": None,
+        "translator_id": "translator",
+        "status": "ongoing",
+        "created_at": now,
+        "updated_at": now,
+        "views": i * 10,
+        "subscribers_count": i,
+        "chapters_count": i % 300,
+        "translator_name": "Переводчик",
+    } for i in range(1, count + 1)]
+
+
+def stdlib_path(rows):
+    # Как было в роутах: копия каждой строки в dict и json.dumps
+    return json.dumps({"status": "success", "data": [dict(r) for r in rows]}, default=str).encode()
+
+
+def fast_path(rows):
+    return dumps({"status": "success", "data": rows})
+
+
+async def load_rows(sizes):
+    import asyncpg
+    conn = await asyncpg.connect(os.environ["DATABASE_URL"])
+    try:
+        return {size: await conn.fetch(ROWS_QUERY, size) for size in sizes}
+    finally:
+        await conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="20,100,500")
+    parser.add_argument("--number", type=int, default=500)
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    if os.getenv("DATABASE_URL"):
+        rows_by_size = asyncio.run(load_rows(sizes))
+        source = "asyncpg records"
+    else:
+        rows_by_size = {size: fake_rows(size) for size in sizes}
+        source = "dict rows"
+
+    print(f"source: {source}")
+    for size, rows in rows_by_size.items():
+        old = min(timeit.repeat(lambda: stdlib_path(rows), number=args.number, repeat=5)) / args.number
+        new = min(timeit.repeat(lambda: fast_path(rows), number=args.number, repeat=5)) / args.number
+        print(
+            f"{size:>4} rows   stdlib {old * 1e6:>9.1f} us   fast {new * 1e6:>9.1f} us"
+            f"   x{old / new:.1f}   {len(fast_path(rows))} bytes"
+        )
+
+
+if __name__ == "__main__":
+    main()
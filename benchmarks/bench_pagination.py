@@ -0,0 +1,88 @@
+"""
+Бенчмарк: OFFSET против keyset-пагинации для ленты последних глав
+
+Засевает базу тестовыми данными и сравнивает задержку первой и глубокой
+страницы ленты из feed_entries (как /api/chapters/latest, индекс
+(created_at, chapter_id)). Для сравнения рядом меряется прежний запрос
+ленты через JOIN chapters, novels и translators. Запуск против локального Postgres:
+    DATABASE_URL=postgres://localhost/novels python -m benchmarks.bench_pagination --chapters 200000 --page 500
+"""
+import argparse
+import asyncio
+
+from benchmarks.seed import cleanup, connect, measure, seed
+
+PREFIX = "bench-pagination-"
+
+FEED = """
+    SELECT f.chapter_id as id, f.novel_id, f.chapter_number, f.chapter_title as title,
+           f.novel_title, f.translator_name, f.created_at
+    FROM feed_entries f
+"""
+OFFSET_QUERY = FEED + " ORDER BY f.created_at DESC, f.chapter_id DESC LIMIT $1 OFFSET $2"
+KEYSET_QUERY = FEED + (
+    " WHERE (f.created_at, f.chapter_id) < ($2, $3)"
+    " ORDER BY f.created_at DESC, f.chapter_id DESC LIMIT $1"
+)
+
+# Базовая линия: лента до feed_entries, с JOIN и чтением строк глав
+JOIN_FEED = """
+    SELECT c.*, n.title as novel_title, t.display_name as translator_name
+    FROM chapters c
+    JOIN novels n ON c.novel_id = n.id
+    LEFT JOIN translators t ON n.translator_id = t.user_id
+"""
+JOIN_OFFSET_QUERY = JOIN_FEED + " ORDER BY c.created_at DESC, c.id DESC LIMIT $1 OFFSET $2"
+JOIN_KEYSET_QUERY = JOIN_FEED + " WHERE (c.created_at, c.id) < ($2, $3) ORDER BY c.created_at DESC, c.id DESC LIMIT $1"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--novels", type=int, default=2000)
+    parser.add_argument("--chapters", type=int, default=200000)
+    parser.add_argument("--page", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="не удалять тестовые данные")
+    args = parser.parse_args()
+
+    conn = await connect()
+    try:
+        await cleanup(conn, PREFIX)
+        # 9 абзацев по ~300 символов - обычная длина главы
+        await seed(conn, 1, args.novels, max(1, args.chapters // args.novels), 9, prefix=PREFIX)
+
+        deep_offset = (args.page - 1) * args.limit
+        # Курсор глубокой страницы - ключ последней строки предыдущей страницы
+        anchor = await conn.fetchrow(
+            "SELECT created_at, chapter_id AS id FROM feed_entries"
+            " ORDER BY created_at DESC, chapter_id DESC OFFSET $1 LIMIT 1",
+            deep_offset - 1
+        )
+        first = await conn.fetchrow(
+            "SELECT created_at, chapter_id AS id FROM feed_entries ORDER BY created_at DESC, chapter_id DESC LIMIT 1"
+        )
+        first_key = (first["created_at"], first["id"] + 1)
+        deep_key = (anchor["created_at"], anchor["id"])
+
+        cases = []
+        for label, offset_query, keyset_query in (
+            ("feed", OFFSET_QUERY, KEYSET_QUERY),
+            ("join baseline", JOIN_OFFSET_QUERY, JOIN_KEYSET_QUERY),
+        ):
+            cases += [
+                (f"{label} offset page 1", offset_query, (args.limit, 0)),
+                (f"{label} offset page {args.page}", offset_query, (args.limit, deep_offset)),
+                (f"{label} keyset page 1", keyset_query, (args.limit, *first_key)),
+                (f"{label} keyset page {args.page}", keyset_query, (args.limit, *deep_key)),
+            ]
+        for name, query, query_args in cases:
+            await measure(name, lambda: conn.fetch(query, *query_args), args.repeat, width=32)
+    finally:
+        if not args.keep:
+            await cleanup(conn, PREFIX)
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,84 @@
+"""
+Бенчмарк: новый пул на каждый запрос против общего пула процесса
+
+Запуск против локального Postgres:
+    DATABASE_URL=postgres://localhost/novels python -m benchmarks.bench_pool --requests 2000 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import List
+
+import asyncpg
+
+from api.database import Database
+from benchmarks.seed import percentile
+
+QUERY = """
+    SELECT n.*, t.display_name as translator_name
+    FROM novels n
+    LEFT JOIN translators t ON n.translator_id = t.user_id
+    ORDER BY n.updated_at DESC
+    LIMIT 20
+"""
+
+
+async def per_request_pool(url: str):
+    # Так работали роуты до перехода на общий пул
+    pool = await asyncpg.create_pool(url, min_size=1, max_size=1)
+    try:
+        async with pool.acquire() as conn:
+            await conn.fetch(QUERY)
+    finally:
+        await pool.close()
+
+
+async def shared_pool(database: Database):
+    async with database.acquire() as conn:
+        await conn.fetch(QUERY)
+
+
+async def run(name: str, make_call, total: int, concurrency: int):
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await make_call()
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"{name:<18} {total / elapsed:>10.1f} req/s"
+        f"   p50 {percentile(latencies, 50) * 1000:>8.2f} ms"
+        f"   p99 {percentile(latencies, 99) * 1000:>8.2f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    url = os.environ["DATABASE_URL"]
+
+    # Пер-запросный пул открывает concurrency соединений одновременно,
+    # поэтому общему пулу даем тот же лимит
+    database = Database(url, min_size=1, max_size=args.concurrency)
+    await database.connect()
+    try:
+        await run("per-request pool", lambda: per_request_pool(url), args.requests, args.concurrency)
+        await run("shared pool", lambda: shared_pool(database), args.requests, args.concurrency)
+        print("pool:", database.pool_stats())
+    finally:
+        await database.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""
+Бенчмарк поиска: ILIKE против полнотекстового поиска и триграмм
+
+Генерирует каталог (по умолчанию 100k новелл и 1M глав) из случайных слов
+и замеряет старый ILIKE-запрос, ранжированный поиск новелл, поиск с
+опечаткой и поиск по тексту глав. Запуск против локального Postgres:
+    DATABASE_URL=postgres://localhost/novels python -m benchmarks.bench_search
+"""
+import argparse
+import asyncio
+import time
+
+from api import search
+from benchmarks.seed import cleanup, connect, measure, seed_translators
+
+PREFIX = "bench-search-"
+
+WORDS = [
+    "дракон", "меч", "императрица", "академия", "демон", "наследник", "клан",
+    "магия", "охотник", "башня", "королевство", "тень", "регрессия", "игрок",
+    "система", "уровень", "небесный", "путь", "бессмертный", "алхимик",
+    "герцог", "злодейка", "рыцарь", "подземелье", "артефакт", "проклятие",
+    "луна", "пламя", "лес", "гильдия", "seoul", "hunter", "murim", "sword",
+]
+
+# Подзапрос ссылается на g, чтобы слова выбирались заново для каждой строки
+RANDOM_TEXT = """array_to_string(ARRAY(
+    SELECT ($1::text[])[1 + floor(random() * array_length($1::text[], 1))::int]
+    FROM generate_series(1, {words} + (g % 1))
+), ' ')"""
+
+ILIKE_QUERY = """
+    SELECT * FROM novels
+    WHERE title ILIKE $1 OR description ILIKE $1
+    ORDER BY updated_at DESC
+    LIMIT $2
+"""
+
+
+async def seed(conn, novels: int, chapters: int):
+    [translator] = await seed_translators(conn, 1, PREFIX)
+    await conn.execute(f"""
+        INSERT INTO novels (title, description, translator_id)
+        SELECT {RANDOM_TEXT.format(words=3)}, {RANDOM_TEXT.format(words=40)}, $2
+        FROM generate_series(1, $3) g
+    """, WORDS, translator, novels)
+    await conn.execute(f"""
+        INSERT INTO chapters (novel_id, chapter_number, title, content)
+        SELECT n.id, c, 'Глава ' || c, {RANDOM_TEXT.format(words=300)}
+        FROM (SELECT id, row_number() OVER (ORDER BY id) AS g FROM novels WHERE translator_id = $2) n,
+             generate_series(1, $3) c
+    """, WORDS, translator, max(1, chapters // novels))
+    await conn.execute("ANALYZE")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--novels", type=int, default=100000)
+    parser.add_argument("--chapters", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--query", default="бессмертный алхимик")
+    parser.add_argument("--typo", default="бесмертный алхимек")
+    parser.add_argument("--keep", action="store_true", help="не удалять тестовые данные")
+    parser.add_argument("--skip-seed", action="store_true", help="использовать уже засеянные данные")
+    args = parser.parse_args()
+
+    conn = await connect()
+    try:
+        if not args.skip_seed:
+            await cleanup(conn, PREFIX)
+            started = time.perf_counter()
+            await seed(conn, args.novels, args.chapters)
+            print(f"seeded in {time.perf_counter() - started:.1f} s")
+
+        first_word = args.query.split()[0]
+        await measure("ILIKE (old)", lambda: conn.fetch(ILIKE_QUERY, f"%{first_word}%", 20), args.repeat)
+        await measure("fts novels", lambda: search.search_novels(conn, args.query), args.repeat)
+        await measure("fts novels, page 2", lambda: search.search_novels(conn, args.query, offset=20), args.repeat)
+        await measure("trigram fallback (typo)", lambda: search.search_novels(conn, args.typo), args.repeat)
+        await measure("fts chapters", lambda: search.search_chapters(conn, args.query), args.repeat)
+    finally:
+        if not args.keep:
+            await cleanup(conn, PREFIX)
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,142 @@
+"""
+Бенчмарк каталога тегов: фильтр новелл по тегам и счетчики для фасетов
+
+Засевает каталог (по умолчанию 100k новелл и 200 тегов с неравномерной
+популярностью, 3-8 тегов на новеллу) и сравнивает:
+- фильтр через JOIN с tags по именам (как в поиске) и по id через индекс
+  novel_tags (tag_id, novel_id), для популярных и редких тегов, all и any;
+- фасеты через COUNT(*) по novel_tags, из tags.novels_count и из словаря в памяти.
+Запуск против локального Postgres:
+    DATABASE_URL=postgres://localhost/novels python -m benchmarks.bench_tags --novels 100000
+"""
+import argparse
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from api.tags import TagCatalog, novels_filter
+from benchmarks import seed as catalog_seed
+from benchmarks.seed import connect, measure, seed_translators
+
+PREFIX = "bench-tags-"
+TAG_PREFIX = "bench-tag-"
+
+# Ширина колонки с названием случая в выводе
+WIDTH = 36
+
+LIST = """
+    SELECT n.*, t.display_name as translator_name FROM novels n
+    LEFT JOIN translators t ON n.translator_id = t.user_id
+    WHERE {condition}
+    ORDER BY n.updated_at DESC, n.id DESC LIMIT 20
+"""
+
+# Так фильтрует по тегам поиск: имена через JOIN и COUNT(DISTINCT)
+BY_NAME = """n.id IN (
+    SELECT nt.novel_id FROM novel_tags nt
+    JOIN tags tg ON tg.id = nt.tag_id
+    WHERE tg.name = ANY($1)
+    GROUP BY nt.novel_id
+    HAVING COUNT(DISTINCT tg.id) = $2
+)"""
+
+FACETS_COUNT = """
+    SELECT tg.id, tg.name, COUNT(nt.novel_id) AS novels_count
+    FROM tags tg LEFT JOIN novel_tags nt ON nt.tag_id = tg.id
+    GROUP BY tg.id
+"""
+
+
+class BenchDatabase:
+    """Замена api.database.db для TagCatalog: всегда одно и то же соединение"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @asynccontextmanager
+    async def acquire(self, **kwargs):
+        yield self.conn
+
+
+async def seed(conn, novels: int, tags: int):
+    [translator] = await seed_translators(conn, 1, PREFIX)
+    await conn.execute("""
+        INSERT INTO tags (name) SELECT $1 || g FROM generate_series(1, $2) g
+        ON CONFLICT (name) DO NOTHING
+    """, TAG_PREFIX, tags)
+    await conn.execute("""
+        INSERT INTO novels (title, translator_id, updated_at)
+        SELECT 'Новелла ' || g, $1, now() - g * interval '1 minute'
+        FROM generate_series(1, $2) g
+    """, translator, novels)
+    # Номер тега ~ квадрат случайного числа: первые теги намного популярнее
+    await conn.execute("""
+        INSERT INTO novel_tags (novel_id, tag_id)
+        SELECT DISTINCT n.id, tg.id
+        FROM (SELECT id FROM novels WHERE translator_id = $1) n
+        CROSS JOIN LATERAL (
+            SELECT 1 + floor(power(random(), 2) * $3)::int AS num
+            FROM generate_series(1, 3 + n.id % 6)
+        ) r
+        JOIN tags tg ON tg.name = $2 || r.num
+    """, translator, TAG_PREFIX, tags)
+    await conn.execute("ANALYZE novels; ANALYZE tags; ANALYZE novel_tags")
+
+
+async def cleanup(conn):
+    await catalog_seed.cleanup(conn, PREFIX)
+    await conn.execute("DELETE FROM tags WHERE name LIKE $1", TAG_PREFIX + "%")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--novels", type=int, default=100000)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--keep", action="store_true", help="не удалять тестовые данные")
+    parser.add_argument("--skip-seed", action="store_true", help="использовать уже засеянные данные")
+    args = parser.parse_args()
+
+    conn = await connect()
+    try:
+        if not args.skip_seed:
+            await cleanup(conn)
+            started = time.perf_counter()
+            await seed(conn, args.novels, args.tags)
+            print(f"seeded in {time.perf_counter() - started:.1f} s")
+
+        catalog = TagCatalog(refresh_interval=3600)
+        await catalog.refresh(BenchDatabase(conn))
+
+        cases = {
+            "popular": [f"{TAG_PREFIX}1", f"{TAG_PREFIX}2"],
+            "rare": [f"{TAG_PREFIX}{args.tags - 1}", f"{TAG_PREFIX}{args.tags}"],
+        }
+        for label, names in cases.items():
+            await measure(
+                f"{label}, all, join by name (old)",
+                lambda: conn.fetch(LIST.format(condition=BY_NAME), names, len(names)),
+                args.repeat, WIDTH
+            )
+            for mode in ("all", "any"):
+                params = []
+                query = LIST.format(condition=novels_filter("n.id", catalog.ids(names), mode, params))
+                await measure(f"{label}, {mode}, by id", lambda: conn.fetch(query, *params), args.repeat, WIDTH)
+
+        await measure("facets, COUNT(*) (old)", lambda: conn.fetch(FACETS_COUNT), args.repeat, WIDTH)
+        await measure("facets, tags.novels_count", lambda: conn.fetch(
+            "SELECT id, name, novels_count FROM tags"
+        ), args.repeat, WIDTH)
+
+        async def in_memory():
+            return catalog.facets()
+
+        await measure("facets, in-memory catalog", in_memory, args.repeat, WIDTH)
+    finally:
+        if not args.keep:
+            await cleanup(conn)
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
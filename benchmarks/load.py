@@ -0,0 +1,291 @@
+"""
+Нагрузочный прогон по сценариям клиента
+
+Виртуальные пользователи повторяют то, что делает Mini App:
+- главная (app.js): библиотека, подписки одним batch-запросом, лента глав;
+- страница новеллы (novel.js): карточка, список глав, просмотр;
+- читалка (chapter.js): первый экран главы, остаток потоком, просмотр,
+  прогресс, переход к следующей главе;
+- кабинет переводчика (translator.js): свои новеллы, статистика, публикация главы.
+
+Сервер запускается отдельно, каталог засевается benchmarks.seed:
+    DATABASE_URL=postgres://localhost/novels python -m benchmarks.seed
+    uvicorn api.main:app --workers 4
+    python -m benchmarks.load --duration 60 --users 50 --output before.json
+    python -m benchmarks.load --duration 60 --users 50 --output after.json --compare before.json
+
+Для каждого эндпоинта печатаются запросы в секунду, ошибки и p50/p95/p99;
+с --output результаты сохраняются в JSON вместе с коммитом для сравнения.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+from api.auth import BOT_TOKEN, INIT_DATA_HEADER, sign_init_data
+from benchmarks.seed import PREFIX, percentile
+
+
+class Recorder:
+    """Задержки и ошибки по эндпоинтам"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, name: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+            return None
+        return response
+
+    async def stream(self, client: httpx.AsyncClient, name: str, url: str, **kwargs) -> int:
+        """Читает NDJSON-поток целиком, время - до последнего куска"""
+        started = time.perf_counter()
+        lines = 0
+        try:
+            async with client.stream("GET", url, **kwargs) as response:
+                if response.status_code >= 400:
+                    self.errors[name] += 1
+                    return 0
+                async for line in response.aiter_lines():
+                    lines += bool(line)
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return 0
+        self.latencies[name].append(time.perf_counter() - started)
+        return lines
+
+    def summary(self, elapsed: float) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            samples = self.latencies.get(name, [])
+            result[name] = {
+                "requests": len(samples),
+                "errors": self.errors.get(name, 0),
+                "rps": len(samples) / elapsed,
+                "p50_ms": percentile(samples, 50) * 1000 if samples else None,
+                "p95_ms": percentile(samples, 95) * 1000 if samples else None,
+                "p99_ms": percentile(samples, 99) * 1000 if samples else None,
+            }
+        return result
+
+
+class Catalog:
+    """Id новелл засеянного каталога по переводчикам"""
+
+    def __init__(self, novels: Dict[str, List[int]]):
+        self.novels = novels
+        self.all = [novel_id for ids in novels.values() for novel_id in ids]
+
+    @classmethod
+    async def load(cls, client: httpx.AsyncClient, translators: int) -> "Catalog":
+        novels = {}
+        for i in range(1, translators + 1):
+            translator_id = f"{PREFIX}translator-{i}"
+            response = await client.get("/api/novels", params={"translator_id": translator_id, "limit": 100})
+            response.raise_for_status()
+            novels[translator_id] = [novel["id"] for novel in response.json()["data"]]
+        catalog = cls({key: ids for key, ids in novels.items() if ids})
+        if not catalog.all:
+            raise SystemExit("no seeded novels, run `python -m benchmarks.seed` first")
+        return catalog
+
+
+async def home(client: httpx.AsyncClient, rec: Recorder, headers):
+    response = await rec.call(client, "GET /api/library", "GET", "/api/library", headers=headers)
+    library = response.json()["data"] if response else {}
+    progress = library.get("progress", {})
+    ids = library.get("subscriptions", [])[:20]
+    if ids:
+        await rec.call(
+            client, "POST /api/novels/batch", "POST", "/api/novels/batch", headers=headers,
+            json={"items": [
+                {"novel_id": novel_id, "last_read_chapter_id": progress.get(str(novel_id), {}).get("chapter_id")}
+                for novel_id in ids
+            ]}
+        )
+    await rec.call(client, "GET /api/chapters/latest", "GET", "/api/chapters/latest", headers=headers)
+
+
+async def open_novel(client: httpx.AsyncClient, rec: Recorder, headers, novel_id: int) -> List[int]:
+    _, chapters = await asyncio.gather(
+        rec.call(client, "GET /api/novels/{id}", "GET", f"/api/novels/{novel_id}", headers=headers),
+        rec.call(
+            client, "GET /api/novels/{id}/chapters", "GET", f"/api/novels/{novel_id}/chapters",
+            params={"sort": "asc"}, headers=headers
+        )
+    )
+    await rec.call(client, "POST /api/novels/{id}/views", "POST", f"/api/novels/{novel_id}/views", headers=headers)
+    return [chapter["id"] for chapter in chapters.json()["data"]] if chapters else []
+
+
+async def read_chapter(client: httpx.AsyncClient, rec: Recorder, headers, novel_id: int, chapter_id: int) -> Optional[int]:
+    base = f"/api/novels/{novel_id}/chapters/{chapter_id}"
+    _, content = await asyncio.gather(
+        rec.call(client, "GET /api/novels/{id}", "GET", f"/api/novels/{novel_id}", headers=headers),
+        rec.call(client, "GET .../content", "GET", f"{base}/content", headers=headers)
+    )
+    if not content:
+        return None
+    chapter = content.json()["data"]
+    if chapter.get("next_start") is not None:
+        await rec.stream(client, "GET .../content/stream", f"{base}/content/stream",
+                         params={"start": chapter["next_start"]}, headers=headers)
+    await rec.call(client, "POST .../views", "POST", f"{base}/views", headers=headers)
+    await rec.call(client, "POST /api/library/progress", "POST", "/api/library/progress", headers=headers, json={
+        "items": [{
+            "novel_id": novel_id,
+            "chapter_id": chapter_id,
+            "position": random.randint(0, 5000),
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }]
+    })
+    return chapter.get("next_chapter_id")
+
+
+def auth_headers(user_id: str) -> Dict[str, str]:
+    # Сервер верит только подписанной initData: подписываем тем же BOT_TOKEN
+    if not BOT_TOKEN:
+        return {}
+    fields = {"auth_date": str(int(time.time())), "user": json.dumps({"id": user_id})}
+    return {INIT_DATA_HEADER: sign_init_data(fields, BOT_TOKEN)}
+
+
+async def reader_session(client: httpx.AsyncClient, rec: Recorder, catalog: Catalog, user: int, think: float):
+    headers = auth_headers(f"{PREFIX}reader-{user}")
+    await home(client, rec, headers)
+    await asyncio.sleep(think)
+    novel_id = random.choice(catalog.all)
+    chapter_ids = await open_novel(client, rec, headers, novel_id)
+    if not chapter_ids:
+        return
+    await asyncio.sleep(think)
+    chapter_id = random.choice(chapter_ids)
+    # Несколько глав подряд по кнопке "следующая"
+    for _ in range(random.randint(1, 5)):
+        chapter_id = await read_chapter(client, rec, headers, novel_id, chapter_id)
+        if chapter_id is None:
+            break
+        await asyncio.sleep(think)
+
+
+async def translator_session(client: httpx.AsyncClient, rec: Recorder, catalog: Catalog, counter, think: float):
+    translator_id = random.choice(list(catalog.novels))
+    headers = auth_headers(translator_id)
+    await asyncio.gather(
+        rec.call(client, "GET /api/novels?translator_id", "GET", "/api/novels",
+                 params={"translator_id": translator_id}, headers=headers),
+        rec.call(client, "GET /api/translators/{id}/stats", "GET", f"/api/translators/{translator_id}/stats",
+                 headers=headers)
+    )
+    await asyncio.sleep(think)
+    novel_id = random.choice(catalog.novels[translator_id])
+    # Номера выше засеянных, чтобы не пересекаться с существующими главами
+    number = 1_000_000 + next(counter)
+    await rec.call(
+        client, "POST /api/novels/{id}/chapters", "POST", f"/api/novels/{novel_id}/chapters", headers=headers,
+        json={
+            "novel_id": novel_id,
+            "chapter_number": number,
+            "title": f"Глава {number}",
+            "content": "\n".join(["Текст новой главы. " * 15] * 60)
+        }
+    )
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, baseline=None):
+    print(f"{'endpoint':<34} {'req/s':>8} {'err':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in report["endpoints"].items():
+        line = (
+            f"{name:<34} {row['rps']:>8.1f} {row['errors']:>6}"
+            + "".join(f" {row[key]:>9.2f}" if row[key] is not None else f" {'-':>9}"
+                      for key in ("p50_ms", "p95_ms", "p99_ms"))
+        )
+        old = (baseline or {}).get("endpoints", {}).get(name)
+        if old and old["p95_ms"] and row["p95_ms"]:
+            line += f"   p95 {(row['p95_ms'] / old['p95_ms'] - 1) * 100:+.0f}%"
+        print(line)
+    print(f"total {report['throughput']:.1f} req/s, {report['errors']} errors, commit {report['commit']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=20, help="одновременных пользователей")
+    parser.add_argument("--duration", type=float, default=30, help="секунд")
+    parser.add_argument("--translators", type=int, default=20, help="как в benchmarks.seed")
+    parser.add_argument("--readers", type=int, default=1000, help="как в benchmarks.seed")
+    parser.add_argument("--publish-ratio", type=float, default=0.02, help="доля сессий переводчика")
+    parser.add_argument("--think", type=float, default=0.0, help="пауза между экранами, секунд")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="сохранить результаты в JSON")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    rec = Recorder()
+    counter = iter(range(10 ** 9))
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30,
+                                 headers={"Accept-Encoding": "gzip"}) as client:
+        catalog = await Catalog.load(client, args.translators)
+        deadline = time.perf_counter() + args.duration
+
+        async def user(index: int):
+            while time.perf_counter() < deadline:
+                if random.random() < args.publish_ratio:
+                    await translator_session(client, rec, catalog, counter, args.think)
+                else:
+                    await reader_session(client, rec, catalog, random.randint(1, args.readers), args.think)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(i) for i in range(args.users)))
+        elapsed = time.perf_counter() - started
+
+    endpoints = rec.summary(elapsed)
+    report = {
+        "commit": git_commit(),
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "args": vars(args),
+        "elapsed": elapsed,
+        "throughput": sum(row["requests"] for row in endpoints.values()) / elapsed,
+        "errors": sum(row["errors"] for row in endpoints.values()),
+        "endpoints": endpoints,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
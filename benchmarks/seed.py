@@ -0,0 +1,158 @@
+"""
+Генератор тестового каталога для нагрузочных прогонов и бенчмарков
+
+Создает переводчиков, новеллы, главы и читателей с подписками в заданном
+масштабе. Все данные помечены префиксом load-, повторный запуск сначала
+удаляет предыдущий набор:
+    DATABASE_URL=postgres://localhost/novels python -m benchmarks.seed --novels 500 --chapters 100
+    DATABASE_URL=postgres://localhost/novels python -m benchmarks.seed --cleanup
+
+Бенчмарки берут отсюда же соединение со схемой, засев и удаление данных
+(каждый со своим префиксом) и замер задержки.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import List, Tuple
+
+import asyncpg
+
+from api.migrate import apply_migrations
+
+PREFIX = "load-"
+
+
+async def connect():
+    """Соединение с DATABASE_URL, схема доведена до последней миграции"""
+    conn = await asyncpg.connect(os.environ["DATABASE_URL"])
+    try:
+        await apply_migrations(conn)
+    except BaseException:
+        await conn.close()
+        raise
+    return conn
+
+
+async def cleanup(conn, prefix: str = PREFIX):
+    """Удаляет переводчиков, новеллы и библиотеки читателей с префиксом"""
+    await conn.execute("""
+        DELETE FROM novels WHERE translator_id IN (
+            SELECT user_id FROM translators WHERE user_id LIKE $1
+        )
+    """, prefix + "%")
+    await conn.execute("DELETE FROM user_library WHERE user_id LIKE $1", prefix + "%")
+    await conn.execute("DELETE FROM translators WHERE user_id LIKE $1", prefix + "%")
+
+
+async def seed_translators(conn, count: int, prefix: str = PREFIX) -> List[str]:
+    await conn.execute("""
+        INSERT INTO translators (user_id, username, display_name)
+        SELECT $1 || 'translator-' || g, $1 || g, 'Переводчик ' || g
+        FROM generate_series(1, $2) g
+        ON CONFLICT (user_id) DO NOTHING
+    """, prefix, count)
+    return [f"{prefix}translator-{number}" for number in range(1, count + 1)]
+
+
+async def seed(
+    conn,
+    translators: int,
+    novels: int,
+    chapters: int,
+    paragraphs: int,
+    readers: int = 0,
+    subscriptions: int = 0,
+    prefix: str = PREFIX
+):
+    """Каталог: novels новелл по кругу у переводчиков, chapters глав на новеллу"""
+    await seed_translators(conn, translators, prefix)
+
+    # Новеллы обновлялись в разное время, как в живом каталоге
+    await conn.execute("""
+        INSERT INTO novels (title, description, translator_id, created_at, updated_at)
+        SELECT 'Новелла ' || g,
+               repeat('Описание новеллы. ', 10),
+               $1 || 'translator-' || (g % $2 + 1),
+               now() - g * interval '1 hour',
+               now() - g * interval '1 minute'
+        FROM generate_series(1, $3) g
+    """, prefix, translators, novels)
+
+    # Абзацы разделены переводом строки, как в текстах, которые публикуют переводчики
+    await conn.execute("""
+        INSERT INTO chapters (novel_id, chapter_number, title, content, created_at)
+        SELECT n.id, g, 'Глава ' || g,
+               array_to_string(array_fill(repeat('Текст абзаца главы. ', 15), ARRAY[$3]), E'\n'),
+               n.updated_at - ($2 - g) * interval '1 day'
+        FROM (SELECT id, updated_at FROM novels WHERE translator_id LIKE $1) n,
+             generate_series(1, $2) g
+    """, prefix + "%", chapters, paragraphs)
+
+    if readers and subscriptions:
+        await conn.execute("""
+            INSERT INTO user_library (user_id, novel_id, subscribed)
+            SELECT $1 || 'reader-' || r, n.id, TRUE
+            FROM generate_series(1, $2) r
+            CROSS JOIN LATERAL (
+                SELECT id FROM novels
+                WHERE translator_id LIKE $1 || '%'
+                ORDER BY md5(id::text || r::text)
+                LIMIT $3
+            ) n
+        """, prefix, readers, subscriptions)
+
+    await conn.execute("ANALYZE")
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def measure(name: str, call, repeat: int, width: int = 28) -> Tuple[float, float]:
+    """Вызывает call repeat раз, печатает и возвращает медиану и p99 в мс"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await call()
+        samples.append((time.perf_counter() - start) * 1000)
+    median, p99 = statistics.median(samples), percentile(samples, 99)
+    print(f"{name:<{width}} median {median:>8.3f} ms   p99 {p99:>8.3f} ms")
+    return median, p99
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--translators", type=int, default=20)
+    parser.add_argument("--novels", type=int, default=500)
+    parser.add_argument("--chapters", type=int, default=100, help="глав на новеллу")
+    parser.add_argument("--paragraphs", type=int, default=60, help="абзацев в главе")
+    parser.add_argument("--readers", type=int, default=1000)
+    parser.add_argument("--subscriptions", type=int, default=20, help="подписок на читателя")
+    parser.add_argument("--cleanup", action="store_true", help="только удалить тестовые данные")
+    args = parser.parse_args()
+
+    conn = await connect()
+    try:
+        await cleanup(conn)
+        if args.cleanup:
+            return
+        started = time.perf_counter()
+        await seed(
+            conn, args.translators, args.novels, args.chapters,
+            args.paragraphs, args.readers, args.subscriptions
+        )
+        print(
+            f"seeded {args.translators} translators, {args.novels} novels, "
+            f"{args.novels * args.chapters} chapters, {args.readers} readers "
+            f"in {time.perf_counter() - started:.1f} s"
+        )
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,28 +5,67 @@ class NovelsAPI {
     constructor() {
         this.baseUrl = '/api';
         this.defaultPageSize = 20;
+        // Сервер верит только подписанной initData; userId - для интерфейса
+        this.initData = window.Telegram?.WebApp?.initData || null;
+        this.userId = this.initData
+            ? window.Telegram.WebApp.initDataUnsafe?.user?.id?.toString() || null
+            : null;
     }
 
     /**
      * Базовый метод для отправки запросов к API
      */
     async fetch(endpoint, options = {}) {
+        const payload = await this.request(endpoint, options);
+        return payload.data;
+    }
+
+    /**
+     * Запрос постраничного списка: возвращает элементы и курсор следующей страницы
+     */
+    async fetchPage(endpoint, options = {}) {
+        const payload = await this.request(endpoint, options);
+        return {
+            items: payload.data,
+            nextCursor: payload.next_cursor || null
+        };
+    }
+
+    /**
+     * Заголовки пользователя: подписанная initData и время его последней
+     * записи, чтобы любой инстанс сервера после записи читал из основной базы
+     */
+    authHeaders() {
+        const lastWrite = sessionStorage.getItem('lastWrite');
+        return {
+            ...(this.initData ? { 'X-Telegram-Init-Data': this.initData } : {}),
+            ...(lastWrite ? { 'X-Last-Write': lastWrite } : {})
+        };
+    }
+
+    rememberWrite(response) {
+        const lastWrite = response.headers.get('X-Last-Write');
+        if (lastWrite) sessionStorage.setItem('lastWrite', lastWrite);
+    }
+
+    async request(endpoint, options = {}) {
         try {
             const response = await fetch(`${this.baseUrl}${endpoint}`, {
                 ...options,
                 headers: {
                     'Content-Type': 'application/json',
+                    ...this.authHeaders(),
                     ...options.headers
                 }
             });
+            this.rememberWrite(response);
 
             if (!response.ok) {
                 const error = await response.json();
-                throw new Error(error.detail || 'API Error');
+                throw new Error(error.message || error.detail || 'API Error');
             }
 
-            const data = await response.json();
-            return data.data;
+            return await response.json();
         } catch (error) {
             console.error('API Error:', error);
             throw error;
@@ -67,7 +106,10 @@ class NovelsAPI {
         sort = 'updated_at',
         order = 'desc',
         translatorId = null,
-        ids = null
+        ids = null,
+        tags = null,
+        tagsMode = 'all',
+        cursor = null
     } = {}) {
         const params = new URLSearchParams({
             page: page.toString(),
@@ -76,6 +118,10 @@ class NovelsAPI {
             order
         });
 
+        if (cursor) {
+            params.append('cursor', cursor);
+        }
+
         if (translatorId) {
             params.append('translator_id', translatorId);
         }
@@ -84,9 +130,25 @@ class NovelsAPI {
             params.append('ids', ids.join(','));
         }
 
+        // Все теги сразу (tagsMode = 'all') или любой из них ('any')
+        if (tags && tags.length) {
+            params.append('tags', tags.join(','));
+            params.append('tags_mode', tagsMode);
+        }
+
         return this.fetch(`/novels?${params}`);
     }
 
+    /**
+     * Несколько новелл одним запросом: items - [{ novel_id, last_read_chapter_id }]
+     */
+    async getNovelsBatch(items) {
+        return this.fetch('/novels/batch', {
+            method: 'POST',
+            body: JSON.stringify({ items })
+        });
+    }
+
     async getNovel(novelId) {
         return this.fetch(`/novels/${novelId}`);
     }
@@ -116,20 +178,89 @@ class NovelsAPI {
      */
     async getChapters(novelId, { 
         page = 1, 
-        limit = this.defaultPageSize 
+        limit = this.defaultPageSize,
+        sort = 'desc',
+        cursor = null
     } = {}) {
         const params = new URLSearchParams({
             page: page.toString(),
-            limit: limit.toString()
+            limit: limit.toString(),
+            sort
         });
 
-        return this.fetch(`/novels/${novelId}/chapters?${params}`);
+        if (cursor) {
+            params.append('cursor', cursor);
+        }
+
+        return this.fetchPage(`/novels/${novelId}/chapters?${params}`);
+    }
+
+    /**
+     * Оглавление новеллы: все главы без текста
+     */
+    async getToc(novelId) {
+        return this.fetch(`/novels/${novelId}/toc`);
     }
 
     async getChapter(novelId, chapterId) {
         return this.fetch(`/novels/${novelId}/chapters/${chapterId}`);
     }
 
+    /**
+     * Диапазон абзацев главы; при start = 0 вместе с заголовком и соседями
+     */
+    async getChapterContent(novelId, chapterId, { start = 0, count = 50 } = {}) {
+        const params = new URLSearchParams({ start: start.toString(), count: count.toString() });
+        return this.fetch(`/novels/${novelId}/chapters/${chapterId}/content?${params}`);
+    }
+
+    /**
+     * Следующие count глав после главы (after - номер, afterId - id) одним
+     * ответом, у каждой свой etag; nextAfter и nextAfterId - откуда
+     * продолжить, если влезли не все
+     */
+    async getChapterBundle(novelId, after, afterId, count = 5) {
+        const params = new URLSearchParams({
+            after: after.toString(),
+            after_id: afterId.toString(),
+            count: count.toString()
+        });
+        const payload = await this.request(`/novels/${novelId}/bundle?${params}`);
+        return {
+            items: payload.data,
+            nextAfter: payload.next_after ?? null,
+            nextAfterId: payload.next_after_id ?? null
+        };
+    }
+
+    /**
+     * Остаток главы потоком: onChunk вызывается для каждого куска абзацев
+     */
+    async streamChapterContent(novelId, chapterId, start, onChunk) {
+        const response = await fetch(
+            `${this.baseUrl}/novels/${novelId}/chapters/${chapterId}/content/stream?start=${start}`,
+            { headers: this.authHeaders() }
+        );
+        if (!response.ok) {
+            throw new Error('API Error');
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        for (;;) {
+            const { done, value } = await reader.read();
+            buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            for (const line of lines) {
+                if (line.trim()) onChunk(JSON.parse(line));
+            }
+            if (done) break;
+        }
+        if (buffer.trim()) onChunk(JSON.parse(buffer));
+    }
+
     async createChapter(novelId, data) {
         return this.fetch(`/novels/${novelId}/chapters`, {
             method: 'POST',
@@ -137,6 +268,51 @@ class NovelsAPI {
         });
     }
 
+    /**
+     * Библиотека пользователя на сервере
+     */
+    async getLibrary() {
+        return this.fetch('/library');
+    }
+
+    async addToLibrary(kind, novelId) {
+        return this.fetch(`/library/${kind}/${novelId}`, { method: 'PUT' });
+    }
+
+    async removeFromLibrary(kind, novelId) {
+        return this.fetch(`/library/${kind}/${novelId}`, { method: 'DELETE' });
+    }
+
+    async syncLibrary(library) {
+        return this.fetch('/library/sync', {
+            method: 'POST',
+            body: JSON.stringify(library)
+        });
+    }
+
+    /**
+     * Прогресс чтения: items - [{ novel_id, chapter_id, position, updated_at }].
+     * keepalive позволяет дописать прогресс при закрытии страницы
+     */
+    async saveProgress(items, { keepalive = false } = {}) {
+        return this.fetch('/library/progress', {
+            method: 'POST',
+            body: JSON.stringify({ items }),
+            keepalive
+        });
+    }
+
+    /**
+     * Массовая загрузка глав из NDJSON-файла: одна глава JSON-объектом на строку
+     */
+    async importChapters(novelId, file) {
+        return this.fetch(`/novels/${novelId}/chapters/import`, {
+            method: 'POST',
+            body: file,
+            headers: { 'Content-Type': 'application/x-ndjson' }
+        });
+    }
+
     async updateChapter(novelId, chapterId, data) {
         return this.fetch(`/novels/${novelId}/chapters/${chapterId}`, {
             method: 'PUT',
@@ -156,7 +332,8 @@ class NovelsAPI {
     async getLatestChapters({
         page = 1,
         limit = this.defaultPageSize,
-        subscribedOnly = false
+        subscribedOnly = false,
+        cursor = null
     } = {}) {
         const params = new URLSearchParams({
             page: page.toString(),
@@ -164,7 +341,11 @@ class NovelsAPI {
             subscribed_only: subscribedOnly.toString()
         });
 
-        return this.fetch(`/chapters/latest?${params}`);
+        if (cursor) {
+            params.append('cursor', cursor);
+        }
+
+        return this.fetchPage(`/chapters/latest?${params}`);
     }
 
     /**
@@ -201,6 +382,7 @@ class NovelsAPI {
     /**
      * Теги
      */
+    // [{ id, name, novels_count }], самые популярные первыми
     async getTags() {
         return this.fetch('/tags');
     }
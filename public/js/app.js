@@ -22,6 +22,7 @@ class NovelReader {
             latestChapters: [],
             searchQuery: '',
             currentPage: 1,
+            nextCursor: null,
             hasMoreContent: true
         };
 
@@ -70,6 +71,9 @@ class NovelReader {
             const role = await storage.getUserRole();
             this.state.isTranslator = role === 'translator';
 
+            // Сверяем библиотеку с сервером; без сети работаем с локальной копией
+            await storage.sync().catch(error => console.error('Error syncing library:', error));
+
             // Загружаем пользовательские данные
             const [subscriptions, bookmarks] = await Promise.all([
                 storage.getSubscriptions(),
@@ -216,6 +220,7 @@ class NovelReader {
     async loadContent(reset = false) {
         if (reset) {
             this.state.currentPage = 1;
+            this.state.nextCursor = null;
             this.state.hasMoreContent = true;
         }
 
@@ -231,6 +236,7 @@ class NovelReader {
             this.toggleLoading(true);
 
             let content = [];
+            let hasMore = null;
             switch (this.state.activeTab) {
                 case 'subscriptions':
                     content = await this.loadSubscriptions();
@@ -238,13 +244,18 @@ class NovelReader {
                 case 'bookmarks':
                     content = await this.loadBookmarks();
                     break;
-                case 'latest':
-                    content = await this.loadLatestChapters();
+                case 'latest': {
+                    const page = await this.loadLatestChapters();
+                    content = page.items;
+                    this.state.nextCursor = page.nextCursor;
+                    hasMore = Boolean(page.nextCursor);
                     break;
+                }
             }
 
             // Проверяем, есть ли еще контент
-            this.state.hasMoreContent = content.length === 20;
+            this.state.hasMoreContent = hasMore ?? content.length === 20;
+            this.state.currentPage += 1;
 
             if (content.length || !reset) {
                 this.renderContent(container, content, reset);
@@ -263,25 +274,33 @@ class NovelReader {
     }
 
     async loadSubscriptions() {
-        if (!this.state.subscriptions.length) return [];
-        return api.getNovels({
-            ids: this.state.subscriptions,
-            page: this.state.currentPage
-        });
+        return this.loadNovelsBatch(this.state.subscriptions);
     }
 
     async loadBookmarks() {
-        if (!this.state.bookmarks.length) return [];
-        return api.getNovels({
-            ids: this.state.bookmarks,
-            page: this.state.currentPage
-        });
+        return this.loadNovelsBatch(this.state.bookmarks);
+    }
+
+    /**
+     * Страница новелл из списка id одним запросом, вместе с последней главой
+     * и числом непрочитанных глав
+     */
+    async loadNovelsBatch(ids) {
+        const pageSize = 20;
+        const start = (this.state.currentPage - 1) * pageSize;
+        const pageIds = ids.slice(start, start + pageSize);
+        if (!pageIds.length) return [];
+
+        const progress = await storage.getAllReadingProgress();
+        return api.getNovelsBatch(pageIds.map(id => ({
+            novel_id: Number(id),
+            last_read_chapter_id: progress[id]?.lastChapter ? Number(progress[id].lastChapter) : null
+        })));
     }
 
     async loadLatestChapters() {
         return api.getLatestChapters({
-            page: this.state.currentPage,
-            query: this.state.searchQuery
+            cursor: this.state.nextCursor
         });
     }
 
@@ -317,6 +336,11 @@ class NovelReader {
         element.querySelector('.translator').textContent = novel.translator_name;
         element.querySelector('.update-time').textContent = this.formatDate(novel.updated_at);
 
+        const unread = element.querySelector('.unread-count');
+        if (unread) {
+            unread.textContent = novel.unread_count || '';
+        }
+
         element.querySelector('.novel-card').addEventListener('click', () => {
             this.telegram.HapticFeedback.impactOccurred('light');
             window.location.href = `/novel.html?id=${novel.id}`;
@@ -326,7 +350,7 @@ class NovelReader {
     fillChapterCard(element, chapter) {
         element.querySelector('.chapter-title').textContent = chapter.title;
         element.querySelector('.novel-title').textContent = chapter.novel_title;
-        element.querySelector('.publish-time').textContent = this.formatDate(chapter.published_at);
+        element.querySelector('.publish-time').textContent = this.formatDate(chapter.created_at);
 
         element.querySelector('.chapter-card').addEventListener('click', () => {
             this.telegram.HapticFeedback.impactOccurred('light');
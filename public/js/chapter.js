@@ -1,5 +1,6 @@
 import api from './api.js';
 import storage from './storage.js';
+import offline from './offline.js';
 
 /**
  * Класс для страницы чтения главы
@@ -29,6 +30,10 @@ class ChapterPage {
             progress: 0,
             lastSaveTime: 0,
             saveInterval: 5000, // Сохраняем прогресс каждые 5 секунд
+            pendingScroll: null, // Позиция, до которой еще не догрузился текст
+            contentLoaded: null,
+            prefetchCount: 5, // Сколько следующих глав скачивать заранее
+            offlineMaxAge: 24 * 60 * 60 * 1000, // Сохраненную главу старше суток берем из сети
             isLoading: false
         };
 
@@ -94,31 +99,35 @@ class ChapterPage {
     }
 
     async loadChapterContent() {
+        // Глава уже скачана заранее: показываем ее без обращения к серверу
+        if (await this.loadOfflineChapter()) {
+            api.incrementChapterViews(this.state.novelId, this.state.chapterId).catch(() => {});
+            this.prefetchNext();
+            return;
+        }
+
         try {
-            // Загружаем информацию о новелле и главе
+            // Загружаем новеллу и первый экран главы, остальное догружается потоком
             [this.state.novel, this.state.chapter] = await Promise.all([
                 api.getNovel(this.state.novelId),
-                api.getChapter(this.state.novelId, this.state.chapterId)
+                api.getChapterContent(this.state.novelId, this.state.chapterId)
             ]);
 
             if (!this.state.novel || !this.state.chapter) {
                 throw new Error('Не удалось загрузить данные');
             }
 
-            // Получаем ID соседних глав
-            const chapters = await api.getChapters(this.state.novelId);
-            const currentIndex = chapters.findIndex(ch => ch.id === parseInt(this.state.chapterId));
-            
-            if (currentIndex > 0) {
-                this.state.prevChapterId = chapters[currentIndex - 1].id;
-            }
-            if (currentIndex < chapters.length - 1) {
-                this.state.nextChapterId = chapters[currentIndex + 1].id;
-            }
+            // ID соседних глав приходят вместе с главой
+            this.state.prevChapterId = this.state.chapter.prev_chapter_id;
+            this.state.nextChapterId = this.state.chapter.next_chapter_id;
 
             // Обновляем UI
             this.updateChapterUI();
-            
+            this.state.contentLoaded = this.loadRemainingContent(this.state.chapter.next_start);
+
+            // Следующие главы качаем, когда текущая догрузилась целиком
+            this.state.contentLoaded.then(() => this.prefetchNext());
+
             // Обновляем просмотры
             await api.incrementChapterViews(this.state.novelId, this.state.chapterId);
         } catch (error) {
@@ -127,6 +136,40 @@ class ChapterPage {
         }
     }
 
+    async loadOfflineChapter() {
+        const saved = await offline.getChapter(this.state.chapterId);
+        if (!saved || String(saved.novel_id) !== String(this.state.novelId)) return false;
+        if (navigator.onLine && Date.now() - saved.savedAt > this.state.offlineMaxAge) return false;
+
+        this.state.novel = { id: saved.novel_id, title: saved.novelTitle };
+        this.state.chapter = { ...saved, paragraphs: saved.content.split('\n'), next_start: null };
+        this.state.prevChapterId = saved.prev_chapter_id;
+        this.state.nextChapterId = saved.next_chapter_id;
+        this.updateChapterUI();
+        return true;
+    }
+
+    /**
+     * Скачивает следующие главы одним запросом, пока читается текущая,
+     * чтобы переход к следующей главе не ждал сети
+     */
+    async prefetchNext() {
+        const nextId = this.state.nextChapterId;
+        if (!nextId || !navigator.onLine) return;
+        try {
+            if (await offline.getChapter(nextId)) return;
+            const { items } = await api.getChapterBundle(
+                this.state.novelId,
+                this.state.chapter.chapter_number,
+                this.state.chapterId,
+                this.state.prefetchCount
+            );
+            await offline.saveChapters(items, this.state.novel.title);
+        } catch (error) {
+            console.error('Error prefetching chapters:', error);
+        }
+    }
+
     updateChapterUI() {
         // Обновляем заголовки
         document.querySelector('.novel-name').textContent = this.state.novel.title;
@@ -134,7 +177,7 @@ class ChapterPage {
         document.title = `${this.state.chapter.title} - ${this.state.novel.title}`;
 
         // Обновляем контент
-        document.querySelector('.chapter-content').innerHTML = this.state.chapter.content;
+        document.querySelector('.chapter-content').innerHTML = this.state.chapter.paragraphs.join('\n');
 
         // Обновляем навигацию
         const prevBtn = document.querySelector('.prev-chapter');
@@ -290,8 +333,9 @@ class ChapterPage {
             }
 
             // Сохраняем прогресс с дебаунсом
+            // Пока не восстановили позицию, не затираем ее сохраненное значение
             const now = Date.now();
-            if (now - this.state.lastSaveTime > this.state.saveInterval) {
+            if (!this.state.pendingScroll && now - this.state.lastSaveTime > this.state.saveInterval) {
                 this.state.lastSaveTime = now;
                 this.saveProgress();
             }
@@ -346,11 +390,48 @@ class ChapterPage {
         }
     }
 
+    async loadRemainingContent(start) {
+        if (start == null) return;
+        const content = document.querySelector('.chapter-content');
+        try {
+            await api.streamChapterContent(this.state.novelId, this.state.chapterId, start, chunk => {
+                content.insertAdjacentHTML('beforeend', '\n' + chunk.paragraphs.join('\n'));
+                this.applyPendingScroll();
+            });
+        } catch (error) {
+            console.error('Error loading chapter content:', error);
+            this.showError('Не удалось загрузить главу целиком');
+        }
+    }
+
+    // Прокручивает к сохраненной позиции, как только текст до нее загружен
+    applyPendingScroll() {
+        const position = this.state.pendingScroll;
+        if (!position) return;
+        if (document.documentElement.scrollHeight - window.innerHeight >= position) {
+            window.scrollTo(0, position);
+            this.state.pendingScroll = null;
+        }
+    }
+
+    // Текст загружен целиком или с ошибкой: дальше ждать нечего. Прокручиваем
+    // насколько хватает документа (шрифт мог стать крупнее, глава - короче)
+    settlePendingScroll() {
+        const position = this.state.pendingScroll;
+        if (!position) return;
+        this.state.pendingScroll = null;
+        const maxScroll = Math.max(0, document.documentElement.scrollHeight - window.innerHeight);
+        window.scrollTo(0, Math.min(position, maxScroll));
+    }
+
     async restoreScrollPosition() {
         try {
             const progress = await storage.getReadingProgress(this.state.novelId);
             if (progress && progress.lastChapter === this.state.chapterId && progress.position) {
-                window.scrollTo(0, progress.position);
+                this.state.pendingScroll = progress.position;
+                this.applyPendingScroll();
+                // Иначе недостижимая позиция навсегда отключила бы сохранение прогресса
+                Promise.resolve(this.state.contentLoaded).finally(() => this.settlePendingScroll());
             }
         } catch (error) {
             console.error('Error restoring scroll position:', error);
@@ -22,6 +22,7 @@ class NovelPage {
             isOwner: false,
             chaptersSort: 'desc',
             currentPage: 1,
+            nextCursor: null,
             hasMoreChapters: true,
             isLoading: false
         };
@@ -193,6 +194,7 @@ class NovelPage {
     async loadChapters(reset = false) {
         if (reset) {
             this.state.currentPage = 1;
+            this.state.nextCursor = null;
             this.state.hasMoreChapters = true;
         }
 
@@ -202,12 +204,13 @@ class NovelPage {
             this.state.isLoading = true;
             this.toggleLoading(true);
 
-            const chapters = await api.getChapters(this.state.novelId, {
-                page: this.state.currentPage,
+            const { items: chapters, nextCursor } = await api.getChapters(this.state.novelId, {
+                cursor: this.state.nextCursor,
                 sort: this.state.chaptersSort
             });
 
-            this.state.hasMoreChapters = chapters.length === 20;
+            this.state.nextCursor = nextCursor;
+            this.state.hasMoreChapters = Boolean(nextCursor);
 
             if (reset) {
                 this.state.chapters = chapters;
@@ -216,6 +219,7 @@ class NovelPage {
             }
 
             this.renderChapters();
+            this.state.currentPage += 1;
 
         } catch (error) {
             console.error('Error loading chapters:', error);
@@ -331,7 +335,7 @@ class NovelPage {
             element.querySelector('.chapter-number').textContent = 
                 `Глава ${chapter.chapter_number}`;
             element.querySelector('.chapter-date').textContent = 
-                this.formatDate(chapter.published_at);
+                this.formatDate(chapter.created_at);
 
             const card = element.querySelector('.chapter-card');
             card.dataset.chapterId = chapter.id;
@@ -0,0 +1,93 @@
+/**
+ * Главы, сохраненные для чтения без сети (IndexedDB)
+ *
+ * Читалка заранее скачивает следующие главы одним запросом и кладет их
+ * сюда, поэтому переход к следующей главе открывается без обращения к
+ * серверу. Хранится не больше maxChapters глав, давние вытесняются.
+ */
+class OfflineChapters {
+    constructor() {
+        this.dbName = 'novels-reader';
+        this.storeName = 'chapters';
+        this.maxChapters = 50;
+        this.db = null;
+    }
+
+    open() {
+        if (!this.db) {
+            this.db = new Promise((resolve, reject) => {
+                if (!window.indexedDB) {
+                    reject(new Error('IndexedDB is not available'));
+                    return;
+                }
+                const request = indexedDB.open(this.dbName, 1);
+                request.onupgradeneeded = () => {
+                    const store = request.result.createObjectStore(this.storeName, { keyPath: 'id' });
+                    store.createIndex('savedAt', 'savedAt');
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+        }
+        return this.db;
+    }
+
+    /**
+     * Выполняет fn над хранилищем в одной транзакции, результат - значение
+     * последнего запроса, который вернула fn
+     */
+    async transaction(mode, fn) {
+        const db = await this.open();
+        return new Promise((resolve, reject) => {
+            const tx = db.transaction(this.storeName, mode);
+            const request = fn(tx.objectStore(this.storeName));
+            tx.oncomplete = () => resolve(request ? request.result : undefined);
+            tx.onerror = () => reject(tx.error);
+        });
+    }
+
+    async getChapter(chapterId) {
+        try {
+            return await this.transaction('readonly', store => store.get(Number(chapterId))) || null;
+        } catch (error) {
+            console.error('Offline read error:', error);
+            return null;
+        }
+    }
+
+    /**
+     * Сохраняет главы из ответа /bundle вместе с названием новеллы
+     */
+    async saveChapters(chapters, novelTitle) {
+        if (!chapters.length) return;
+        try {
+            const savedAt = Date.now();
+            await this.transaction('readwrite', store => {
+                chapters.forEach(chapter => store.put({ ...chapter, novelTitle, savedAt }));
+            });
+            await this.prune();
+        } catch (error) {
+            console.error('Offline save error:', error);
+        }
+    }
+
+    async prune() {
+        const count = await this.transaction('readonly', store => store.count());
+        let excess = count - this.maxChapters;
+        if (excess <= 0) return;
+
+        await this.transaction('readwrite', store => {
+            store.index('savedAt').openCursor().onsuccess = event => {
+                const cursor = event.target.result;
+                if (cursor && excess-- > 0) {
+                    cursor.delete();
+                    cursor.continue();
+                }
+            };
+        });
+    }
+}
+
+const offline = new OfflineChapters();
+
+export default offline;
@@ -1,3 +1,5 @@
+import api from './api.js';
+
 /**
  * Класс для работы с Telegram CloudStorage
  */
@@ -16,13 +18,22 @@ class TelegramStorage {
             SUBSCRIPTIONS: 'subscriptions',
             BOOKMARKS: 'bookmarks',
             READING_PROGRESS: 'reading_progress',
-            LAST_READ: 'last_read'
+            LAST_READ: 'last_read',
+            LIBRARY_QUEUE: 'library_queue'
         };
 
         // Кеш для оптимизации
         this.cache = new Map();
         this.cacheTimeout = 5 * 60 * 1000; // 5 минут
         this.maxCacheItems = 100; // Максимальное количество элементов в кеше
+
+        // Прогресс чтения отправляется на сервер пачкой, последняя позиция на новеллу
+        this.pendingProgress = new Map();
+        this.progressTimer = null;
+        this.progressFlushDelay = 10 * 1000; // 10 секунд
+
+        // При закрытии страницы дописываем то, что не успели отправить
+        window.addEventListener('pagehide', () => this.flushProgress({ keepalive: true }));
     }
 
     /**
@@ -126,13 +137,16 @@ class TelegramStorage {
             subs.push(novelId);
             await this.setItem(this.keys.SUBSCRIPTIONS, subs);
         }
+        await this._pushLibraryChange('subscriptions', novelId, true);
         return true;
     }
 
     async removeSubscription(novelId) {
         const subs = await this.getSubscriptions();
         const newSubs = subs.filter(id => id !== novelId);
-        return this.setItem(this.keys.SUBSCRIPTIONS, newSubs);
+        await this.setItem(this.keys.SUBSCRIPTIONS, newSubs);
+        await this._pushLibraryChange('subscriptions', novelId, false);
+        return true;
     }
 
     /**
@@ -149,13 +163,16 @@ class TelegramStorage {
             bookmarks.push(novelId);
             await this.setItem(this.keys.BOOKMARKS, bookmarks);
         }
+        await this._pushLibraryChange('bookmarks', novelId, true);
         return true;
     }
 
     async removeBookmark(novelId) {
         const bookmarks = await this.getBookmarks();
         const newBookmarks = bookmarks.filter(id => id !== novelId);
-        return this.setItem(this.keys.BOOKMARKS, newBookmarks);
+        await this.setItem(this.keys.BOOKMARKS, newBookmarks);
+        await this._pushLibraryChange('bookmarks', novelId, false);
+        return true;
     }
 
     /**
@@ -166,16 +183,43 @@ class TelegramStorage {
         return progress?.[novelId] || null;
     }
 
+    async getAllReadingProgress() {
+        return await this.getItem(this.keys.READING_PROGRESS) || {};
+    }
+
     async saveReadingProgress(novelId, chapterId, position) {
         const progress = await this.getItem(this.keys.READING_PROGRESS) || {};
+        const updatedAt = new Date().toISOString();
         progress[novelId] = {
             lastChapter: chapterId,
             position: position,
-            updatedAt: new Date().toISOString()
+            updatedAt
         };
+
+        // Частые сохранения при прокрутке схлопываются в одну отправку
+        this.pendingProgress.set(Number(novelId), {
+            novel_id: Number(novelId),
+            chapter_id: Number(chapterId),
+            position: Math.round(position),
+            updated_at: updatedAt
+        });
+        if (!this.progressTimer) {
+            this.progressTimer = setTimeout(() => this.flushProgress(), this.progressFlushDelay);
+        }
+
         return this.setItem(this.keys.READING_PROGRESS, progress);
     }
 
+    async flushProgress({ keepalive = false } = {}) {
+        clearTimeout(this.progressTimer);
+        this.progressTimer = null;
+        if (!this.pendingProgress.size) return;
+
+        const items = [...this.pendingProgress.values()];
+        this.pendingProgress.clear();
+        await this._pushLibrary(() => api.saveProgress(items, { keepalive }));
+    }
+
     /**
      * Методы для работы с историей чтения
      */
@@ -198,6 +242,43 @@ class TelegramStorage {
         return this.setItem(this.keys.LAST_READ, newLastRead);
     }
 
+    /**
+     * Изменения библиотеки дублируются на сервер; локальная копия остается
+     * рабочей, если сервер недоступен, и досылается при следующем sync()
+     */
+    async _pushLibrary(call) {
+        if (!api.userId) return true;
+        try {
+            await call();
+            return true;
+        } catch (error) {
+            console.error('Error saving library on server:', error);
+            return false;
+        }
+    }
+
+    /**
+     * Добавление или удаление из списка. Неотправленное изменение ложится в
+     * очередь { 'kind:novelId': added }: добавление sync() досылает из
+     * локального списка, а удаление иначе потерялось бы при объединении
+     */
+    async _pushLibraryChange(kind, novelId, added) {
+        const sent = await this._pushLibrary(() => added
+            ? api.addToLibrary(kind, novelId)
+            : api.removeFromLibrary(kind, novelId));
+        if (!api.userId) return;
+
+        const queue = await this.getItem(this.keys.LIBRARY_QUEUE) || {};
+        const key = `${kind}:${novelId}`;
+        if (sent) {
+            if (!(key in queue)) return;
+            delete queue[key];
+        } else {
+            queue[key] = added;
+        }
+        await this.setItem(this.keys.LIBRARY_QUEUE, queue);
+    }
+
     /**
      * Управление кешем
      */
@@ -239,13 +320,57 @@ class TelegramStorage {
             this.cache.clear();
             
             // Перезагружаем все данные
-            await Promise.all([
+            const [, subscriptions, bookmarks] = await Promise.all([
                 this.getReadingSettings(),
                 this.getSubscriptions(),
                 this.getBookmarks(),
                 this.getLastRead()
             ]);
 
+            if (!api.userId) return true;
+
+            // Сливаем локальную библиотеку с серверной и сохраняем результат
+            const progress = await this.getAllReadingProgress();
+            const queue = await this.getItem(this.keys.LIBRARY_QUEUE) || {};
+            const removed = kind => Object.entries(queue)
+                .filter(([key, added]) => !added && key.startsWith(`${kind}:`))
+                .map(([key]) => Number(key.slice(kind.length + 1)));
+            const library = await api.syncLibrary({
+                subscriptions: subscriptions.map(Number),
+                bookmarks: bookmarks.map(Number),
+                removed_subscriptions: removed('subscriptions'),
+                removed_bookmarks: removed('bookmarks'),
+                progress: Object.entries(progress).map(([novelId, item]) => ({
+                    novel_id: Number(novelId),
+                    chapter_id: Number(item.lastChapter),
+                    position: item.position != null ? Math.round(item.position) : null,
+                    updated_at: item.updatedAt
+                }))
+            });
+
+            const merged = {};
+            for (const [novelId, item] of Object.entries(library.progress)) {
+                merged[novelId] = {
+                    lastChapter: String(item.chapter_id),
+                    position: item.position,
+                    updatedAt: item.updated_at
+                };
+            }
+            // id на страницах берутся из URL строками, храним так же
+            await Promise.all([
+                this.setItem(this.keys.SUBSCRIPTIONS, library.subscriptions.map(String)),
+                this.setItem(this.keys.BOOKMARKS, library.bookmarks.map(String)),
+                this.setItem(this.keys.READING_PROGRESS, { ...progress, ...merged })
+            ]);
+
+            // Из очереди убираем только отправленное: за время sync() могли
+            // добавиться новые неотправленные изменения
+            const rest = await this.getItem(this.keys.LIBRARY_QUEUE) || {};
+            for (const [key, added] of Object.entries(queue)) {
+                if (rest[key] === added) delete rest[key];
+            }
+            await this.setItem(this.keys.LIBRARY_QUEUE, rest);
+
             return true;
         } catch (error) {
             console.error('Error syncing data:', error);
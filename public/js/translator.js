@@ -91,10 +91,10 @@ class TranslatorPage {
 
             this.state.novels = novels;
             this.state.stats = {
-                novelsCount: novels.length,
-                chaptersCount: novels.reduce((sum, novel) => sum + (novel.chapters_count || 0), 0),
-                subscribersCount: novels.reduce((sum, novel) => sum + (novel.subscribers_count || 0), 0),
-                views: novels.reduce((sum, novel) => sum + (novel.views || 0), 0)
+                novelsCount: stats.novels_count,
+                chaptersCount: stats.chapters_count,
+                subscribersCount: stats.subscribers_count,
+                views: stats.total_views
             };
 
             // Обновляем UI
@@ -0,0 +1,29 @@
+"""Замена api.database.db для тестов буферов: запросы пишутся в список"""
+import asyncio
+from contextlib import asynccontextmanager
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+
+    async def execute(self, query, *args):
+        self.database.calls.append((query, args))
+        if self.database.delay:
+            await asyncio.sleep(self.database.delay)
+        if self.database.error:
+            raise self.database.error
+        self.database.completed.append((query, args))
+        return "UPDATE %d" % len(args[0]) if args else "OK"
+
+
+class FakeDatabase:
+    def __init__(self, error=None, delay=0):
+        self.calls = []
+        self.completed = []
+        self.error = error
+        self.delay = delay
+
+    @asynccontextmanager
+    async def acquire(self, **kwargs):
+        yield FakeConnection(self)
@@ -0,0 +1,131 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from api import admission as admission_module
+from api import auth
+from api.admission import (
+    PRIORITY_CHAPTER, PRIORITY_DASHBOARD, PRIORITY_DEFAULT,
+    ConcurrencyLimiter, MemoryBuckets, classify, client_key
+)
+from api.auth import sign_init_data
+
+TOKEN = "123456:test-token"
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def scope(*headers, client=("10.0.0.1", 5000)):
+    return {"headers": [(key.encode(), value.encode()) for key, value in headers], "client": client}
+
+
+def test_classify():
+    assert classify("GET", "/api/health", b"") is None
+    assert classify("OPTIONS", "/api/novels", b"") is None
+    assert classify("GET", "/index.html", b"") is None
+    assert classify("GET", "/api/warmup", b"") == ("read", PRIORITY_DEFAULT)
+    assert classify("GET", "/api/novels/1/chapters/2", b"") == ("read", PRIORITY_CHAPTER)
+    assert classify("GET", "/api/novels/1/bundle", b"after=3") == ("read", PRIORITY_CHAPTER)
+    assert classify("GET", "/api/novels", b"translator_id=7") == ("read", PRIORITY_DASHBOARD)
+    assert classify("GET", "/api/novels/search", b"q=x") == ("search", PRIORITY_DEFAULT)
+    assert classify("POST", "/api/novels/batch", b"") == ("read", PRIORITY_DEFAULT)
+    assert classify("POST", "/api/novels/1/views", b"") == ("write", None)
+    assert classify("POST", "/api/novels", b"") == ("write", PRIORITY_DEFAULT)
+
+
+def test_client_key_uses_verified_user(monkeypatch):
+    monkeypatch.setattr(auth, "BOT_TOKEN", TOKEN)
+    monkeypatch.setattr(auth, "INIT_DATA_MAX_AGE", 0)
+    init_data = sign_init_data({"auth_date": "1", "user": json.dumps({"id": 42})}, TOKEN)
+    assert client_key(scope(("x-telegram-init-data", init_data))) == "user:42"
+    # Голый id и неверная подпись - это анонимный клиент
+    assert client_key(scope(("x-telegram-user-id", "42"))) == "ip:10.0.0.1"
+    assert client_key(scope(("x-telegram-init-data", "hash=00"))) == "ip:10.0.0.1"
+
+
+def test_client_key_trusts_forwarded_only_behind_proxy(monkeypatch):
+    forwarded = ("x-forwarded-for", "6.6.6.6, 1.2.3.4")
+    assert client_key(scope(forwarded), trusted_hops=0) == "ip:10.0.0.1"
+    assert client_key(scope(forwarded), trusted_hops=1) == "ip:1.2.3.4"
+    assert client_key(scope(forwarded), trusted_hops=2) == "ip:6.6.6.6"
+    assert client_key(scope(("x-real-ip", "1.2.3.4")), trusted_hops=1) == "ip:1.2.3.4"
+    monkeypatch.setattr(admission_module, "TRUSTED_PROXY_HOPS", 1)
+    assert client_key(scope(forwarded)) == "ip:1.2.3.4"
+
+
+def test_limiter_admits_by_priority():
+    async def scenario():
+        limiter = ConcurrencyLimiter("read", limit=1, queue_size=4, timeout=1)
+        assert await limiter.acquire()
+        order = []
+
+        async def wait(priority, name):
+            if await limiter.acquire(priority):
+                order.append(name)
+                limiter.release()
+
+        tasks = [
+            asyncio.ensure_future(wait(PRIORITY_DASHBOARD, "dashboard")),
+            asyncio.ensure_future(wait(PRIORITY_DEFAULT, "list")),
+            asyncio.ensure_future(wait(PRIORITY_CHAPTER, "chapter")),
+        ]
+        await asyncio.sleep(0)
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return order, limiter.active
+
+    assert run(scenario()) == (["chapter", "list", "dashboard"], 0)
+
+
+def test_limiter_rejects_when_queue_is_full():
+    async def scenario():
+        limiter = ConcurrencyLimiter("write", limit=1, queue_size=1, timeout=1)
+        assert await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        rejected = await limiter.acquire()
+        limiter.release()
+        admitted = await waiter
+        limiter.release()
+        return rejected, admitted, limiter.stats()
+
+    rejected, admitted, stats = run(scenario())
+    assert not rejected and admitted
+    assert stats["rejected"] == 1 and stats["active"] == 0
+
+
+def test_limiter_times_out():
+    async def scenario():
+        limiter = ConcurrencyLimiter("search", limit=1, queue_size=2, timeout=0.01)
+        assert await limiter.acquire()
+        admitted = await limiter.acquire()
+        limiter.release()
+        return admitted, limiter.stats()
+
+    admitted, stats = run(scenario())
+    assert not admitted
+    assert stats["timeouts"] == 1 and stats["waiting"] == 0 and stats["active"] == 0
+
+
+def test_memory_buckets(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(admission_module, "time", SimpleNamespace(monotonic=lambda: now[0]))
+
+    async def scenario():
+        buckets = MemoryBuckets(rate=2, burst=2, max_keys=2)
+        waits = [await buckets.take("a"), await buckets.take("a"), await buckets.take("a")]
+        # Другой ключ - своя корзина
+        other = await buckets.take("b")
+        now[0] += 0.5
+        refilled = await buckets.take("a")
+        await buckets.take("c")
+        return waits, other, refilled, list(buckets._buckets)
+
+    waits, other, refilled, keys = run(scenario())
+    assert waits[:2] == [0.0, 0.0] and waits[2] == 0.5
+    assert other == 0.0
+    assert refilled == 0.0
+    # Давно не виденный ключ вытесняется
+    assert keys == ["a", "c"]
@@ -0,0 +1,76 @@
+import json
+import time
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from api import auth
+from api.auth import InvalidInitData, scope_user_id, sign_init_data, verify_init_data
+
+TOKEN = "123456:test-token"
+NOW = 1_700_000_000
+
+
+def init_data(user_id=42, auth_date=NOW, token=TOKEN):
+    return sign_init_data({"auth_date": str(auth_date), "user": json.dumps({"id": user_id})}, token)
+
+
+def test_verify_returns_user_id():
+    assert verify_init_data(init_data(), TOKEN, now=NOW) == "42"
+
+
+def test_verify_rejects_tampering():
+    data = init_data().replace("42", "43")
+    with pytest.raises(InvalidInitData):
+        verify_init_data(data, TOKEN, now=NOW)
+    with pytest.raises(InvalidInitData):
+        verify_init_data(init_data(token="other"), TOKEN, now=NOW)
+    with pytest.raises(InvalidInitData):
+        verify_init_data("user=%7B%22id%22%3A42%7D&auth_date=1", TOKEN, now=NOW)
+
+
+def test_verify_rejects_expired():
+    with pytest.raises(InvalidInitData):
+        verify_init_data(init_data(auth_date=NOW - 100), TOKEN, max_age=60, now=NOW)
+
+
+def test_verify_needs_bot_token(monkeypatch):
+    monkeypatch.setattr(auth, "BOT_TOKEN", None)
+    with pytest.raises(InvalidInitData):
+        verify_init_data(init_data(), now=NOW)
+
+
+def test_scope_user_id_is_cached(monkeypatch):
+    monkeypatch.setattr(auth, "BOT_TOKEN", TOKEN)
+    monkeypatch.setattr(auth, "INIT_DATA_MAX_AGE", 0)
+    scope = {"headers": [(b"x-telegram-init-data", init_data().encode())]}
+    assert scope_user_id(scope) == "42"
+    scope["headers"] = []
+    assert scope_user_id(scope) == "42"
+    assert scope_user_id({"headers": []}) is None
+    with pytest.raises(InvalidInitData):
+        scope_user_id({"headers": [(b"x-telegram-init-data", b"hash=00")]})
+
+
+def test_require_user_id(monkeypatch):
+    from api.main import get_user_id, require_user_id
+
+    monkeypatch.setattr(auth, "BOT_TOKEN", TOKEN)
+    app = FastAPI()
+
+    @app.get("/me")
+    def me(user_id: str = Depends(require_user_id)):
+        return {"user_id": user_id}
+
+    @app.get("/anyone")
+    def anyone(user_id=Depends(get_user_id)):
+        return {"user_id": user_id}
+
+    client = TestClient(app)
+    valid = {"X-Telegram-Init-Data": init_data(user_id=7, auth_date=int(time.time()))}
+    assert client.get("/me", headers=valid).json() == {"user_id": "7"}
+    assert client.get("/me").status_code == 401
+    assert client.get("/me", headers={"X-Telegram-User-Id": "7"}).status_code == 401
+    assert client.get("/me", headers={"X-Telegram-Init-Data": "hash=00"}).status_code == 401
+    assert client.get("/anyone", headers={"X-Telegram-Init-Data": "hash=00"}).json() == {"user_id": None}
@@ -0,0 +1,91 @@
+import asyncio
+
+from api.buffers import BufferedFlusher
+from tests.fakes import FakeDatabase
+
+
+class Counter(BufferedFlusher):
+    name = "test counters"
+
+    def add(self, key):
+        self._pending[key] = self._pending.get(key, 0) + 1
+        self._added()
+
+    async def _write(self, database, pending):
+        async with database.acquire() as conn:
+            await conn.execute("UPDATE", sorted(pending.items()))
+
+    def _requeue(self, pending):
+        for key, delta in pending.items():
+            self._pending[key] = self._pending.get(key, 0) + delta
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def drain(buffer):
+    async def scenario():
+        pending = dict(buffer._pending)
+        buffer._pending.clear()
+        await buffer.stop()
+        return pending
+    return scenario()
+
+
+def test_failed_flush_requeues():
+    async def scenario():
+        buffer = Counter(flush_interval=60, max_pending=100)
+        buffer.add(1)
+        await buffer.flush(FakeDatabase(error=RuntimeError("down")))
+        buffer.add(1)
+        return await drain(buffer)
+
+    assert run(scenario()) == {1: 2}
+
+
+def test_cancelled_flush_requeues():
+    async def scenario():
+        buffer = Counter(flush_interval=60, max_pending=100)
+        buffer.add(7)
+        flush = asyncio.ensure_future(buffer.flush(FakeDatabase(delay=1)))
+        await asyncio.sleep(0)
+        flush.cancel()
+        try:
+            await flush
+        except asyncio.CancelledError:
+            pass
+        return await drain(buffer)
+
+    assert run(scenario()) == {7: 1}
+
+
+def test_overflow_flushes_in_background(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr("api.database.db", database)
+
+    async def scenario():
+        buffer = Counter(flush_interval=60, max_pending=2)
+        buffer.add(1)
+        buffer.add(2)
+        await asyncio.sleep(0)
+        await buffer.stop()
+
+    run(scenario())
+    assert database.completed == [("UPDATE", ([(1, 1), (2, 1)],))]
+
+
+def test_stop_waits_for_running_flush(monkeypatch):
+    database = FakeDatabase(delay=0.05)
+    monkeypatch.setattr("api.database.db", database)
+
+    async def scenario():
+        buffer = Counter(flush_interval=0.01, max_pending=100)
+        buffer.add(3)
+        # Фоновый сброс уже идет, когда приходит stop
+        await asyncio.sleep(0.03)
+        await buffer.stop()
+        return buffer._pending
+
+    assert run(scenario()) == {}
+    assert len(database.completed) == 1
@@ -0,0 +1,83 @@
+import asyncio
+
+from api.cache import MemoryBackend, ResponseCache
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_misses_run_one_loader():
+    async def scenario():
+        cache = ResponseCache(MemoryBackend(1024))
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return b"value"
+
+        values = await asyncio.gather(*(cache.get_or_set("key", 60, loader) for _ in range(5)))
+        cached = await cache.get_or_set("key", 60, loader)
+        return values, cached, len(calls), cache.stats()
+
+    values, cached, calls, stats = run(scenario())
+    assert values == [b"value"] * 5 and cached == b"value"
+    assert calls == 1
+    assert stats["misses"] == 1 and stats["coalesced"] == 4 and stats["hits"] == 1
+
+
+def test_invalidation_during_load_is_not_cached():
+    async def scenario():
+        backend = MemoryBackend(1024)
+        # Два инстанса с общим бэкендом: сброс на втором виден первому
+        first, second = ResponseCache(backend), ResponseCache(backend)
+        started = asyncio.Event()
+
+        async def stale():
+            started.set()
+            await asyncio.sleep(0.01)
+            return b"stale"
+
+        load = asyncio.ensure_future(first.get_or_set("novel:1", 60, stale))
+        await started.wait()
+        await second.invalidate("novel:1")
+        # Ждущий запрос получает результат, но в кеш он не попадает
+        value = await load
+        return value, await backend.get("novel:1")
+
+    assert run(scenario()) == (b"stale", None)
+
+
+def test_failed_load_is_not_cached():
+    async def scenario():
+        cache = ResponseCache(MemoryBackend(1024))
+
+        async def broken():
+            raise RuntimeError("down")
+
+        try:
+            await cache.get_or_set("key", 60, broken)
+        except RuntimeError:
+            pass
+        return await cache.backend.get("key"), cache._inflight
+
+    assert run(scenario()) == (None, {})
+
+
+def test_memory_backend_evicts_least_recently_used_by_size():
+    async def scenario():
+        backend = MemoryBackend(10)
+        await backend.set("a", b"aaaa", 60)
+        await backend.set("b", b"bbbb", 60)
+        await backend.get("a")
+        # Не помещается: вытесняется давно не читанный b
+        await backend.set("c", b"cccc", 60)
+        # Больше всего лимита - не кешируется вовсе
+        await backend.set("d", b"d" * 11, 60)
+        values = [await backend.get(key) for key in "abcd"]
+        return values, backend.stats()
+
+    values, stats = run(scenario())
+    assert values == [b"aaaa", None, b"cccc", None]
+    assert stats["bytes"] == 8 and stats["entries"] == 2 and stats["evictions"] == 1
@@ -0,0 +1,71 @@
+import asyncio
+import os
+
+import pytest
+
+from api.main import chunk_paragraphs
+
+# Куски строит SQL-функция chapter_chunks_build (миграция 0009); ее тесты
+# идут только против отдельной тестовой базы
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+WINDOW = 16384
+
+
+def chunk(first, *paragraphs):
+    return {"first_paragraph": first, "content": "\n".join(paragraphs)}
+
+
+def test_chunk_paragraphs_empty_text():
+    assert chunk_paragraphs([], 0) == []
+    # Пустая глава - один кусок с одним пустым абзацем
+    assert chunk_paragraphs([chunk(0, "")], 0) == [""]
+    assert chunk_paragraphs([chunk(0, "")], 1) == []
+
+
+def test_chunk_paragraphs_huge_paragraph():
+    huge = "x" * (WINDOW * 3)
+    chunks = [chunk(0, "a"), chunk(1, huge), chunk(2, "b")]
+    assert chunk_paragraphs(chunks, 1, 2) == [huge]
+    assert chunk_paragraphs(chunks, 0) == ["a", huge, "b"]
+
+
+def test_chunk_paragraphs_range_across_chunk_boundary():
+    chunks = [chunk(0, "p0", "p1", "p2"), chunk(3, "p3", "p4")]
+    assert chunk_paragraphs(chunks, 2, 4) == ["p2", "p3"]
+    assert chunk_paragraphs(chunks, 3, 5) == ["p3", "p4"]
+    assert chunk_paragraphs(chunks, 0, 3) == ["p0", "p1", "p2"]
+    assert chunk_paragraphs(chunks, 4, 100) == ["p4"]
+    assert chunk_paragraphs(chunks, 5) == []
+
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+def test_chapter_chunks_build(monkeypatch):
+    from api import migrate
+    from api.database import Database
+
+    monkeypatch.setattr(migrate, "_schema_ready", False)
+
+    async def build(*paragraphs):
+        database = Database(url=TEST_DATABASE_URL, min_size=1, max_size=1)
+        try:
+            await migrate.ensure_schema(database)
+            async with database.acquire() as conn:
+                rows = await conn.fetch(
+                    "SELECT chunk_no, first_paragraph, paragraph_count, content"
+                    " FROM chapter_chunks_build(1, $1) ORDER BY chunk_no",
+                    "\n".join(paragraphs)
+                )
+        finally:
+            await database.close()
+        return [tuple(row) for row in rows]
+
+    assert asyncio.run(build("")) == [(1, 0, 1, "")]
+
+    huge = "x" * (WINDOW * 3)
+    assert asyncio.run(build(huge, "tail")) == [(1, 0, 1, huge), (2, 1, 1, "tail")]
+
+    # Абзац, начинающийся ровно на границе окна, открывает новый кусок
+    at_boundary = "a" * (WINDOW - 1)
+    assert asyncio.run(build(at_boundary, "b")) == [(1, 0, 1, at_boundary), (2, 1, 1, "b")]
+    before_boundary = "a" * (WINDOW - 2)
+    assert asyncio.run(build(before_boundary, "b")) == [(1, 0, 2, before_boundary + "\nb")]
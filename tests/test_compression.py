@@ -0,0 +1,74 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from api.compression import CompressionMiddleware, available_encodings, choose_encoding, compress
+from api.http_cache import conditional_response, encoded_etag, encoded_response
+
+BODY = ("Глава первая. " * 200).encode()
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, deflate, br", "br" if "br" in available_encodings() else "gzip"),
+    ("br;q=0.5, gzip;q=0.8", "gzip"),
+    ("br;q=0, gzip;q=0", None),
+    ("*", available_encodings()[0]),
+    ("gzip;q=oops", None),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header) == expected
+
+
+def test_compress_round_trip():
+    assert gzip.decompress(compress(BODY, "gzip")) == BODY
+    with pytest.raises(ValueError):
+        compress(BODY, "deflate")
+
+
+def test_encoded_etag():
+    assert encoded_etag('"abc"', "br") == '"abc-br"'
+    assert encoded_etag('W/"abc"', "gzip") == 'W/"abc"'
+    assert encoded_etag(None, "br") is None
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+
+    @app.get("/chapter")
+    async def chapter(request: Request):
+        return conditional_response(request, BODY, '"abc"', None, "no-cache")
+
+    @app.get("/stored")
+    async def stored():
+        return encoded_response(compress(BODY, "gzip"), "gzip", '"abc"', None, "no-cache")
+
+    return TestClient(app)
+
+
+def test_middleware_gives_each_encoding_its_etag():
+    client = make_app()
+    plain = client.get("/chapter", headers={"Accept-Encoding": "identity"})
+    zipped = client.get("/chapter", headers={"Accept-Encoding": "gzip"})
+    assert plain.headers["etag"] == '"abc"'
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.headers["etag"] == '"abc-gzip"'
+    assert zipped.content == BODY
+
+    stored = client.get("/stored", headers={"Accept-Encoding": "gzip"})
+    assert stored.headers["etag"] == '"abc-gzip"'
+    assert stored.content == BODY
+
+
+def test_encoded_etag_revalidates():
+    client = make_app()
+    response = client.get("/chapter", headers={"Accept-Encoding": "gzip", "If-None-Match": '"abc-gzip"'})
+    assert response.status_code == 304
+    response = client.get("/chapter", headers={"Accept-Encoding": "identity", "If-None-Match": '"abc-br"'})
+    assert response.status_code == 304
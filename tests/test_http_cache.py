@@ -0,0 +1,62 @@
+from datetime import datetime, timezone
+
+from starlette.requests import Request
+
+from api.http_cache import http_date, is_not_modified, list_validators, make_etag, pack, unpack
+
+UPDATED_AT = datetime(2024, 5, 1, 12, 30, 15, 500000, tzinfo=timezone.utc)
+
+
+def request(**headers):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(key.replace("_", "-").encode(), value.encode()) for key, value in headers.items()],
+    })
+
+
+def test_make_etag_is_stable_and_quoted():
+    etag = make_etag("chapter", 1, UPDATED_AT)
+    assert etag == make_etag("chapter", 1, UPDATED_AT)
+    assert etag != make_etag("chapter", 2, UPDATED_AT)
+    assert etag.startswith('"') and etag.endswith('"')
+
+
+def test_list_validators():
+    rows = [{"id": 1, "updated_at": UPDATED_AT}, {"id": 2, "updated_at": datetime(2024, 1, 1, tzinfo=timezone.utc)}]
+    etag, last_modified = list_validators(rows, "id", "updated_at")
+    assert last_modified == UPDATED_AT
+    assert etag != list_validators(rows, "id", "updated_at", extra="42")[0]
+    assert list_validators([], "id")[1] is None
+
+
+def test_if_none_match():
+    etag = make_etag("novel", 1)
+    assert is_not_modified(request(if_none_match=etag), etag, None)
+    assert is_not_modified(request(if_none_match=f'"other", W/{etag}'), etag, None)
+    assert is_not_modified(request(if_none_match="*"), etag, None)
+    assert not is_not_modified(request(if_none_match='"other"'), etag, None)
+    assert not is_not_modified(request(if_none_match="*"), None, None)
+
+
+def test_if_none_match_wins_over_if_modified_since():
+    etag = make_etag("novel", 1)
+    headers = {"if_none_match": '"other"', "if_modified_since": http_date(UPDATED_AT)}
+    assert not is_not_modified(request(**headers), etag, UPDATED_AT)
+
+
+def test_if_modified_since():
+    assert is_not_modified(request(if_modified_since=http_date(UPDATED_AT)), None, UPDATED_AT)
+    naive = UPDATED_AT.replace(tzinfo=None)
+    assert is_not_modified(request(if_modified_since=http_date(UPDATED_AT)), None, naive)
+    earlier = "Wed, 01 May 2024 12:30:14 GMT"
+    assert not is_not_modified(request(if_modified_since=earlier), None, UPDATED_AT)
+    assert not is_not_modified(request(if_modified_since="yesterday"), None, UPDATED_AT)
+    assert not is_not_modified(request(), '"x"', UPDATED_AT)
+
+
+def test_pack_round_trip():
+    etag = make_etag("x")
+    assert unpack(pack(etag, UPDATED_AT, b'{"a":\n1}')) == (etag, UPDATED_AT, b'{"a":\n1}')
+    assert unpack(pack(None, None, b"")) == (None, None, b"")
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from api.imports import InvalidImport, InvalidUpload, iter_lines, iter_multipart_file
+
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def lines(*chunks, max_line_bytes=100):
+    async def collect():
+        return [item async for item in iter_lines(stream(*chunks), max_line_bytes)]
+    return asyncio.run(collect())
+
+
+def test_lines_across_chunks():
+    assert lines(b'{"a":', b'1}\n{"b"', b':2}\n\n{"c":3}') == [
+        (1, b'{"a":1}'), (2, b'{"b":2}'), (4, b'{"c":3}')
+    ]
+
+
+def test_line_split_into_many_chunks():
+    line = b'{"content":"' + b"x" * 5000 + b'"}'
+    chunks = [line[i:i + 7] for i in range(0, len(line), 7)]
+    assert lines(*chunks, b"\n", *chunks, max_line_bytes=len(line)) == [(1, line), (2, line)]
+
+
+def test_blank_lines_keep_numbering():
+    assert lines(b"\n  \nx\n") == [(3, b"x")]
+    assert lines() == []
+
+
+@pytest.mark.parametrize("chunks, line", [
+    ((b"x" * 101,), 1),
+    ((b"ok\n", b"x" * 60, b"x" * 60), 2),
+    ((b"ok\n" + b"x" * 101 + b"\nok\n",), 2),
+    ((b"ok\n" + b"x" * 101,), 2),
+])
+def test_too_long_line(chunks, line):
+    with pytest.raises(InvalidImport) as error:
+        lines(*chunks)
+    assert error.value.line == line
+
+
+def multipart(*parts, boundary=b"xyz"):
+    body = b""
+    for name, content in parts:
+        body += b"--" + boundary + b"\r\n"
+        body += b'Content-Disposition: form-data; name="' + name + b'"; filename="chapters.ndjson"\r\n'
+        body += b"Content-Type: application/x-ndjson\r\n\r\n" + content + b"\r\n"
+    return body + b"--" + boundary + b"--\r\n"
+
+
+def upload(body, size=7, content_type="multipart/form-data; boundary=xyz"):
+    async def collect():
+        chunks = stream(*(body[i:i + size] for i in range(0, len(body), size)))
+        return b"".join([piece async for piece in iter_multipart_file(chunks, content_type)])
+    return asyncio.run(collect())
+
+
+def test_multipart_file_streams_only_file_field():
+    content = b'{"chapter_number":1}\r\n{"chapter_number":2}\n'
+    body = multipart((b"comment", b"ignored"), (b"file", content))
+    assert upload(body) == content
+    assert upload(body, size=1) == content
+
+
+def test_multipart_without_file_field():
+    with pytest.raises(InvalidUpload):
+        upload(multipart((b"comment", b"x")))
+    with pytest.raises(InvalidUpload):
+        upload(b"", content_type="multipart/form-data")
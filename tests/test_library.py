@@ -0,0 +1,79 @@
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+from fastapi.testclient import TestClient
+
+from api import auth
+from api.auth import sign_init_data
+from api.library import ProgressBuffer
+from tests.fakes import FakeDatabase
+
+EARLIER = datetime(2024, 5, 1, 12, 0, tzinfo=timezone.utc)
+LATER = EARLIER + timedelta(minutes=5)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_flush_keeps_latest_position():
+    async def scenario():
+        progress = ProgressBuffer(flush_interval=60)
+        progress.add("42", 1, 10, 100, LATER)
+        progress.add("42", 1, 9, 50, EARLIER)
+        progress.add("43", 2, 20)
+        database = FakeDatabase()
+        await progress.flush(database)
+        await progress.stop()
+        return database.calls
+
+    calls = run(scenario())
+    assert len(calls) == 1
+    _, (users, novels, chapters, positions, dates) = calls[0]
+    rows = dict(zip(zip(users, novels), zip(chapters, positions)))
+    assert rows == {("42", 1): (10, 100), ("43", 2): (20, None)}
+
+
+def test_failed_flush_requeues_without_overwriting_newer():
+    async def scenario():
+        progress = ProgressBuffer(flush_interval=60)
+        progress.add("42", 1, 9, 50, EARLIER)
+        progress.add("42", 2, 30, 0, EARLIER)
+        flush = asyncio.ensure_future(progress.flush(FakeDatabase(error=RuntimeError("down"), delay=0.01)))
+        await asyncio.sleep(0)
+        # Пока сброс идет, пользователь читает дальше
+        progress.add("42", 1, 10, 100, LATER)
+        await flush
+        pending = progress.pending("42")
+        progress._pending.clear()
+        await progress.stop()
+        return pending
+
+    pending = run(scenario())
+    assert pending[1][:2] == (10, 100)
+    assert pending[2][:2] == (30, 0)
+
+
+def test_sync_rejects_oversized_lists(monkeypatch):
+    from api import main
+
+    monkeypatch.setattr(auth, "BOT_TOKEN", "123456:test-token")
+    monkeypatch.setattr(main, "BATCH_MAX_NOVELS", 2)
+    monkeypatch.setattr(main, "LIBRARY_MAX_NOVELS", 3)
+    init_data = sign_init_data(
+        {"auth_date": str(int(time.time())), "user": json.dumps({"id": 42})}, "123456:test-token"
+    )
+    client = TestClient(main.app)
+    headers = {"X-Telegram-Init-Data": init_data}
+    progress = [{"novel_id": novel_id, "chapter_id": 1} for novel_id in range(3)]
+    for body in (
+        {"progress": progress},
+        {"removed_bookmarks": [1, 2, 3]},
+        {"subscriptions": [1, 2, 3, 4]},
+    ):
+        response = client.post("/api/library/sync", json=body, headers=headers)
+        assert response.status_code == 400
+    # Отказ приходит до записи в буфер
+    assert main.progress_buffer.pending("42") == {}
@@ -0,0 +1,47 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import metrics
+
+
+def client():
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    return TestClient(app)
+
+
+def test_is_authorized(monkeypatch):
+    assert not metrics.is_authorized("Bearer secret")
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "secret")
+    assert metrics.is_authorized("Bearer secret")
+    assert metrics.is_authorized("bearer secret")
+    assert not metrics.is_authorized("Bearer other")
+    assert not metrics.is_authorized("secret")
+    assert not metrics.is_authorized(None)
+
+
+def test_server_timing_only_with_token(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "secret")
+    assert "server-timing" not in client().get("/ping").headers
+    response = client().get("/ping", headers={"Authorization": "Bearer secret"})
+    assert response.headers["server-timing"].startswith("db;")
+
+    monkeypatch.setattr(metrics, "SERVER_TIMING", True)
+    assert "server-timing" in client().get("/ping").headers
+
+
+def test_metrics_endpoint_requires_token(monkeypatch):
+    from api.main import app
+
+    monkeypatch.setattr(metrics, "METRICS_TOKEN", "secret")
+    main = TestClient(app)
+    assert main.get("/api/metrics").status_code == 401
+    assert main.get("/api/metrics", headers={"Authorization": "Bearer other"}).status_code == 401
+    response = main.get("/api/metrics", headers={"Authorization": "Bearer secret"})
+    assert response.status_code == 200
+    assert "http_request_duration_seconds" in response.text
@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from api.pagination import InvalidCursor, decode_cursor, encode_cursor, next_cursor
+
+
+def test_cursor_round_trip():
+    updated_at = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    cursor = encode_cursor([updated_at, 42])
+    assert "=" not in cursor
+    assert decode_cursor(cursor, (datetime, int)) == (updated_at, 42)
+
+
+def test_cursor_casts_types():
+    cursor = encode_cursor(["магия", 0.5, 7])
+    assert decode_cursor(cursor, (str, float, int)) == ("магия", 0.5, 7)
+
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", encode_cursor([1]), encode_cursor(["x", 1]), "e30"])
+def test_invalid_cursor(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, (int, int))
+
+
+def test_next_cursor_only_for_full_page():
+    rows = [{"chapter_number": 1, "id": 10}, {"chapter_number": 2, "id": 11}]
+    assert next_cursor(rows, 3, ("chapter_number", "id")) is None
+    assert next_cursor([], 0, ("id",)) is None
+    cursor = next_cursor(rows, 2, ("chapter_number", "id"))
+    assert decode_cursor(cursor, (int, int)) == (2, 11)
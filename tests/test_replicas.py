@@ -0,0 +1,56 @@
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api.database import Database, ReadYourWritesMiddleware
+
+
+def instance():
+    """Отдельный процесс приложения со своей Database и репликой"""
+    database = Database(url="postgres://primary", replica_urls=["postgres://replica"], sticky_seconds=10)
+    database.replica_pools = [object()]
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware)
+
+    @app.post("/write")
+    async def write():
+        database.mark_write("42")
+        return {}
+
+    @app.get("/read")
+    async def read():
+        return {"replica": database._use_replica(None, False)}
+
+    return TestClient(app)
+
+
+def test_write_on_one_instance_is_read_from_primary_on_another():
+    first, second = instance(), instance()
+    assert second.get("/read").json() == {"replica": True}
+
+    last_write = first.post("/write").headers["x-last-write"]
+    assert second.get("/read", headers={"X-Last-Write": last_write}).json() == {"replica": False}
+    # Запрос без записи заголовок не выдает
+    assert "x-last-write" not in second.get("/read").headers
+
+
+def test_old_or_invalid_write_time_reads_replica():
+    client = instance()
+    stale = str(time.time() - 60)
+    assert client.get("/read", headers={"X-Last-Write": stale}).json() == {"replica": True}
+    assert client.get("/read", headers={"X-Last-Write": "soon"}).json() == {"replica": True}
+
+
+def test_library_write_keeps_cached_reads_on_replica():
+    database = Database(url="postgres://primary", replica_urls=["postgres://replica"], sticky_seconds=10)
+    database.replica_pools = [object()]
+    database.mark_write("42")
+    # Личная запись: сам пользователь читает из основной базы, общий кеш - с реплики
+    assert not database._use_replica("42", False)
+    assert database._use_replica(None, True)
+    assert database._use_replica("7", True)
+
+    database.mark_write("42", shared=True)
+    assert not database._use_replica(None, True)
+    assert database._use_replica("7", False)
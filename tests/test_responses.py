@@ -0,0 +1,53 @@
+import json
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from asyncpg.protocol.protocol import _create_record
+
+from api.responses import FastJSONResponse, dumps
+
+
+def previous_dumps(payload):
+    """Прежняя сериализация: stdlib json, записи копируются в dict в роуте"""
+    def default(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return float(value)
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+    return json.dumps(payload, default=default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def record(**fields):
+    # Так asyncpg собирает строки результата; без базы Record не создать
+    return _create_record({name: index for index, name in enumerate(fields)}, tuple(fields.values()))
+
+
+ROW = {
+    "id": 7,
+    "title": "Глава 1",
+    "created_at": datetime(2024, 5, 1, 12, 30, 1, 500, tzinfo=timezone.utc),
+    "updated_at": datetime(2024, 5, 1, 15, 0, tzinfo=timezone(timedelta(hours=3))),
+    "published": datetime(2024, 5, 1),
+    "day": date(2024, 5, 1),
+    "rating": Decimal("4.25"),
+    "views": Decimal("10"),
+    "translator_name": None,
+}
+
+
+def test_dumps_matches_previous_json():
+    payload = {"status": "success", "data": [ROW, {**ROW, "id": 8}]}
+    assert dumps(payload) == previous_dumps(payload)
+
+
+def test_dumps_records_like_dicts():
+    rows = [record(**ROW), record(**{**ROW, "id": 8})]
+    expected = previous_dumps({"data": [dict(row) for row in rows], "first": dict(rows[0])})
+    assert dumps({"data": rows, "first": rows[0]}) == expected
+
+
+def test_fast_json_response():
+    response = FastJSONResponse(content={"data": record(**ROW)})
+    assert response.body == previous_dumps({"data": ROW})
+    assert response.headers["content-type"] == "application/json"
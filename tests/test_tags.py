@@ -0,0 +1,72 @@
+import time
+
+from fastapi.testclient import TestClient
+
+from api.http_cache import pack
+from api.tags import TagCatalog, normalize_names, novels_filter
+
+
+def test_normalize_names():
+    assert normalize_names([" Romance ", "romance", "Romance", "  Slice   of life", "", " "]) == [
+        "Romance", "romance", "Slice of life"
+    ]
+    assert normalize_names(",".split(",")) == []
+
+
+def test_novels_filter_all():
+    params = ["translator"]
+    condition = novels_filter("n.id", [3, 5], "all", params)
+    assert condition == (
+        "n.id IN (SELECT novel_id FROM novel_tags WHERE tag_id = ANY($2)"
+        " GROUP BY novel_id HAVING COUNT(*) = $3)"
+    )
+    assert params == ["translator", [3, 5], 2]
+
+
+def test_novels_filter_any_and_single_tag():
+    params = []
+    assert novels_filter("n.id", [3, 5], "any", params) == (
+        "n.id IN (SELECT novel_id FROM novel_tags WHERE tag_id = ANY($1))"
+    )
+    assert params == [[3, 5]]
+    # Для одного тега all не нужен GROUP BY
+    params = []
+    assert "GROUP BY" not in novels_filter("n.id", [3], "all", params)
+    assert params == [[3]]
+
+
+def test_get_novels_tags(monkeypatch):
+    from api import main
+
+    catalog = TagCatalog(refresh_interval=60)
+    catalog.by_name = {"Romance": 1, "Fantasy": 2}
+    catalog._loaded_at = time.monotonic()
+    keys = []
+
+    class Cache:
+        async def get_or_set(self, key, ttl, loader):
+            keys.append(key)
+            return pack(None, None, b"{}")
+
+    async def ensure_schema():
+        pass
+
+    monkeypatch.setattr(main, "tag_catalog", catalog)
+    monkeypatch.setattr(main, "cache", Cache())
+    monkeypatch.setattr(main, "ensure_schema", ensure_schema)
+    client = TestClient(main.app)
+
+    for tags in (",", " ", " , "):
+        assert client.get("/api/novels", params={"tags": tags}).status_code == 200
+    client.get("/api/novels", params={"tags": " Fantasy ,Romance,Fantasy "})
+    client.get("/api/novels", params={"tags": "Romance,Unknown", "tags_mode": "any"})
+    client.get("/api/novels", params={"tags": "Romance,Unknown"})
+
+    base = "novels:1:20:None:None"
+    assert keys == [
+        base, base, base,
+        base + ":all:1,2",
+        # Неизвестный тег: в режиме any пропускается, в режиме all результат пуст
+        base + ":any:1",
+        base + ":all:",
+    ]
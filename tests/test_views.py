@@ -0,0 +1,47 @@
+import asyncio
+
+from api.views import ViewCounter
+from tests.fakes import FakeDatabase
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_flush_writes_one_batch():
+    async def scenario():
+        views = ViewCounter("novels", flush_interval=60)
+        views.add(1)
+        views.add(1)
+        views.add(2)
+        database = FakeDatabase()
+        await views.flush(database)
+        await views.stop()
+        return database.calls
+
+    calls = run(scenario())
+    assert len(calls) == 1
+    _, (ids, deltas) = calls[0]
+    assert dict(zip(ids, deltas)) == {1: 2, 2: 1}
+
+
+def test_dedup_by_user():
+    async def scenario():
+        views = ViewCounter("novels", flush_interval=60, dedup_window=300)
+        views.add(1, "42")
+        views.add(1, "42")
+        views.add(1, "43")
+        views.add(1)
+        pending = dict(views._pending)
+        views._pending.clear()
+        await views.stop()
+        return pending
+
+    assert run(scenario()) == {1: 3}
+
+
+def test_requeue_respects_buffer_limit():
+    views = ViewCounter("novels", flush_interval=60, max_pending=2)
+    views._pending = {1: 1, 2: 1}
+    views._requeue({1: 3, 3: 5})
+    assert views._pending == {1: 4, 2: 1}